@@ -0,0 +1,727 @@
+import time
+import spacy
+import numpy as np
+from contextlib import nullcontext
+from itertools import islice, repeat, tee
+from typing import Callable, Iterable, Iterator, Literal
+from spacy.tokens import Doc
+from .quote_finder import build_quote_index, quote_finder
+from . import constants
+from . import helpers
+from . import pipeline
+from . import runtime
+from .records import AttributionResult
+from .heuristic_coref import heuristic_clusters
+from .cache import ResultCache, cache_key, config_fingerprint
+from .batching import estimate_tokens, pipe_by_length
+from .limits import Deadline, Limits, truncate_text
+from .paragraphs import ParagraphCache
+from .metrics import AttributionMetrics, MetricsRegistry
+
+
+class SaysWho:
+    """
+    Main class for package. Instantiation loads spacy models so they don't have to be loaded again for repeat use.
+
+    Input:
+        text (str) - if provided, text will be analyzed on instantiation
+        coref_nlp (str) - name of coref model
+        base_nlp (str) - name of base model (for everything but coref) ... using en_core_web_lg because results are better than smaller models.
+        prune (bool) - if True, outlying PERSONS will be removed from coref clusters via helpers.prune_cluster_people
+        prep_text (bool) if True, text will be prepped for analysis via helpers.prep_text_for_quote_detection
+        prune_scorer (str) - similarity score used for pruning, 'prat' (partial ratio) or 'cos' (cosine similarity, needs vectors)
+        trim_pipelines (bool) - if True, models are loaded with only the components sayswho uses (see pipeline.py). What was dropped is saved to self.pipeline_reports.
+        engine (str) - "coref" uses the coref model for clusters. "fast" skips the coref model entirely and builds PERSON clusters heuristically (see heuristic_coref.py), which is much cheaper on CPU and works with small base models.
+        cache (ResultCache) - if provided, SaysWho.pipe looks up results here before running the models, and stores new ones
+        threads (int) - if provided, limits PyTorch/BLAS threads in this process before the models load (see runtime.py)
+        coref_token_budget (int) - if provided, SaysWho.pipe batches texts for the coref model by length, with at most this many padded tokens per batch (see batching.py), instead of batch_size texts in arrival order
+        limits (Limits) - per-document limits on tokens, quote candidates, cluster mentions and time. Documents over a limit take a cheaper path, recorded in self.fallbacks (see limits.py).
+        paragraph_cache (ParagraphCache) - if provided, boilerplate paragraphs seen often enough are parsed by the base model once and reused (see paragraphs.py)
+        selective_coref (bool) - if True, quotes are found before the coref model runs, and it only runs if some quote's speaker is a pronoun, a partial name or not a PERSON (see helpers.speaker_needs_coref), or if clusters are asked for. Other texts get heuristic clusters and a "coref_skipped:unneeded" fallback.
+        quantize_coref (bool) - if True, the coref model's PyTorch layers are quantized to int8 after loading, for faster CPU inference (see quantize.py). What was quantized is saved to self.pipeline_reports["quantization"].
+        metrics (MetricsRegistry) - if provided, documents, quotes, matches, cache hits, fallbacks, stage latencies and tokens per document are counted in it (see metrics.py)
+    """
+
+    def __init__(
+        self,
+        text: str = None,
+        coref_nlp: str = "en_coreference_web_trf",
+        base_nlp: str = "en_core_web_lg",
+        prune: bool = True,
+        prep_text: bool = True,
+        prune_scorer: str = "prat",
+        trim_pipelines: bool = True,
+        engine: Literal["coref", "fast"] = "coref",
+        cache: ResultCache = None,
+        threads: int = None,
+        coref_token_budget: int = None,
+        limits: Limits = None,
+        paragraph_cache: ParagraphCache = None,
+        selective_coref: bool = False,
+        quantize_coref: bool = False,
+        metrics: MetricsRegistry = None,
+    ):
+        if engine not in ["coref", "fast"]:
+            raise ValueError(f"engine must be 'coref' or 'fast', not {engine}")
+        if threads is not None:
+            runtime.apply_thread_layout(threads)
+        self.engine = engine
+        self.pipeline_reports = {}
+        models = [
+            ("coref_nlp", pipeline.COREF_COMPONENTS),
+            ("base_nlp", pipeline.BASE_COMPONENTS),
+        ]
+        if engine == "fast":
+            self.coref_nlp = None
+            models = models[1:]
+        for v, keep in models:
+            if not spacy.util.is_package(eval(v)):
+                raise OSError(
+                    f"SpaCy model {v} not installed. See README for instructions on how to install models."
+                )
+            if trim_pipelines:
+                nlp, self.pipeline_reports[v] = pipeline.load_trimmed(
+                    eval(v),
+                    keep,
+                    keep_vectors=v == "base_nlp" and prune_scorer == "cos",
+                )
+                self.__setattr__(v, nlp)
+            else:
+                self.__setattr__(v, spacy.load(eval(v)))
+        self.quantize_coref = quantize_coref and self.coref_nlp is not None
+        if self.quantize_coref:
+            from .quantize import quantize_pipeline
+
+            self.pipeline_reports["quantization"] = quantize_pipeline(self.coref_nlp)
+        self.prune = prune
+        self.prep_text = prep_text
+        self.prune_scorer = prune_scorer
+        self.cache = cache
+        self.coref_token_budget = coref_token_budget
+        self.limits = limits or Limits()
+        self.paragraph_cache = paragraph_cache
+        self.selective_coref = selective_coref
+        self.metrics = AttributionMetrics(metrics) if metrics is not None else None
+        if text:
+            self.attribute(text)
+
+    def expand_match(self, match=None):
+        """
+        Makes QuoteClusterMatch (or a list of QuoteClusterMatches) human-interpretable.
+
+        Input:
+            match (None, QuoteClusterMatch or list[QuoteClusterMatch]) - the QuoteClusterMatch(s) to be interpreted. Uses self.quote_matches if nothing is proivded.
+        """
+        if not match:
+            match = self.quote_matches
+
+        if isinstance(match, list):
+            for m in match:
+                self.expand_match(m)
+        else:
+            for m_ in ["quote", "cluster", "person"]:
+                if getattr(match, f"{m_}_index", None) is not None:
+                    i = eval(f"self.{m_}s")
+                    v = getattr(match, f"{m_}_index")
+                    data = helpers.format_cluster(i[v]) if m_ == "cluster" else i[v]
+                    print(m_.upper(), f": {v}" "\n", data, "\n")
+        return
+
+    def attribute(self, text: str, need_clusters: bool = False):
+        """
+        Top level function. Parses text, matches quotes to clusters and gets ent matches.
+
+        Never uses self.cache, because the Docs, quotes and clusters are kept on self. Use attribute_result for a cached AttributionResult.
+
+        Input:
+            t (str) - text file to be analyzed and attributed
+            need_clusters (bool) - if True, runs the coref model even if self.selective_coref would skip it
+
+        Output:
+            self.quote_matches (list[QuoteClusterMatch]) - list of quote/coref cluster match tuples
+        """
+        if self.prep_text:
+            text = helpers.prep_text_for_quote_detection(text)
+        self.parse_text(text, need_clusters)
+        self.quote_matches = self.match_quotes()
+        return
+
+    def attribute_result(
+        self, text: str, need_clusters: bool = False
+    ) -> AttributionResult:
+        """
+        Attributes one text like pipe: looked up in self.cache first if there is one, with the Docs released afterwards.
+
+        Output:
+            result (AttributionResult) - for text
+        """
+        return next(self.pipe([text], batch_size=1, need_clusters=need_clusters))
+
+    def pipe(
+        self, texts: Iterable[str], batch_size: int = 8, need_clusters: bool = False
+    ) -> Iterator[AttributionResult]:
+        """
+        Attributes a stream of texts, running both models with nlp.pipe.
+
+        Docs are released after each text, so only compact results are kept. If self.cache is set, texts are looked up batch_size at a time and only the misses go through the models. Results that ran out of self.limits.max_seconds (a ":time" fallback) aren't cached.
+
+        Input:
+            texts (iterable of str) - texts to be analyzed and attributed
+            batch_size (int) - batch size passed to both models
+            need_clusters (bool) - if True, runs the coref model on every text even if self.selective_coref would skip it
+
+        Output:
+            yields one AttributionResult per text, in input order
+        """
+        if self.prep_text:
+            texts = (helpers.prep_text_for_quote_detection(t) for t in texts)
+        if self.cache is None:
+            yield from self._pipe(texts, batch_size, need_clusters)
+            return
+
+        fingerprint = config_fingerprint(self)
+        texts = iter(texts)
+        while True:
+            chunk = list(islice(texts, batch_size))
+            if not chunk:
+                return
+            keys = [cache_key(t, fingerprint) for t in chunk]
+            results = [self.cache.get(k) for k in keys]
+            misses = [n for n, r in enumerate(results) if r is None]
+            if self.metrics is not None:
+                self.metrics.cache_hits.inc(len(chunk) - len(misses))
+                self.metrics.cache_misses.inc(len(misses))
+            for n, result in zip(
+                misses,
+                self._pipe([chunk[n] for n in misses], batch_size, need_clusters),
+            ):
+                # running out of time is down to the load at the moment, not the text
+                if not any(f.endswith(":time") for f in result.fallbacks):
+                    self.cache.put(keys[n], result)
+                results[n] = result
+            yield from results
+
+    def _pipe(
+        self, texts: Iterable[str], batch_size: int, need_clusters: bool = False
+    ) -> Iterator[AttributionResult]:
+        """
+        Runs already-prepped texts through both models and yields compact results.
+        """
+        if self.selective_coref and self.coref_nlp is not None and not need_clusters:
+            yield from self._pipe_selective(texts, batch_size)
+            return
+        coref_checked, base_checked, checked = tee(
+            (self.check_text(t) for t in texts), 3
+        )
+        coref_docs = self.parse_coref(
+            (t for t, _, use_coref, _ in coref_checked if use_coref), batch_size
+        )
+        for (_, fallbacks, use_coref, start), doc in zip(
+            checked,
+            self.parse_base((t for t, _, _, _ in base_checked), batch_size),
+        ):
+            coref_doc = next(coref_docs) if use_coref else None
+            self.parse_docs(coref_doc, doc, fallbacks=fallbacks, start=start)
+            self.quote_matches = self.match_quotes()
+            yield self.to_result(release_docs=True)
+
+    def _pipe_selective(
+        self, texts: Iterable[str], batch_size: int
+    ) -> Iterator[AttributionResult]:
+        """
+        _pipe for self.selective_coref: each batch_size texts go through the base model and quote_finder first, then only the ones that need it go through the coref model.
+        """
+        checked = (self.check_text(t) for t in texts)
+        while True:
+            chunk = list(islice(checked, batch_size))
+            if not chunk:
+                return
+            docs = self.parse_base((t for t, _, _, _ in chunk), batch_size)
+            parsed = []
+            for (text, fallbacks, use_coref, start), doc in zip(chunk, docs):
+                deadline = Deadline(self.limits.max_seconds, start)
+                quotes = self.find_quotes(doc, fallbacks, deadline)
+                if use_coref and deadline.expired():
+                    use_coref = False
+                    fallbacks.append("coref_skipped:time")
+                elif use_coref and not self.needs_coref(quotes):
+                    use_coref = False
+                    fallbacks.append("coref_skipped:unneeded")
+                parsed.append((text, fallbacks, use_coref, start, doc, quotes))
+            coref_docs = self.parse_coref((p[0] for p in parsed if p[2]), batch_size)
+            for _, fallbacks, use_coref, start, doc, quotes in parsed:
+                coref_doc = next(coref_docs) if use_coref else None
+                self.parse_docs(
+                    coref_doc, doc, fallbacks=fallbacks, start=start, quotes=quotes
+                )
+                self.quote_matches = self.match_quotes()
+                yield self.to_result(release_docs=True)
+
+    def parse_coref(self, texts: Iterable[str], batch_size: int) -> Iterator[Doc]:
+        """
+        Runs texts through self.coref_nlp, batched by length if self.coref_token_budget is set. Yields None forever if there's no coref model.
+        """
+        if self.coref_nlp is None:
+            return repeat(None)
+        if self.coref_token_budget:
+            docs = pipe_by_length(
+                self.coref_nlp, texts, token_budget=self.coref_token_budget
+            )
+        else:
+            docs = self.coref_nlp.pipe(texts, batch_size=batch_size)
+        return self.timed(docs, "coref")
+
+    def parse_base(self, texts: Iterable[str], batch_size: int) -> Iterator[Doc]:
+        """
+        Runs texts through self.base_nlp, through self.paragraph_cache if there is one.
+        """
+        if self.paragraph_cache is None:
+            docs = self.base_nlp.pipe(texts, batch_size=batch_size)
+        else:
+            docs = self.paragraph_cache.pipe(
+                self.base_nlp, texts, batch_size=batch_size
+            )
+        return self.timed(docs, "base")
+
+    def timer(self, stage: str):
+        """
+        Context manager timing stage into self.metrics. Does nothing if there's no registry.
+        """
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.time(stage)
+
+    def timed(self, docs: Iterator[Doc], stage: str) -> Iterator[Doc]:
+        """
+        docs, with the time taken to produce each one recorded as stage in self.metrics.
+        """
+        if self.metrics is None:
+            return docs
+        return self.metrics.timed(docs, stage)
+
+    def check_text(self, text: str) -> tuple:
+        """
+        Applies the token limits to an already-prepped text before it goes to the models.
+
+        Output:
+            text (str) - text, truncated if it's over self.limits.max_tokens
+            fallbacks (list[str]) - fallbacks taken so far
+            use_coref (bool) - False if there's no coref model or text is over self.limits.max_coref_tokens
+            start (float) - time.perf_counter() now, when work on text starts. Pass it on to parse_docs for self.limits.max_seconds.
+        """
+        start = time.perf_counter()
+        fallbacks = []
+        limits = self.limits
+        if limits.max_tokens is None and limits.max_coref_tokens is None:
+            return text, fallbacks, self.coref_nlp is not None, start
+        tokens = estimate_tokens(text)
+        if limits.max_tokens is not None and tokens > limits.max_tokens:
+            text = truncate_text(text, limits.max_tokens)
+            tokens = limits.max_tokens
+            fallbacks.append("truncated")
+        use_coref = self.coref_nlp is not None
+        if use_coref and limits.max_coref_tokens is not None:
+            if tokens > limits.max_coref_tokens:
+                use_coref = False
+                fallbacks.append("coref_skipped")
+        return text, fallbacks, use_coref, start
+
+    def needs_coref(self, quotes: list) -> bool:
+        """
+        True if any quote has a speaker that can't be matched to a PERSON without coref clusters (see helpers.speaker_needs_coref).
+        """
+        return any(helpers.speaker_needs_coref(q) for q in quotes)
+
+    def find_quotes(self, doc: Doc, fallbacks: list, deadline: Deadline = None) -> list:
+        """
+        Runs quote_finder on doc, with self.limits.max_quote_candidates.
+
+        Input:
+            doc (Doc) - text parsed by self.base_nlp
+            fallbacks (list[str]) - fallbacks for this text. "quotes_truncated" is added to it if there are too many candidates, "quotes_skipped:time" if deadline has expired.
+            deadline (Deadline) - the text's time budget, if any
+
+        Output:
+            quotes (list[DQTriple]) - quotes in doc
+        """
+        if deadline is not None and deadline.expired():
+            fallbacks.append("quotes_skipped:time")
+            return []
+        with self.timer("quotes"):
+            quote_index = build_quote_index(doc)
+            max_candidates = self.limits.max_quote_candidates
+            if (
+                max_candidates is not None
+                and len(quote_index.positions) > max_candidates
+            ):
+                fallbacks.append("quotes_truncated")
+            return [q for q in quote_finder(doc, max_candidates, quote_index)]
+
+    def over_time(self, stage: str) -> bool:
+        """
+        True (and records a fallback) if the current document has run out of time before stage.
+        """
+        deadline = self.__dict__.get("deadline")
+        if deadline is not None and deadline.expired():
+            self.fallbacks.append(f"{stage}_skipped:time")
+            return True
+        return False
+
+    def match_quotes(self) -> list:
+        """
+        get_matches, unless the document is out of time. Records the document in self.metrics.
+        """
+        if self.over_time("matching"):
+            matches = []
+        else:
+            with self.timer("matching"):
+                matches = self.get_matches()
+        if self.metrics is not None:
+            self.metrics.record(
+                quotes=len(self.quotes),
+                matched=len({m.quote_index for m in matches}),
+                tokens=len(self.doc),
+                fallbacks=self.fallbacks,
+            )
+        return matches
+
+    def to_result(self, release_docs: bool = False) -> AttributionResult:
+        """
+        Converts the current attribution into a compact AttributionResult with no spacy objects in it.
+
+        Input:
+            release_docs (bool) - if True, drops the Docs and everything that points into them (doc, coref_doc, quotes, clusters, persons, quote_matches) so they can be garbage collected
+
+        Output:
+            result (AttributionResult) - strings, character offsets and match indexes for the current text
+        """
+        if "quote_matches" not in self.__dict__:
+            raise Exception("No text parsed -- run SaysWho.attribute(text).")
+        result = AttributionResult.from_attributor(self)
+        if release_docs:
+            self.release_docs()
+        return result
+
+    def release_docs(self):
+        """
+        Drops the Docs from the last attribution, and every Token/Span that would keep them alive.
+        """
+        for attr in [
+            "coref_doc",
+            "doc",
+            "quotes",
+            "clusters",
+            "persons",
+            "quote_matches",
+            "deadline",
+        ]:
+            self.__dict__.pop(attr, None)
+        return
+
+    def parse_text(self, text: str, need_clusters: bool = False):
+        """
+        Imports text, gets coref clusters, copies coref clusters, finds PERSONS and gets NER matches.
+
+        Input:
+            text (string) - text to be analyzed
+            need_clusters (bool) - if True, runs the coref model even if self.selective_coref would skip it
+
+        Ouput:
+            self.coref_doc - spacy coref-parsed doc
+            self.doc - spacy doc with coref clusters
+            self.clusters - coref clusters
+            self.quotes - list of textacy-extracted quotes
+            self.persons - list of PERSON entities
+        """
+        text, fallbacks, use_coref, start = self.check_text(text)
+        # instantiate spacy doc
+        doc = next(self.parse_base([text], batch_size=1))
+        self.fallbacks = fallbacks
+        self.deadline = Deadline(self.limits.max_seconds, start)
+        coref_doc = quotes = None
+        if use_coref and self.selective_coref and not need_clusters:
+            quotes = self.find_quotes(doc, self.fallbacks, self.deadline)
+            # out of time is recorded as coref_skipped:time below
+            if not self.deadline.expired() and not self.needs_coref(quotes):
+                use_coref = False
+                self.fallbacks.append("coref_skipped:unneeded")
+        if use_coref and not self.over_time("coref"):
+            with self.timer("coref"):
+                coref_doc = self.coref_nlp(text)
+        self.parse_docs(
+            coref_doc, doc, fallbacks=self.fallbacks, start=start, quotes=quotes
+        )
+        return
+
+    def parse_docs(
+        self,
+        coref_doc: Doc,
+        doc: Doc,
+        fallbacks: list = None,
+        start: float = None,
+        quotes: list = None,
+        keep_cluster: Callable = None,
+    ):
+        """
+        Does everything in parse_text after the models have run. Split out so batches can be parsed with nlp.pipe.
+
+        Input:
+            coref_doc (Doc or None) - text parsed by self.coref_nlp (None with the "fast" engine)
+            doc (Doc) - same text parsed by self.base_nlp
+            fallbacks (list[str]) - fallbacks already taken for this text (see check_text)
+            start (float) - time.perf_counter() when work on this text started, for self.limits.max_seconds. Defaults to now.
+            quotes (list[DQTriple]) - quotes already found in doc by find_quotes. Found here if None.
+            keep_cluster (callable) - see make_clusters
+        """
+        self.coref_doc = coref_doc
+        self.doc = doc
+        self.fallbacks = list(fallbacks or [])
+        self.deadline = Deadline(self.limits.max_seconds, start)
+
+        # extract quotations
+        if quotes is None:
+            quotes = self.find_quotes(doc, self.fallbacks, self.deadline)
+        self.quotes = quotes
+        with self.timer("clusters"):
+            self.clusters = self.make_clusters(coref_doc, doc, keep_cluster)
+        self.persons = [e for e in self.doc.ents if e.label_ == "PERSON"]
+        return
+
+    def make_clusters(
+        self, coref_doc: Doc, doc: Doc, keep_cluster: Callable = None
+    ) -> list:
+        """
+        Gets clusters for doc: coref clusters cloned from coref_doc, or heuristic clusters if coref_doc is None. Pruned if self.prune.
+
+        Input:
+            coref_doc (Doc or None) - text parsed by self.coref_nlp
+            doc (Doc) - same text parsed by self.base_nlp
+            keep_cluster (callable) - if provided, only clusters for which keep_cluster(cluster) is True are kept (and pruned)
+
+        Output:
+            clusters (list) - clusters of Spans in doc
+        """
+        if coref_doc is None:
+            clusters = heuristic_clusters(doc)
+        else:
+            clusters = [
+                cluster
+                for k, cluster in coref_doc.spans.items()
+                if k.startswith("coref")
+            ]
+        if keep_cluster is not None:
+            clusters = [c for c in clusters if keep_cluster(c)]
+        if coref_doc is not None:
+            # clone coref clusters to doc
+            clusters = [helpers.clone_cluster(cluster, doc) for cluster in clusters]
+        max_mentions = self.limits.max_cluster_mentions
+        if (
+            self.prune
+            and max_mentions is not None
+            and sum(len(c) for c in clusters) > max_mentions
+        ):
+            self.fallbacks.append("prune_skipped")
+        elif self.prune and not self.over_time("prune"):
+            clusters = [
+                helpers.prune_cluster_people(cluster, scorer=self.prune_scorer)
+                for cluster in clusters
+            ]
+        return clusters
+
+    def get_matches(self):
+        """
+        Master function to match quotes with coref clusters via matrix multiplication.
+
+        Output:
+            results (list) - list of QuoteClusterMatch tuples.
+        """
+        pairs_dicto = self.make_pairs()
+        arrays = {k: self.make_matrix(k, v) for k, v in pairs_dicto.items()}
+
+        big_matrix = np.concatenate(
+            (
+                np.transpose(
+                    np.nonzero(
+                        arrays["quotes_persons"].dot(arrays["clusters_persons"].T)
+                    )
+                ),
+                np.transpose(np.nonzero(arrays["quotes_clusters"])),
+            )
+        )
+
+        results = sorted(
+            list(set([constants.QuoteClusterMatch(i, j) for i, j in big_matrix])),
+            key=lambda m: m.quote_index,
+        )
+
+        return results
+
+    def make_pairs(self) -> dict:
+        """
+        Creates quote/person, quote/cluster and cluster/person pairs for resolution and cleaning.
+
+        TODO: Ensure pronouns aren't being skipped!
+        TODO: Make ratio threshold a variable
+        """
+        if not all([v in self.__dict__ for v in ["quotes", "clusters", "persons"]]):
+            raise Exception("No text parsed -- run SaysWho.attribute(text).")
+
+        pairs_dicto = {
+            p: []
+            for p in [
+                "quotes_persons",
+                "quotes_clusters",
+            ]
+        }
+
+        for quote_index, quote in enumerate(self.quotes):
+            pairs_dicto["quotes_clusters"] += [
+                (quote_index, cluster_index)
+                for cluster_index, cluster in enumerate(self.clusters)
+                for span in cluster
+                if helpers.compare_quote_to_cluster_member(quote, span)
+            ]
+
+            pairs_dicto["quotes_persons"] += [
+                (quote_index, person_index)
+                for person_index, person in enumerate(self.persons)
+                if helpers.span_contains(quote, person)
+            ]
+
+            pairs_dicto["quotes_clusters"] += [
+                (quote_index, cluster_index)
+                for cluster_index, cluster in enumerate(self.clusters)
+                if quote_index
+                not in [m[0] for m in set(pairs_dicto["quotes_clusters"])]
+                if quote.speaker[0].text in [p.text for p in self.persons]
+                if helpers.get_manual_speaker_cluster(quote, cluster)
+            ]
+
+        pairs_dicto["clusters_persons"] = [
+            (cluster_index, person_index)
+            for person_index, person in enumerate(self.persons)
+            for cluster_index, cluster in enumerate(self.clusters)
+            for span in cluster
+            if helpers.span_contains(person, span)
+            if not helpers.pronoun_check(span)
+        ]
+        return pairs_dicto
+
+    def make_matrix(self, key: str, pairs: list[tuple]) -> np.array:
+        """
+        Convenience function for converting quote/cluster, quote/person and cluster/person pairs into binary matrices.
+
+        Input:
+            key (str) - data types in pairs, connected by "_" (ie "quotes_clusters" means the pairs data is (quote, cluster))
+            pairs (list[tuple]) - (data type 1, data type 2) matches
+
+        Output:
+            m (np.array) - binary matrix of existing data type matches
+        """
+        x, y = key.split("_")
+        m = np.zeros([len(self.__getattribute__(_)) for _ in [x, y]])
+        for i, j in pairs:
+            m[i, j] = 1
+        return m
+
+    def print_clusters(self):
+        """
+        Print clusters with duplicate text removed. For easier interpretation!
+        """
+        for n, cluster in enumerate(self.clusters):
+            print(n, set(t.text for t in cluster))
+
+    # VIZ CODE
+    def process_quote_for_rendering(self, quote_match):
+        quote = {
+            "content": self.quotes[quote_match.quote_index].content,
+            "cue": "".join(
+                [t.text_with_ws for t in self.quotes[quote_match.quote_index].cue]
+            ),
+            "cluster": ", ".join(
+                set(
+                    [
+                        c.text
+                        for c in self.clusters[quote_match.cluster_index]
+                        if c[0].pos_ != "PRON"
+                    ]
+                )
+            ),
+        }
+        return quote
+
+    def yield_quotes(self):
+        for quote_index in range(len(self.quotes)):
+            for m in (qm for qm in self.quote_matches if qm.quote_index == quote_index):
+                base_dict = self.process_quote_for_rendering(m)
+                base_dict["cluster_index"] = m.cluster_index
+                base_dict["cluster"] = ", ".join(
+                    set(
+                        [
+                            c.text
+                            for c in self.clusters[m.cluster_index]
+                            if c[0].pos_ != "PRON"
+                        ]
+                    )
+                )
+            yield (base_dict)
+
+    def process_text_into_html(self):
+        quote_indexes = [
+            ((q.content.start, q.content.end), "QUOTE", n)
+            for n, q in enumerate(self.quotes)
+        ]
+        html_output = "<p>"
+        color_key = {}
+        for token in self.doc:
+            coded = False
+            if token.text == "\n":
+                token_text = "<br>"
+            else:
+                token_text = token.text_with_ws
+            for index_match in (i_ for i_ in quote_indexes if token.i in i_[0]):
+                coded = True
+                match_indexes, label, n = index_match
+                start = not match_indexes.index(token.i)
+                html_output += helpers.generate_code(n, label, start, color_key)
+                html_output += token_text
+            if not coded:
+                html_output += token_text
+
+        html_output += "</p>"
+        return html_output
+
+    def render_to_html(
+        self,
+        article_title: str = "My Article",
+        output_path: str = "temp.html",
+        save_file: bool = True,
+    ):
+        # only needed for viz, so not imported with the package
+        import regex as re
+        from jinja2 import Environment, FileSystemLoader
+
+        metadata = {
+            "title": article_title,
+            "bodytext": self.process_text_into_html(),
+            "quotes": list(self.yield_quotes()),
+        }
+        rendered = (
+            Environment(loader=FileSystemLoader("./"))
+            .get_template("template.html")
+            .render(metadata)
+        )
+
+        if save_file:
+            if not output_path.endswith(".html"):
+                output_path = output_path + ".html"
+            with open(output_path, "w+") as f:
+                try:
+                    f.write(rendered)
+                except UnicodeDecodeError:
+                    rendered = re.sub("\u2014", "-", rendered)
+                    f.write(rendered)
+            return
+
+        else:
+            return rendered
@@ -0,0 +1,80 @@
+"""
+Length-bucketed batching for the coref transformer.
+
+Running mixed-length texts through nlp.pipe in arrival order pads every short text in a batch up to the longest one. pipe_by_length buffers texts, sorts each buffer by length and cuts it into batches by token budget (batch size x longest text), so similar lengths are batched together and memory per batch stays predictable. Docs still come out in input order.
+"""
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List
+import regex as re
+from spacy.language import Language
+from spacy.tokens import Doc
+
+TOKEN_REGEX = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap stand-in for a token count: words plus punctuation marks.
+    """
+    return len(TOKEN_REGEX.findall(text))
+
+
+def plan_batches(lengths: List[int], token_budget: int) -> List[List[int]]:
+    """
+    Groups indexes into batches of similar length, each costing at most token_budget padded tokens.
+
+    A text longer than token_budget gets a batch of its own.
+
+    Input:
+        lengths (list of int) - length of each text
+        token_budget (int) - most padded tokens per batch (number of texts x longest text)
+
+    Output:
+        batches (list of list of int) - indexes into lengths, shortest texts first
+    """
+    batches = []
+    batch, longest = [], 0
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        new_longest = max(longest, lengths[i])
+        if batch and new_longest * (len(batch) + 1) > token_budget:
+            batches.append(batch)
+            batch, new_longest = [], lengths[i]
+        batch.append(i)
+        longest = new_longest
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def pipe_by_length(
+    nlp: Language,
+    texts: Iterable[str],
+    token_budget: int = 4096,
+    buffer_size: int = 256,
+    length: Callable[[str], int] = estimate_tokens,
+) -> Iterator[Doc]:
+    """
+    Like nlp.pipe, but batches by length within buffers of buffer_size texts.
+
+    Input:
+        nlp (Language) - pipeline to run (ie SaysWho.coref_nlp)
+        texts (iterable of str) - texts to parse
+        token_budget (int) - most padded tokens per batch
+        buffer_size (int) - how many texts are sorted together. Larger buffers batch better, but hold more Docs at once.
+        length (callable) - text -> token count estimate
+
+    Output:
+        yields one Doc per text, in input order
+    """
+    texts = iter(texts)
+    while True:
+        buffer = list(islice(texts, buffer_size))
+        if not buffer:
+            return
+        docs = [None] * len(buffer)
+        for batch in plan_batches([length(t) for t in buffer], token_budget):
+            for i, doc in zip(
+                batch, nlp.pipe([buffer[i] for i in batch], batch_size=len(batch))
+            ):
+                docs[i] = doc
+        yield from docs
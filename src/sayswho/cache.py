@@ -0,0 +1,144 @@
+"""
+Two-tier cache of AttributionResults, for texts that come through more than once (updates, syndication, retries).
+
+Results are keyed by a hash of the prepped text plus a fingerprint of everything that can change the output: model names/versions/components, SaysWho settings and the thresholds in constants. The first tier is an in-process LRU of serialized results, evicted by total size. Behind it is a SQLite table holding everything ever stored.
+"""
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from typing import Optional
+from . import constants
+from .records import AttributionResult
+
+
+def config_fingerprint(sw) -> str:
+    """
+    Hash of everything about a SaysWho that affects its output.
+    """
+    models = {}
+    paragraph_cache = getattr(sw, "paragraph_cache", None)
+    for v in ["coref_nlp", "base_nlp"]:
+        nlp = getattr(sw, v, None)
+        if nlp is not None:
+            models[v] = [nlp.meta.get("name"), nlp.meta.get("version"), nlp.pipe_names]
+    config = {
+        "models": models,
+        "engine": getattr(sw, "engine", "coref"),
+        "prune": sw.prune,
+        "prune_scorer": getattr(sw, "prune_scorer", "prat"),
+        "prep_text": sw.prep_text,
+        "limits": list(getattr(sw, "limits", None) or []),
+        "selective_coref": getattr(sw, "selective_coref", False),
+        "quantize_coref": getattr(sw, "quantize_coref", False),
+        "paragraph_cache": (
+            [paragraph_cache.min_count, paragraph_cache.para_char]
+            if paragraph_cache is not None
+            else None
+        ),
+        "constants": [
+            constants.MIN_SPEAKER_DIFF,
+            constants.MIN_ENTITY_DIFF,
+            constants.MIN_QUOTE_LENGTH,
+            sorted(constants.QUOTATION_MARK_PAIRS),
+            sorted(constants._reporting_verbs),
+        ],
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def cache_key(text: str, fingerprint: str) -> str:
+    """
+    Input:
+        text (str) - prepped text
+        fingerprint (str) - output of config_fingerprint
+    """
+    return hashlib.sha256((fingerprint + "\0" + text).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    In-memory LRU in front of a SQLite store.
+
+    Input:
+        path (str) - SQLite file for the second tier. None for memory only.
+        max_bytes (int) - total size of serialized results kept in memory
+
+    Attributes:
+        stats (dict) - memory_hits, disk_hits, misses, evictions (from memory) and puts
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = 64 * 1024**2):
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "puts": 0,
+        }
+        self.conn = None
+        if path is not None:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+            )
+
+    @property
+    def hits(self) -> int:
+        return self.stats["memory_hits"] + self.stats["disk_hits"]
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def get(self, key: str) -> Optional[AttributionResult]:
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return AttributionResult.from_bytes(self.memory[key])
+        if self.conn is not None:
+            row = self.conn.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.stats["disk_hits"] += 1
+                self._remember(key, row[0])
+                return AttributionResult.from_bytes(row[0])
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, result: AttributionResult):
+        value = result.to_bytes()
+        self.stats["puts"] += 1
+        if self.conn is not None:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+            self.conn.commit()
+        self._remember(key, value)
+
+    def _remember(self, key: str, value: bytes):
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        if len(value) > self.max_bytes:
+            return
+        self.memory[key] = value
+        self.memory_bytes += len(value)
+        while self.memory_bytes > self.max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """
+        Empties the memory tier (the SQLite store is kept).
+        """
+        self.memory.clear()
+        self.memory_bytes = 0
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
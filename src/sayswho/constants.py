@@ -1,6 +1,9 @@
-from spacy.symbols import aux, auxpass, csubj, dobj, neg, nsubj
+from __future__ import annotations
 from collections import namedtuple
-from spacy.tokens import Span, Token
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from spacy.tokens import Span, Token
 
 DQTriple: tuple[list[Token], list[Token], Span] = namedtuple(
     "DQTriple", ["speaker", "cue", "content"]
@@ -20,10 +23,24 @@ MIN_ENTITY_DIFF = 2
 MIN_QUOTE_LENGTH = 3
 
 """
-Constants for textacy quote identification
+Constants for textacy quote identification.
+These are sets of spaCy symbol IDs. They're built on first use (see __getattr__), so importing constants doesn't load spaCy.
 """
-_ACTIVE_SUBJ_DEPS = {csubj, nsubj}
-_VERB_MODIFIER_DEPS = {aux, auxpass, neg}
+_SYMBOL_SETS = {
+    "_ACTIVE_SUBJ_DEPS": ["csubj", "nsubj"],
+    "_VERB_MODIFIER_DEPS": ["aux", "auxpass", "neg"],
+}
+
+
+def __getattr__(name: str):
+    if name not in _SYMBOL_SETS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from spacy import symbols
+
+    value = {getattr(symbols, s) for s in _SYMBOL_SETS[name]}
+    globals()[name] = value
+    return value
+
 
 """
 For prepping text for quote detection.
@@ -0,0 +1,169 @@
+"""
+Memory-mapped reader for multi-article text files.
+
+Bulk Lexis downloads are single text files with thousands of articles separated by delimiter lines ("End of Document"). CorpusReader memory-maps the file and finds every article boundary in one regex scan over the mapped bytes, keeping only a table of byte offsets. Articles are decoded one at a time when they're asked for, in order or by number, so the file is never read into memory as a whole.
+
+The offset table can be saved next to the corpus and loaded by other processes, and a CorpusReader pickles as just its path and offsets, so work can be resharded across processes without scanning the file again.
+"""
+import mmap
+import os
+import re
+from typing import Iterator
+import numpy as np
+from . import helpers
+
+DEFAULT_DELIMITER = r"End of Document"
+
+NON_SPACE = re.compile(rb"\S")
+
+
+def delimiter_regex(delimiter: str) -> "re.Pattern":
+    """
+    Bytes regex matching whole delimiter lines (surrounding spaces and \\r allowed).
+
+    Input:
+        delimiter (str) - regex for the delimiter line's text
+    """
+    return re.compile(
+        rb"^[ \t]*(?:" + delimiter.encode("utf-8") + rb")[ \t]*\r?$", re.MULTILINE
+    )
+
+
+class CorpusReader:
+    """
+    Lazy, random-access reader for a file of delimited articles.
+
+    Input:
+        path (str) - corpus file
+        delimiter (str) - regex for the text of the lines between articles
+        prep (bool) - if True, articles go through helpers.prep_text_for_quote_detection (the same prep SaysWho does) before they're returned. Use with SaysWho(prep_text=False) so they aren't prepped twice.
+        para_char (str) - paragraph boundary for prep
+        encoding (str) - file encoding
+        index_path (str) - offset table saved by save_index. Used instead of scanning if it matches the file's size and modification time.
+
+    Articles are numbered from 0. Blank stretches between delimiters aren't counted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        delimiter: str = DEFAULT_DELIMITER,
+        prep: bool = False,
+        para_char: str = "\n",
+        encoding: str = "utf-8",
+        index_path: str = None,
+    ):
+        self.path = path
+        self.delimiter = delimiter
+        self.prep = prep
+        self.para_char = para_char
+        self.encoding = encoding
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self._file = None
+        self._mm = None
+        self.offsets = None
+        if index_path is not None and os.path.exists(index_path):
+            self.offsets = self.load_index(index_path)
+        if self.offsets is None:
+            self.offsets = self.scan()
+
+    @property
+    def mm(self):
+        if self._mm is None:
+            self._file = open(self.path, "rb")
+            # mmap can't map an empty file
+            self._mm = (
+                mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                if self.size
+                else b""
+            )
+        return self._mm
+
+    def scan(self) -> np.ndarray:
+        """
+        Finds every article in one pass over the mapped file.
+
+        Output:
+            offsets (np.ndarray) - (start, end) byte offsets, one row per article
+        """
+        mm = self.mm
+        offsets = []
+        start = 0
+        for match in delimiter_regex(self.delimiter).finditer(mm):
+            if NON_SPACE.search(mm, start, match.start()):
+                offsets.append((start, match.start()))
+            start = match.end()
+        if NON_SPACE.search(mm, start, self.size):
+            offsets.append((start, self.size))
+        return np.array(offsets, dtype=np.int64).reshape(-1, 2)
+
+    def save_index(self, index_path: str):
+        """
+        Saves the offset table, after two header rows with the file size, article count and modification time it was built for.
+        """
+        header = [[self.size, len(self.offsets)], [self.mtime_ns, 0]]
+        with open(index_path, "wb") as f:
+            np.save(f, np.vstack([header, self.offsets]).astype(np.int64))
+
+    def load_index(self, index_path: str):
+        """
+        Offset table from save_index, or None if it was built for a different version of the file.
+        """
+        table = np.load(index_path)
+        # a rewrite can leave the size unchanged, so the mtime is checked too
+        if (
+            len(table) < 2
+            or table[0, 0] != self.size
+            or table[0, 1] != len(table) - 2
+            or table[1, 0] != self.mtime_ns
+        ):
+            return None
+        return table[2:]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self.offsets[i].tolist()
+        article = self.mm[start:end].decode(self.encoding).strip()
+        if self.prep:
+            article = helpers.prep_text_for_quote_detection(
+                article, para_char=self.para_char
+            )
+        return article
+
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_range(0, len(self))
+
+    def iter_range(self, start: int, stop: int) -> Iterator[str]:
+        """
+        Articles start to stop (exclusive), lazily.
+        """
+        for i in range(max(start, 0), min(stop, len(self))):
+            yield self[i]
+
+    def shard(self, index: int, count: int) -> Iterator[str]:
+        """
+        Articles in shard index of count contiguous, equal-sized shards.
+        """
+        bounds = np.linspace(0, len(self), count + 1).astype(int)
+        return self.iter_range(bounds[index], bounds[index + 1])
+
+    def close(self):
+        if self._mm is not None and self.size:
+            self._mm.close()
+            self._file.close()
+        self._mm = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_file"] = state["_mm"] = None
+        return state
@@ -0,0 +1,400 @@
+"""
+Near-duplicate detection for batch runs.
+
+Wire stories show up many times with small differences (headline, byline, a trimmed paragraph). Deduplicator gives every text a MinHash signature over its word shingles and looks it up in an LSH index of the texts already attributed. Only one representative per group goes through SaysWho; every near-duplicate gets the representative's result, with character offsets moved onto its own text by aligning the two texts word by word.
+
+A quote is only carried over if its speaker, cue and content all sit in text the two documents share. If any quote can't be carried over, or the duplicate has text of its own with a quotation mark or a reporting verb in it (where a quote the representative doesn't have could be), the duplicate is attributed normally.
+"""
+import zlib
+from array import array
+from collections import OrderedDict, defaultdict
+from difflib import SequenceMatcher
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import regex as re
+from . import helpers
+from .constants import ALL_QUOTES, _reporting_verbs
+from .records import AttributionResult, ClusterRecord, QuoteRecord, SpanRecord
+
+WORD_REGEX = re.compile(r"\w+")
+ALIGN_TOKEN_REGEX = re.compile(r"\S+\s*")
+
+IRREGULAR_VERB_FORMS = {
+    "say": ["said"],
+    "tell": ["told"],
+    "think": ["thought"],
+    "write": ["wrote", "written", "writing"],
+}
+
+
+def verb_forms(lemma: str) -> List[str]:
+    """
+    Inflected forms of a reporting verb, so they can be found without a parser. Overgenerates a little ("sayed"), which is harmless here.
+    """
+    forms = [lemma, lemma + "s", lemma + "es", lemma + "ed", lemma + "d", lemma + "ing"]
+    forms += [lemma + lemma[-1] + "ed", lemma + lemma[-1] + "ing"]
+    if lemma.endswith("e"):
+        forms.append(lemma[:-1] + "ing")
+    if lemma.endswith("y"):
+        forms += [lemma[:-1] + "ies", lemma[:-1] + "ied"]
+    return forms + IRREGULAR_VERB_FORMS.get(lemma, [])
+
+
+REPORTING_VERB_REGEX = re.compile(
+    r"\b(?:"
+    + "|".join(sorted({f for v in _reporting_verbs for f in verb_forms(v)}))
+    + r")\b",
+    re.IGNORECASE,
+)
+
+
+def may_have_quote(text: str) -> bool:
+    """
+    Does text have a quotation mark or a reporting verb in it?
+    """
+    return any(c in ALL_QUOTES for c in text) or bool(REPORTING_VERB_REGEX.search(text))
+
+
+def shingles(text: str, k: int = 5) -> np.ndarray:
+    """
+    CRC32 hashes of the lowercased word k-grams in text (the whole text if it has fewer than k words).
+    """
+    words = WORD_REGEX.findall(text.lower())
+    grams = [" ".join(words[i : i + k]) for i in range(max(1, len(words) - k + 1))]
+    return np.unique(
+        np.array([zlib.crc32(g.encode("utf-8")) for g in grams], dtype=np.uint64)
+    )
+
+
+class MinHasher:
+    """
+    MinHash signatures from num_perm multiply-shift hash functions.
+
+    Input:
+        num_perm (int) - signature length
+        seed (int) - seed for the hash functions. Signatures are only comparable between MinHashers with the same num_perm and seed.
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        info = np.iinfo(np.uint64)
+        self.a = rng.integers(1, info.max, num_perm, dtype=np.uint64, endpoint=True)
+        self.a |= np.uint64(1)
+        self.b = rng.integers(0, info.max, num_perm, dtype=np.uint64, endpoint=True)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Input:
+            hashes (np.ndarray of uint64) - shingle hashes (see shingles)
+
+        Output:
+            signature (np.ndarray of uint64) - minimum of each hash function over the shingles
+        """
+        with np.errstate(over="ignore"):
+            hashed = (self.a[:, None] * hashes[None, :] + self.b[:, None]) >> np.uint64(
+                32
+            )
+        return hashed.min(axis=1)
+
+
+def similarity(sig1: np.ndarray, sig2: np.ndarray) -> float:
+    """
+    Estimated Jaccard similarity of two signatures.
+    """
+    return float(np.mean(sig1 == sig2))
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing index of MinHash signatures.
+
+    Two signatures become candidates if all rows of any one band agree.
+
+    Input:
+        bands (int) - number of bands. The signature length must be divisible by it.
+        max_entries (int) - most signatures kept. Past this, the least recently added or matched one is dropped. None keeps everything.
+    """
+
+    def __init__(self, bands: int = 32, max_entries: int = None):
+        self.bands = bands
+        self.max_entries = max_entries
+        self.buckets = defaultdict(list)
+        self.signatures = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterator[Tuple[int, bytes]]:
+        for i, band in enumerate(np.split(signature, self.bands)):
+            yield i, band.tobytes()
+
+    def add(self, key, signature: np.ndarray) -> list:
+        """
+        Indexes signature under key.
+
+        Output:
+            evicted (list) - keys dropped to stay within max_entries
+        """
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self.buckets[band_key].append(key)
+        evicted = []
+        while self.max_entries is not None and len(self.signatures) > self.max_entries:
+            old_key, old_signature = self.signatures.popitem(last=False)
+            for band_key in self._band_keys(old_signature):
+                bucket = self.buckets[band_key]
+                bucket.remove(old_key)
+                if not bucket:
+                    del self.buckets[band_key]
+            evicted.append(old_key)
+        return evicted
+
+    def query(self, signature: np.ndarray, threshold: float) -> Optional[object]:
+        """
+        Key of the most similar indexed signature with an estimated Jaccard of at least threshold, or None.
+        """
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, []))
+        best, best_score = None, threshold
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= best_score:
+                best, best_score = key, score
+        if best is not None:
+            self.signatures.move_to_end(best)
+        return best
+
+
+def align_offsets(a: str, b: str) -> List[Tuple[int, int, int]]:
+    """
+    Character blocks that a and b share, found by matching them word by word.
+
+    Output:
+        blocks (list of tuple) - (start in a, start in b, length), in order
+    """
+    a_tokens = [m for m in ALIGN_TOKEN_REGEX.finditer(a)]
+    b_tokens = [m for m in ALIGN_TOKEN_REGEX.finditer(b)]
+    matcher = SequenceMatcher(
+        None,
+        [m.group() for m in a_tokens],
+        [m.group() for m in b_tokens],
+        autojunk=False,
+    )
+    blocks = []
+    for i, j, n in matcher.get_matching_blocks():
+        if n:
+            start = a_tokens[i].start()
+            blocks.append(
+                (start, b_tokens[j].start(), a_tokens[i + n - 1].end() - start)
+            )
+    return blocks
+
+
+class OffsetMap:
+    """
+    Moves character spans from one text onto a near-duplicate of it.
+    """
+
+    def __init__(self, a: str, b: str):
+        self.a = a
+        self.b = b
+        self.blocks = align_offsets(a, b)
+        self.block_starts = [block[0] for block in self.blocks]
+
+    def span(self, span: SpanRecord) -> Optional[SpanRecord]:
+        """
+        span moved onto b, or None if it isn't inside one shared block.
+        """
+        i = np.searchsorted(self.block_starts, span.start, side="right") - 1
+        if i < 0:
+            return None
+        a_start, b_start, length = self.blocks[i]
+        if span.end > a_start + length:
+            return None
+        shift = b_start - a_start
+        return SpanRecord(span.text, span.start + shift, span.end + shift)
+
+    def unaligned(self) -> List[Tuple[int, int]]:
+        """
+        (start, end) of every stretch of b that isn't in a shared block.
+        """
+        gaps, end = [], 0
+        for _, b_start, length in self.blocks:
+            if b_start > end:
+                gaps.append((end, b_start))
+            end = max(end, b_start + length)
+        if end < len(self.b):
+            gaps.append((end, len(self.b)))
+        return gaps
+
+    def quote(self, quote: QuoteRecord) -> Optional[QuoteRecord]:
+        spans = [self.span(s) for s in [quote.speaker, quote.cue, quote.content]]
+        if None in spans:
+            return None
+        return QuoteRecord(*spans)
+
+    def cluster(self, cluster: ClusterRecord) -> ClusterRecord:
+        """
+        cluster with the members that don't map onto b left out.
+        """
+        spans = [self.span(s) for s in cluster]
+        kept = [n for n, s in enumerate(spans) if s is not None]
+        return ClusterRecord(
+            [spans[n].text for n in kept],
+            array("l", [spans[n].start for n in kept]),
+            array("l", [spans[n].end for n in kept]),
+            array("b", [cluster.pronouns[n] for n in kept]),
+        )
+
+
+def align_result(result: AttributionResult, text: str) -> Optional[AttributionResult]:
+    """
+    Moves result onto text, a near-duplicate of result.text.
+
+    Input:
+        result (AttributionResult) - result for the representative text
+        text (str) - the duplicate, prepped the same way as result.text
+
+    Output:
+        result (AttributionResult) - for text, or None if any quote couldn't be carried over or text may have a quote result.text doesn't
+    """
+    if text == result.text:
+        return AttributionResult.from_dict(result.to_dict())
+    offsets = OffsetMap(result.text, text)
+    if any(may_have_quote(text[start:end]) for start, end in offsets.unaligned()):
+        return None
+    quotes = [offsets.quote(q) for q in result.quotes]
+    if None in quotes:
+        return None
+    return AttributionResult(
+        text,
+        quotes,
+        [offsets.cluster(c) for c in result.clusters],
+        [p for p in (offsets.span(p) for p in result.persons) if p is not None],
+        list(result.matches),
+        list(result.fallbacks),
+    )
+
+
+class Deduplicator:
+    """
+    Attributes a stream of texts, sending only one text per group of near-duplicates through the models.
+
+    Representatives are remembered across calls to pipe, so a story seen in an earlier batch isn't attributed again. Only the max_entries most recently seen or matched are kept (each holds a signature and an AttributionResult), so memory stays bounded on an endless stream; a duplicate of one that was dropped is attributed again.
+
+    Input:
+        sw (SaysWho) - attributor
+        threshold (float) - minimum estimated Jaccard similarity of word shingles for two texts to count as duplicates
+        num_perm (int) - MinHash signature length
+        bands (int) - LSH bands (num_perm must be divisible by it). More bands find more candidates below threshold, at the cost of more comparisons.
+        shingle_size (int) - words per shingle
+        max_entries (int) - most representatives remembered. None remembers all of them.
+
+    Attributes:
+        stats (dict) - attributed (texts that went through the models), aligned (duplicates given a representative's result) and fallbacks (duplicates that had to be attributed anyway)
+    """
+
+    def __init__(
+        self,
+        sw,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 5,
+        max_entries: int = 10000,
+    ):
+        if num_perm % bands:
+            raise ValueError(
+                f"num_perm ({num_perm}) must be divisible by bands ({bands})"
+            )
+        self.sw = sw
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(bands, max_entries)
+        self.results: Dict[int, AttributionResult] = {}
+        self._next_key = 0
+        self.stats = {"attributed": 0, "aligned": 0, "fallbacks": 0}
+
+    def prep(self, text: str) -> str:
+        """
+        text as SaysWho.pipe will see it, so result offsets line up.
+        """
+        if self.sw.prep_text:
+            return helpers.prep_text_for_quote_detection(text)
+        return text
+
+    def pipe(
+        self, texts: Iterable[str], batch_size: int = 8, buffer_size: int = 256
+    ) -> Iterator[AttributionResult]:
+        """
+        Like SaysWho.pipe, but near-duplicates of earlier texts reuse their results.
+
+        Input:
+            texts (iterable of str) - texts to attribute
+            batch_size (int) - passed to SaysWho.pipe
+            buffer_size (int) - texts grouped at a time
+
+        Output:
+            yields one AttributionResult per text, in input order
+        """
+        texts = iter(texts)
+        while True:
+            buffer = list(islice(texts, buffer_size))
+            if not buffer:
+                return
+            yield from self._pipe_buffer(buffer, batch_size)
+
+    def _pipe_buffer(
+        self, buffer: List[str], batch_size: int
+    ) -> List[AttributionResult]:
+        reps = [None] * len(buffer)
+        new = []
+        evicted = []
+        for n, text in enumerate(buffer):
+            if not text.strip():
+                new.append(n)
+                continue
+            signature = self.hasher.signature(shingles(text, self.shingle_size))
+            rep = self.index.query(signature, self.threshold)
+            if rep is None:
+                rep = self._next_key
+                self._next_key += 1
+                evicted += self.index.add(rep, signature)
+                new.append(n)
+            reps[n] = rep
+
+        results = [None] * len(buffer)
+        for n, result in zip(
+            new, self._attribute([buffer[n] for n in new], batch_size)
+        ):
+            results[n] = result
+            if reps[n] is not None:
+                self.results[reps[n]] = result
+
+        fallbacks = []
+        for n, text in enumerate(buffer):
+            if results[n] is not None:
+                continue
+            results[n] = align_result(self.results[reps[n]], self.prep(text))
+            if results[n] is None:
+                fallbacks.append(n)
+            else:
+                self.stats["aligned"] += 1
+        for n, result in zip(
+            fallbacks, self._attribute([buffer[n] for n in fallbacks], batch_size)
+        ):
+            results[n] = result
+        self.stats["fallbacks"] += len(fallbacks)
+        # dropped only now, since later texts in this buffer may still point at them
+        for rep in evicted:
+            self.results.pop(rep, None)
+        return results
+
+    def _attribute(self, texts: List[str], batch_size: int) -> List[AttributionResult]:
+        self.stats["attributed"] += len(texts)
+        if not texts:
+            return []
+        return list(self.sw.pipe(texts, batch_size=batch_size))
@@ -0,0 +1,330 @@
+"""
+Accuracy-versus-speed evaluation.
+
+Runs SaysWho under several configurations over a gold-annotated corpus and reports, for each one, quote/speaker/cue (and attribution) precision, recall and F1 next to docs/sec and peak memory, so a faster setup is a measured tradeoff:
+
+    python -m sayswho.evaluate gold.jsonl --configs configs.json --report eval.json
+
+configs.json maps a name to SaysWho keyword arguments, e.g.
+
+    {"default": {}, "small": {"base_nlp": "en_core_web_sm"}, "no_prune": {"prune": false}, "fast": {"engine": "fast"}}
+
+The gold corpus is JSON lines, one document per line:
+
+    {"text": "...", "quotes": [{"content": "...", "speaker": "he", "cue": "said", "name": "Ross Rogers"}]}
+
+content, speaker and cue are either the annotated text or [start, end] character offsets into text. name (who actually said it, when the speaker is a pronoun or partial name) is optional; attribution is only scored for quotes that have one.
+
+Predicted and gold quotes are compared by their words, not their offsets, so the text prep SaysWho does before parsing doesn't throw the scores off. Each configuration runs in a fresh process by default, so its peak memory includes loading its own models and nothing else.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+import regex as re
+from .loadtest import process_rss
+from .records import AttributionResult, QuoteRecord
+
+WORD_REGEX = re.compile(r"\w+")
+
+QUOTE_FIELDS = ["content", "speaker", "cue"]
+
+
+def words(text: str) -> List[str]:
+    return WORD_REGEX.findall(text.lower())
+
+
+def read_gold(path: str) -> List[dict]:
+    """
+    Reads a gold corpus (see module docstring), turning any [start, end] offsets into text.
+    """
+    docs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            for quote in doc["quotes"]:
+                for field in QUOTE_FIELDS:
+                    if isinstance(quote[field], list):
+                        start, end = quote[field]
+                        quote[field] = doc["text"][start:end]
+            docs.append(doc)
+    return docs
+
+
+def overlap(a: List[str], b: List[str]) -> float:
+    """
+    F1 of the words two texts share, from 0 (nothing in common) to 1 (same words).
+    """
+    common = sum((Counter(a) & Counter(b)).values())
+    if not common:
+        return 0.0
+    return 2 * common / (len(a) + len(b))
+
+
+def align_quotes(
+    gold: List[dict], predicted: List[QuoteRecord], min_overlap: float = 0.5
+) -> List[Tuple[int, int]]:
+    """
+    Pairs up gold and predicted quotes one to one, most overlapping content first.
+
+    Output:
+        pairs (list of tuple) - (gold index, predicted index) for every pair with at least min_overlap content overlap
+    """
+    gold_words = [words(q["content"]) for q in gold]
+    predicted_words = [words(q.content.text) for q in predicted]
+    scored = sorted(
+        (
+            (overlap(g, p), i, j)
+            for i, g in enumerate(gold_words)
+            for j, p in enumerate(predicted_words)
+        ),
+        reverse=True,
+    )
+    pairs, gold_used, predicted_used = [], set(), set()
+    for score, i, j in scored:
+        if score < min_overlap:
+            break
+        if i not in gold_used and j not in predicted_used:
+            pairs.append((i, j))
+            gold_used.add(i)
+            predicted_used.add(j)
+    return sorted(pairs)
+
+
+def names_person(result: AttributionResult, quote_index: int, name: str) -> bool:
+    """
+    Is quote matched to a cluster with a name in it that's part of name ("Rogers" for "Ross Rogers")?
+    """
+    name_words = set(words(name))
+    return any(
+        set(words(cluster_name)) <= name_words
+        for m in result.matches
+        if m.quote_index == quote_index
+        for cluster_name in result.clusters[m.cluster_index].names()
+        if words(cluster_name)
+    )
+
+
+def prf(tp: int, predicted: int, gold: int) -> Dict[str, float]:
+    precision = tp / predicted if predicted else 0.0
+    recall = tp / gold if gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if tp else 0.0
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "tp": tp,
+        "predicted": predicted,
+        "gold": gold,
+    }
+
+
+def score(
+    gold_docs: List[dict], results: List[AttributionResult], min_overlap: float = 0.5
+) -> Dict[str, dict]:
+    """
+    Scores results against gold_docs.
+
+    Input:
+        gold_docs (list of dict) - from read_gold
+        results (list of AttributionResult) - one per gold document, in the same order
+        min_overlap (float) - content overlap (see overlap) for a predicted quote to count as finding a gold quote
+
+    Output:
+        scores (dict) - prf dicts for:
+            quotes - quotes found
+            speakers - quotes found with the same speaker words as gold
+            cues - quotes found with the same cue words as gold
+            attribution - quotes matched to a cluster naming the gold name. Counted over gold quotes with a name, and predicted quotes with a match that aren't aligned to a gold quote without one.
+    """
+    counts = Counter()
+    for doc, result in zip(gold_docs, results):
+        gold = doc["quotes"]
+        pairs = align_quotes(gold, result.quotes, min_overlap)
+        gold_of = {j: i for i, j in pairs}
+        counts["gold"] += len(gold)
+        counts["predicted"] += len(result.quotes)
+        counts["found"] += len(pairs)
+        for i, j in pairs:
+            for field in ["speaker", "cue"]:
+                if words(gold[i][field]) == words(
+                    getattr(result.quotes[j], field).text
+                ):
+                    counts[field] += 1
+        counts["named"] += sum(1 for q in gold if q.get("name"))
+        matched = {m.quote_index for m in result.matches}
+        for j in matched:
+            i = gold_of.get(j)
+            if i is None:
+                counts["attributed"] += 1
+            elif gold[i].get("name"):
+                counts["attributed"] += 1
+                counts["attribution"] += names_person(result, j, gold[i]["name"])
+    return {
+        "quotes": prf(counts["found"], counts["predicted"], counts["gold"]),
+        "speakers": prf(counts["speaker"], counts["predicted"], counts["gold"]),
+        "cues": prf(counts["cue"], counts["predicted"], counts["gold"]),
+        "attribution": prf(
+            counts["attribution"], counts["attributed"], counts["named"]
+        ),
+    }
+
+
+def _load_sayswho(**config):
+    from .attributor import SaysWho
+
+    return SaysWho(**config)
+
+
+def evaluate_config(
+    name: str,
+    config: dict,
+    gold_docs: List[dict],
+    batch_size: int = 8,
+    factory: Callable = None,
+    min_overlap: float = 0.5,
+    sample_interval: float = 0.1,
+) -> dict:
+    """
+    Loads one configuration, attributes the gold corpus with it and scores the results.
+
+    Input:
+        name (str) - configuration name, for the report
+        config (dict) - keyword arguments for factory
+        gold_docs (list of dict) - from read_gold
+        batch_size (int) - passed to pipe
+        factory (callable) - called with **config to build the attributor. Defaults to SaysWho.
+        min_overlap (float) - see score
+        sample_interval (float) - seconds between RSS samples
+
+    Output:
+        report (dict) - name, config, docs, scores, load_seconds, duration (attribution only), docs_per_sec and rss_peak (bytes, from before loading to the end)
+    """
+    peak = [process_rss()]
+    done = threading.Event()
+
+    def sampler():
+        while not done.wait(sample_interval):
+            peak[0] = max(peak[0], process_rss())
+
+    sampler_thread = threading.Thread(target=sampler, daemon=True)
+    sampler_thread.start()
+    start = time.perf_counter()
+    sw = (factory or _load_sayswho)(**config)
+    loaded = time.perf_counter()
+    results = list(sw.pipe([d["text"] for d in gold_docs], batch_size=batch_size))
+    end = time.perf_counter()
+    done.set()
+    sampler_thread.join()
+    peak[0] = max(peak[0], process_rss())
+    return {
+        "name": name,
+        "config": config,
+        "docs": len(results),
+        "scores": score(gold_docs, results, min_overlap),
+        "load_seconds": loaded - start,
+        "duration": end - loaded,
+        "docs_per_sec": len(results) / (end - loaded) if end > loaded else 0.0,
+        "rss_peak": peak[0],
+    }
+
+
+def run_evaluation(
+    gold_docs: List[dict],
+    configs: Dict[str, dict],
+    batch_size: int = 8,
+    factory: Callable = None,
+    isolate: bool = True,
+    min_overlap: float = 0.5,
+) -> dict:
+    """
+    Runs evaluate_config for every configuration.
+
+    Input:
+        gold_docs (list of dict) - from read_gold
+        configs (dict) - configuration name -> keyword arguments for factory
+        batch_size (int) - passed to pipe
+        factory (callable) - see evaluate_config. Has to be picklable if isolate is True.
+        isolate (bool) - if True, each configuration runs in a new ("spawn") process, so models and memory from one don't carry over to the next. If False, they all run here, and rss_peak includes whatever was already loaded.
+        min_overlap (float) - see score
+
+    Output:
+        report (dict) - configs (one evaluate_config report each, in order) and environment
+    """
+    reports = []
+    for name, config in configs.items():
+        args = (name, config, gold_docs, batch_size, factory, min_overlap)
+        if isolate:
+            with mp.get_context("spawn").Pool(1) as pool:
+                reports.append(pool.apply(evaluate_config, args))
+        else:
+            reports.append(evaluate_config(*args))
+    return {
+        "configs": reports,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    """
+    One line per configuration: F1 scores, docs/sec and peak RSS.
+    """
+    header = f"{'config':<16}{'quote':>7}{'speaker':>9}{'cue':>7}{'attrib':>8}{'docs/s':>9}{'peak MB':>9}"
+    lines = [header]
+    for r in report["configs"]:
+        f1 = {k: v["f1"] for k, v in r["scores"].items()}
+        lines.append(
+            f"{r['name']:<16}{f1['quotes']:>7.3f}{f1['speakers']:>9.3f}{f1['cues']:>7.3f}"
+            f"{f1['attribution']:>8.3f}{r['docs_per_sec']:>9.1f}{r['rss_peak'] / 1024**2:>9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare sayswho configurations on a gold corpus."
+    )
+    parser.add_argument("gold", help=".jsonl gold corpus")
+    parser.add_argument(
+        "--configs",
+        default=None,
+        help="JSON file mapping names to SaysWho arguments (default: SaysWho())",
+    )
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-overlap", type=float, default=0.5)
+    parser.add_argument(
+        "--no-isolate", action="store_true", help="run every config in this process"
+    )
+    parser.add_argument("--report", default=None, help="write the report here")
+    args = parser.parse_args()
+
+    configs = {"default": {}}
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+    report = run_evaluation(
+        read_gold(args.gold),
+        configs,
+        batch_size=args.batch_size,
+        isolate=not args.no_isolate,
+        min_overlap=args.min_overlap,
+    )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Columnar export of AttributionResults to Arrow and Parquet.
+
+Results are flattened into four tables, joined on doc_id:
+- documents: doc_id, text, fallbacks
+- quotes: doc_id, quote_index, then text/start/end for speaker, cue and content
+- cluster_members: doc_id, cluster_index, member_index, text, start, end, pronoun
+- matches: doc_id, quote_index, cluster_index
+
+Offsets are character offsets into the document text, as in records.py. Speaker, cue and cluster member texts repeat a lot, so they're dictionary-encoded. Quote content and document text are mostly unique and stay plain strings.
+
+ParquetWriter streams results to one Parquet file per table per batch, in hive-style partitions (<path>/<table>/batch=<n>/part-0.parquet), so analytics jobs can read (and memory-map) any table without parsing JSON.
+
+Needs pyarrow.
+"""
+import os
+from typing import Dict, Iterable, List
+from .records import AttributionResult
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as e:
+    raise ImportError(
+        "sayswho.export needs pyarrow. Install it with `pip install sayswho[arrow]`."
+    ) from e
+
+TABLES = ["documents", "quotes", "cluster_members", "matches"]
+
+
+def _span_fields(name: str) -> list:
+    return [
+        pa.field(f"{name}_text", pa.dictionary(pa.int32(), pa.string())),
+        pa.field(f"{name}_start", pa.int32()),
+        pa.field(f"{name}_end", pa.int32()),
+    ]
+
+
+SCHEMAS = {
+    "documents": pa.schema(
+        [
+            pa.field("doc_id", pa.int64()),
+            pa.field("text", pa.large_string()),
+            pa.field("fallbacks", pa.list_(pa.string())),
+        ]
+    ),
+    "quotes": pa.schema(
+        [pa.field("doc_id", pa.int64()), pa.field("quote_index", pa.int32())]
+        + _span_fields("speaker")
+        + _span_fields("cue")
+        + [
+            pa.field("content_text", pa.string()),
+            pa.field("content_start", pa.int32()),
+            pa.field("content_end", pa.int32()),
+        ]
+    ),
+    "cluster_members": pa.schema(
+        [
+            pa.field("doc_id", pa.int64()),
+            pa.field("cluster_index", pa.int32()),
+            pa.field("member_index", pa.int32()),
+            pa.field("text", pa.dictionary(pa.int32(), pa.string())),
+            pa.field("start", pa.int32()),
+            pa.field("end", pa.int32()),
+            pa.field("pronoun", pa.bool_()),
+        ]
+    ),
+    "matches": pa.schema(
+        [
+            pa.field("doc_id", pa.int64()),
+            pa.field("quote_index", pa.int32()),
+            pa.field("cluster_index", pa.int32()),
+        ]
+    ),
+}
+
+
+def _columns(results: List[AttributionResult], doc_ids: List[int]) -> Dict[str, dict]:
+    columns = {t: {f: [] for f in SCHEMAS[t].names} for t in TABLES}
+    docs, quotes, members, matches = [columns[t] for t in TABLES]
+    for doc_id, result in zip(doc_ids, results):
+        docs["doc_id"].append(doc_id)
+        docs["text"].append(result.text)
+        docs["fallbacks"].append(result.fallbacks)
+        for n, quote in enumerate(result.quotes):
+            quotes["doc_id"].append(doc_id)
+            quotes["quote_index"].append(n)
+            for name in ["speaker", "cue", "content"]:
+                span = getattr(quote, name)
+                quotes[f"{name}_text"].append(span.text)
+                quotes[f"{name}_start"].append(span.start)
+                quotes[f"{name}_end"].append(span.end)
+        for n, cluster in enumerate(result.clusters):
+            size = len(cluster)
+            members["doc_id"].extend([doc_id] * size)
+            members["cluster_index"].extend([n] * size)
+            members["member_index"].extend(range(size))
+            members["text"].extend(cluster.texts)
+            members["start"].extend(cluster.starts)
+            members["end"].extend(cluster.ends)
+            members["pronoun"].extend(bool(p) for p in cluster.pronouns)
+        for m in result.matches:
+            matches["doc_id"].append(doc_id)
+            matches["quote_index"].append(m.quote_index)
+            matches["cluster_index"].append(m.cluster_index)
+    return columns
+
+
+def _array(values: list, field: "pa.Field") -> "pa.Array":
+    if pa.types.is_dictionary(field.type):
+        return pa.array(values, type=field.type.value_type).dictionary_encode()
+    return pa.array(values, type=field.type)
+
+
+def to_record_batches(
+    results: Iterable[AttributionResult], doc_ids: Iterable[int] = None
+) -> Dict[str, "pa.RecordBatch"]:
+    """
+    Flattens results into one Arrow record batch per table.
+
+    Input:
+        results (iterable of AttributionResult) - results to export
+        doc_ids (iterable of int) - one ID per result. Defaults to 0, 1, 2...
+
+    Output:
+        batches (dict) - table name -> pa.RecordBatch
+    """
+    results = list(results)
+    doc_ids = list(range(len(results)) if doc_ids is None else doc_ids)
+    if len(doc_ids) != len(results):
+        raise ValueError(
+            f"Got {len(doc_ids)} doc_ids for {len(results)} results -- need one per result."
+        )
+    columns = _columns(results, doc_ids)
+    return {
+        t: pa.RecordBatch.from_arrays(
+            [_array(columns[t][f.name], f) for f in SCHEMAS[t]], schema=SCHEMAS[t]
+        )
+        for t in TABLES
+    }
+
+
+class ParquetWriter:
+    """
+    Streams AttributionResults to Parquet, batch_size results per partition.
+
+    Input:
+        path (str) - output directory. Each table goes in its own subdirectory.
+        batch_size (int) - results per batch (and per file)
+        include_text (bool) - if False, the documents table leaves out text (texts can be most of the output)
+        compression (str) - Parquet compression codec
+
+    Use as a context manager, or call close() to write the last partial batch.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 1000,
+        include_text: bool = True,
+        compression: str = "zstd",
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.include_text = include_text
+        self.compression = compression
+        self.pending = []
+        self.pending_ids = []
+        self.batch_count = 0
+        self.doc_count = 0
+
+    def write(self, result: AttributionResult, doc_id: int = None):
+        """
+        Adds one result. doc_id defaults to a running count of results written.
+        """
+        self.pending.append(result)
+        self.pending_ids.append(self.doc_count if doc_id is None else doc_id)
+        self.doc_count += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, results: Iterable[AttributionResult]):
+        for result in results:
+            self.write(result)
+
+    def flush(self):
+        """
+        Writes the pending results as one batch.
+        """
+        if not self.pending:
+            return
+        batches = to_record_batches(self.pending, self.pending_ids)
+        if not self.include_text:
+            batches["documents"] = batches["documents"].select(["doc_id", "fallbacks"])
+        for t, batch in batches.items():
+            directory = os.path.join(self.path, t, f"batch={self.batch_count}")
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(
+                pa.Table.from_batches([batch]),
+                os.path.join(directory, "part-0.parquet"),
+                compression=self.compression,
+            )
+        self.batch_count += 1
+        self.pending, self.pending_ids = [], []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_table(path: str, table: str, memory_map: bool = True) -> "pa.Table":
+    """
+    Reads one table written by ParquetWriter, with its batch partition as a column.
+
+    Input:
+        path (str) - ParquetWriter output directory
+        table (str) - one of TABLES
+        memory_map (bool) - if True, files are memory-mapped instead of read into memory
+    """
+    if table not in TABLES:
+        raise ValueError(f"table must be one of {TABLES}, not {table}")
+    return pq.read_table(
+        os.path.join(path, table), memory_map=memory_map, partitioning="hive"
+    )
@@ -1,23 +1,21 @@
+from __future__ import annotations
+from . import constants
 from .constants import (
     MIN_ENTITY_DIFF,
     MIN_SPEAKER_DIFF,
     Boundaries,
-    _reporting_verbs,
-    _VERB_MODIFIER_DEPS,
-    QUOTATION_MARK_PAIRS,
     ALL_QUOTES,
     BRACK_REGEX,
     DOUBLE_QUOTES,
     DOUBLE_QUOTES_NOSPACE_REGEX,
 )
-import statistics
-from itertools import zip_longest
 from collections import namedtuple
 import regex as re
-from typing import Union, Literal, Tuple, Iterable, List
-from rapidfuzz import fuzz
-from spacy.tokens import Span, SpanGroup, Token, Doc
-from spacy.symbols import VERB, PUNCT
+from typing import TYPE_CHECKING, Union, Literal, Tuple
+
+# spaCy is only imported where it's used, so the text prep functions below don't load it
+if TYPE_CHECKING:
+    from spacy.tokens import Span, SpanGroup, Token, Doc
 
 DQTriple: tuple[list[Token], list[Token], Span] = namedtuple(
     "DQTriple", ["speaker", "cue", "content"]
@@ -41,6 +39,10 @@ def get_cluster_people_scores(
         list(tuple) - index, span, average score for each span in the cluster
         cutoff (float) - minimum score for keeping cluster member (mean - 2stdev)
     """
+    # not needed by the rest of helpers, so only imported here
+    import statistics
+    from rapidfuzz import fuzz
+
     if scorer == "prat":
         score_func = lambda s1, s2: fuzz.partial_ratio(s1.text, s2.text)
     elif scorer == "cos":
@@ -86,6 +88,8 @@ def clone_cluster(cluster: SpanGroup, destination_doc: Doc):
     Necessary because I'm using multiple models (of different sizes) to do coreferencing and other NLP tasks.
     It's easier to consolidate the clusters than to combine the tasks into one model.
     """
+    from spacy.tokens import SpanGroup
+
     return SpanGroup(
         doc=destination_doc,
         spans=([destination_doc[span.start : span.end] for span in cluster]),
@@ -119,6 +123,8 @@ def get_boundaries(t: Union[Token, Span, list, DQTriple]) -> Boundaries:
     Output:
         Boundares(start, end) with start character and end character of t.
     """
+    from spacy.tokens import Span, Token
+
     if isinstance(t, Token):
         return Boundaries(t.idx, t.idx + len(t))
 
@@ -139,6 +145,8 @@ def get_text(t: Union[Token, Span, list]) -> str:
     """
     Convenience function, because quote speakers are lists of tokens.
     """
+    from spacy.tokens import Span, Token
+
     if isinstance(t, Token) or isinstance(t, Span):
         return t.text
     if isinstance(t, list):
@@ -199,6 +207,19 @@ def person_check(span: Span):
         return False
 
 
+def speaker_needs_coref(quote: DQTriple) -> bool:
+    """
+    Does matching quote to a person need coref clusters?
+
+    False only when the speaker is a full (multi-token) PERSON name, which span_contains matches to an entity directly. Pronouns, partial names ("Smith") and other speakers ("the official") need coref to find who they refer to.
+    """
+    if pronoun_check(quote.speaker):
+        return True
+    doc = quote.speaker[0].doc
+    span = doc[quote.speaker[0].i : quote.speaker[-1].i + 1]
+    return not (person_check(span) and len(span.ents[0]) > 1)
+
+
 def get_manual_speaker_cluster(quote, cluster):
     """
     If the match doesn't have a cluster, find any speakers in clusters that match manually.
@@ -289,39 +310,6 @@ def compare_spans(
     )
 
 
-def filter_cue_candidates(tok):
-    return all([tok.pos == VERB, tok.lemma_ in _reporting_verbs])
-
-
-def filter_speaker_candidates(ch, i, j):
-    return all(
-        [
-            ch.pos != PUNCT,
-            ((ch.i >= i and ch.i >= j) or (ch.i <= i and ch.i <= j)),
-        ]
-    )
-
-
-def filter_quote_tokens(tok: Token, qtok_idx_pairs: List[tuple]) -> bool:
-    return any(i <= tok.i <= j for i, j in qtok_idx_pairs)
-
-
-def get_qtok_idx_pairs(doc: Union[Doc, Span]) -> List[tuple]:
-    qtoks = [tok for tok in doc if tok.is_quote or (re.match(r"(\n)+", tok.text))]
-    qtok_idx_pairs = [(-1, -1)]
-    for n, q in enumerate(qtoks):
-        if (
-            not bool(q.whitespace_)
-            and q.i not in [q_[1] for q_ in qtok_idx_pairs]
-            and q.i > qtok_idx_pairs[-1][1]
-        ):
-            for q_ in qtoks[n + 1 :]:
-                if (ord(q.text), ord(q_.text)) in QUOTATION_MARK_PAIRS:
-                    qtok_idx_pairs.append((q.i, q_.i))
-                    break
-    return qtok_idx_pairs[1:]
-
-
 def expand_noun(tok: Token) -> list[Token]:
     """Expand a noun token to include all associated conjunct and compound nouns."""
     tok_and_conjuncts = [tok] + list(tok.conjuncts)
@@ -337,86 +325,11 @@ def expand_noun(tok: Token) -> list[Token]:
 def expand_verb(tok: Token) -> list[Token]:
     """Expand a verb token to include all associated auxiliary and negation tokens."""
     verb_modifiers = [
-        child for child in tok.children if child.dep in _VERB_MODIFIER_DEPS
+        child for child in tok.children if child.dep in constants._VERB_MODIFIER_DEPS
     ]
     return [tok] + verb_modifiers
 
 
-def get_sent_idxs(span):
-    indexes = [
-        n
-        for n, s in enumerate(span.doc.sents)
-        if (s.start <= span.start <= s.end) or (s.start <= span.end <= s.end)
-    ]
-    return indexes[0], indexes[-1]
-
-
-def line_break_window(span):
-    """
-    Finds the boundaries of the paragraph containing doc[i:j].
-    """
-    lb_tok_idxs = (
-        [0]
-        + [tok.i for tok in span.doc if re.match(r"\n", tok.text)]
-        + [span.doc[-1].i]
-    )
-    for i_, j_ in zip_longest(lb_tok_idxs, lb_tok_idxs[1:]):
-        if i_ <= span.start and j_ >= span.end:
-            return (i_, j_)
-    else:
-        return (None, None)
-
-
-def windower(span, method: Literal["overlap", "linebreaks"] = None):
-    if method == "overlap":
-        return [
-            sent
-            for sent in span.doc.sents
-            if (sent.start < span.start < sent.end)
-            or (sent.start < span.end < sent.end)
-        ]
-    else:
-        i_sent, j_sent = get_sent_idxs(span)
-        sents = (
-            list(span.doc.sents)[i_sent - 1 : j_sent + 2]
-            if i_sent > 0
-            else list(span.doc.sents)[: j_sent + 2]
-        )
-        if method == "linebreaks":
-            linebreaks = (
-                [0]
-                + [tok.i for tok in span.doc if re.match(r"\n", tok.text)]
-                + [span.doc[-1].i]
-            )
-            linebreak_limits = [
-                lb for lb in linebreaks if sents[0].start < lb <= span.end + 1
-            ]
-            if linebreak_limits:
-                return [s for s in sents if s.end <= max(linebreak_limits)]
-        return sents
-
-
-def old_windower(span, lb_boundaries=False) -> Iterable:
-    if lb_boundaries:
-        i_, j_ = line_break_window(span)
-        if i_ is not None and j_ is not None:
-            return list(span.doc[i_ + 1 : j_ - 1].sents)
-        else:
-            return [span]
-
-    else:
-        i, j = span.start, span.end
-        return [
-            sent
-            for sent in span.doc.sents
-            # these boundary cases are a subtle bit of work...
-            if (
-                (sent.start < i and sent.end >= i - 1)
-                or (sent.start <= j + 1 and sent.end > j)
-            )
-        ]
-
-
 def para_quote_fixer(p, exp: bool = False):
     if not p:
         return
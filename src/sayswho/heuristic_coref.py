@@ -0,0 +1,126 @@
+"""
+Transformer-free coref clusters, for SaysWho(engine="fast").
+
+Builds clusters from the base model's PERSON entities and third-person pronouns only:
+- PERSON entities are grouped when the tokens of one name are all in the other ("Vaughn" and "Jacque Vaughn"), in the spirit of get_manual_speaker_cluster and prune_cluster_people
+- each pronoun joins the cluster of the nearest preceding PERSON mention of the same gender (from honorifics or earlier pronouns), or else the nearest one of unknown gender
+
+Output has the same shape as cloned coref clusters (a list of SpanGroups on the Doc), so everything downstream works the same. Unlike the coref model, people who are only mentioned once get a cluster of their own.
+"""
+from typing import List, Optional
+from spacy.tokens import Doc, Span, SpanGroup
+
+PRONOUN_GENDERS = {
+    "he": "m",
+    "him": "m",
+    "his": "m",
+    "himself": "m",
+    "she": "f",
+    "her": "f",
+    "hers": "f",
+    "herself": "f",
+}
+
+HONORIFIC_GENDERS = {
+    "mr": "m",
+    "mr.": "m",
+    "sir": "m",
+    "mrs": "f",
+    "mrs.": "f",
+    "ms": "f",
+    "ms.": "f",
+    "miss": "f",
+    "madam": "f",
+}
+
+
+def name_tokens(span: Span) -> set:
+    """
+    Lowercased name tokens, with honorifics, possessives and punctuation dropped.
+    """
+    return {
+        tok.lower_
+        for tok in span
+        if not (
+            tok.is_punct
+            or tok.is_space
+            or tok.tag_ == "POS"
+            or tok.text == "'s"
+            or tok.lower_ in HONORIFIC_GENDERS
+        )
+    }
+
+
+def names_match(s1: set, s2: set) -> bool:
+    """
+    Does one name contain the other?
+    """
+    return bool(s1) and bool(s2) and (s1 <= s2 or s2 <= s1)
+
+
+def honorific_gender(span: Span) -> Optional[str]:
+    """
+    Gender from an honorific just before (or at the start of) a PERSON span, if there is one.
+    """
+    toks = [span[0]] + ([span.doc[span.start - 1]] if span.start > 0 else [])
+    for tok in toks:
+        if tok.lower_ in HONORIFIC_GENDERS:
+            return HONORIFIC_GENDERS[tok.lower_]
+    return None
+
+
+def heuristic_clusters(doc: Doc) -> List[SpanGroup]:
+    """
+    Builds PERSON clusters from name containment and pronoun proximity.
+
+    Input:
+        doc (Doc) - doc parsed by the base model (needs NER and POS)
+
+    Output:
+        clusters (list[SpanGroup]) - one cluster per person, mentions in document order
+    """
+    clusters = []  # [{"names": set, "gender": str, "spans": list}]
+    last_mention = []  # (token index, cluster index) of every PERSON mention
+
+    mentions = [e for e in doc.ents if e.label_ == "PERSON"] + [
+        doc[tok.i : tok.i + 1]
+        for tok in doc
+        if tok.pos_ == "PRON" and tok.lower_ in PRONOUN_GENDERS
+    ]
+    for span in sorted(mentions, key=lambda s: s.start):
+        if len(span) == 1 and span[0].lower_ in PRONOUN_GENDERS:
+            # nearest person of the same gender, or else nearest of unknown gender
+            gender = PRONOUN_GENDERS[span[0].lower_]
+            match = next(
+                (
+                    n
+                    for g in [gender, None]
+                    for _, n in reversed(last_mention)
+                    if clusters[n]["gender"] == g
+                ),
+                None,
+            )
+            if match is not None:
+                clusters[match]["gender"] = gender
+                clusters[match]["spans"].append(span)
+            continue
+
+        names = name_tokens(span)
+        match = next(
+            (
+                n
+                for _, n in reversed(last_mention)
+                if names_match(names, clusters[n]["names"])
+            ),
+            None,
+        )
+        if match is None:
+            match = len(clusters)
+            clusters.append({"names": set(), "gender": None, "spans": []})
+        cluster = clusters[match]
+        cluster["names"] |= names
+        cluster["gender"] = cluster["gender"] or honorific_gender(span)
+        cluster["spans"].append(span)
+        last_mention.append((span.start, match))
+
+    return [SpanGroup(doc, spans=c["spans"]) for c in clusters]
@@ -0,0 +1,253 @@
+"""
+Incremental re-attribution for texts that are edited and re-submitted.
+
+The text is parsed one paragraph at a time (see paragraphs.py). When a new version comes in, it's diffed against the last one by paragraph:
+- unchanged paragraphs keep their parsed Docs, only new or edited paragraphs go through the base model
+- quote_finder only runs on changed paragraphs and their neighbors. Quotes everywhere else are carried over.
+- coref only runs again if the edit could change the clusters (see needs_coref). Otherwise the old clusters are shifted onto the new Doc.
+"""
+import difflib
+from bisect import bisect_right
+from typing import Dict, List, Set
+from spacy.tokens import Doc
+from . import helpers
+from .constants import DQTriple
+from .heuristic_coref import PRONOUN_GENDERS
+from .limits import Deadline
+from .paragraphs import (
+    paragraph_offsets,
+    parse_paragraphs,
+    split_paragraphs,
+    stitch_paragraphs,
+)
+from .quote_finder import quote_finder
+
+
+class IncrementalAttributor:
+    """
+    Wraps a SaysWho so repeat submissions of the same (edited) text only redo the work the edit touched.
+
+    Results are written to the wrapped SaysWho (doc, quotes, clusters, persons, quote_matches), so everything that works after SaysWho.attribute works here too.
+
+    Because paragraphs are parsed separately, results can differ slightly from SaysWho.attribute on the same text.
+
+    Input:
+        sw (SaysWho) - loaded attributor
+        para_char (str) - paragraph boundary, same as prep_document_for_quote_detection
+
+    Attributes:
+        stats (dict) - how much of the last text was redone: paragraphs, parsed, quote_paragraphs and coref (bool)
+    """
+
+    def __init__(self, sw, para_char: str = "\n"):
+        self.sw = sw
+        self.para_char = para_char
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the previous text, so the next call is a full run.
+        """
+        self.paragraphs = []
+        self.paragraph_docs = []
+        self.offsets = [(0, 0)]
+        self.quotes = []
+        self.cluster_offsets = None
+        self.coref_doc = None
+        self.stats = {}
+
+    def attribute(self, text: str):
+        """
+        Attributes text, reusing whatever is still valid from the previous call.
+
+        Input:
+            text (str) - new version of the text
+        """
+        sw = self.sw
+        sw.fallbacks = []
+        sw.deadline = Deadline()
+        if sw.prep_text:
+            text = helpers.prep_text_for_quote_detection(text, para_char=self.para_char)
+        paragraphs = split_paragraphs(text, self.para_char)
+
+        # new paragraph index -> old paragraph index, for unchanged paragraphs
+        old_index = {}
+        changed, dirty, touched_old = set(), set(), set()
+        opcodes = difflib.SequenceMatcher(
+            None, self.paragraphs, paragraphs, autojunk=False
+        ).get_opcodes()
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                old_index.update({j1 + k: i1 + k for k in range(i2 - i1)})
+                continue
+            changed.update(range(j1, j2))
+            touched_old.update(range(i1, i2))
+            # neighbors, including the paragraphs on either side of a deletion
+            dirty.update(range(max(j1 - 1, 0), min(j2 + 1, len(paragraphs))))
+
+        to_parse = sorted(changed)
+        parsed = dict(
+            zip(
+                to_parse,
+                parse_paragraphs(sw.base_nlp, [paragraphs[j] for j in to_parse]),
+            )
+        )
+        docs = [
+            parsed[j] if j in parsed else self.paragraph_docs[old_index[j]]
+            for j in range(len(paragraphs))
+        ]
+        doc = stitch_paragraphs(docs)
+        offsets = paragraph_offsets(docs)
+
+        new_index = {old: new for new, old in old_index.items() if new not in dirty}
+        quotes = self._carry_quotes(doc, offsets, new_index) + self._find_quotes(
+            doc, offsets, dirty
+        )
+        quotes = sorted(quotes, key=lambda q: q.content.start)
+
+        run_coref = self.needs_coref(doc, offsets, changed, touched_old, quotes)
+        if run_coref:
+            self.coref_doc = sw.coref_nlp(text) if sw.coref_nlp else None
+            clusters = sw.make_clusters(self.coref_doc, doc)
+        else:
+            clusters = self._carry_clusters(doc, offsets, old_index)
+
+        self.paragraphs = paragraphs
+        self.paragraph_docs = docs
+        self.offsets = offsets
+        self.quotes = quotes
+        self.cluster_offsets = [
+            [(span.start_char, span.end_char) for span in cluster]
+            for cluster in clusters
+        ]
+        self.stats = {
+            "paragraphs": len(paragraphs),
+            "parsed": len(to_parse),
+            "quote_paragraphs": len(dirty),
+            "coref": run_coref,
+        }
+
+        sw.coref_doc = self.coref_doc
+        sw.doc = doc
+        sw.quotes = quotes
+        sw.clusters = clusters
+        sw.persons = [e for e in doc.ents if e.label_ == "PERSON"]
+        sw.quote_matches = sw.get_matches()
+        return
+
+    def needs_coref(
+        self,
+        doc: Doc,
+        offsets: List[tuple],
+        changed: Set[int],
+        touched_old: Set[int],
+        quotes: List[DQTriple],
+    ) -> bool:
+        """
+        Coref has to run again if there are no clusters yet, or if a new/edited paragraph has a PERSON, a third-person personal pronoun ("he", "her", ...) or a quote speaker in it, or if an old cluster member was in an edited/removed paragraph. Other pronouns ("it", "we", "they") and quotes without a speaker in the edit can't add a speaker mention.
+        """
+        if self.cluster_offsets is None:
+            return True
+        for j in changed:
+            para = doc[offsets[j][0] : offsets[j + 1][0]]
+            if any(e.label_ == "PERSON" for e in para.ents) or any(
+                tok.pos_ == "PRON" and tok.lower_ in PRONOUN_GENDERS for tok in para
+            ):
+                return True
+            if any(para.start <= t.i < para.end for q in quotes for t in q.speaker):
+                return True
+        old_char_starts = [o[1] for o in self.offsets]
+        return any(
+            bisect_right(old_char_starts, start) - 1 in touched_old
+            for cluster in self.cluster_offsets
+            for start, _ in cluster
+        )
+
+    def _carry_quotes(
+        self, doc: Doc, offsets: List[tuple], new_index: Dict[int, int]
+    ) -> List[DQTriple]:
+        """
+        Moves old quotes in paragraphs that didn't change (and aren't next to a change) onto the new Doc.
+        """
+        old_token_starts = [o[0] for o in self.offsets]
+        quotes = []
+        for q in self.quotes:
+            old_para = bisect_right(old_token_starts, q.content.start) - 1
+            if old_para not in new_index:
+                continue
+            shift = offsets[new_index[old_para]][0] - self.offsets[old_para][0]
+            quotes.append(
+                DQTriple(
+                    speaker=[doc[t.i + shift] for t in q.speaker],
+                    cue=[doc[t.i + shift] for t in q.cue],
+                    content=doc[q.content.start + shift : q.content.end + shift],
+                )
+            )
+        return quotes
+
+    def _find_quotes(
+        self, doc: Doc, offsets: List[tuple], dirty: Set[int]
+    ) -> List[DQTriple]:
+        """
+        Runs quote_finder on each run of dirty paragraphs, with one paragraph of context on either side, and keeps the quotes that start inside the run.
+        """
+        quotes = []
+        for start, end in _runs(sorted(dirty)):
+            context_start = offsets[max(start - 1, 0)][0]
+            context_end = offsets[min(end + 1, len(offsets) - 1)][0]
+            region = doc[context_start:context_end].as_doc()
+            for q in quote_finder(region):
+                if not (
+                    offsets[start][0]
+                    <= q.content.start + context_start
+                    < offsets[end][0]
+                ):
+                    continue
+                quotes.append(
+                    DQTriple(
+                        speaker=[doc[t.i + context_start] for t in q.speaker],
+                        cue=[doc[t.i + context_start] for t in q.cue],
+                        content=doc[
+                            q.content.start
+                            + context_start : q.content.end
+                            + context_start
+                        ],
+                    )
+                )
+        return quotes
+
+    def _carry_clusters(
+        self, doc: Doc, offsets: List[tuple], old_index: Dict[int, int]
+    ) -> list:
+        """
+        Moves the old clusters onto the new Doc by character offset.
+        """
+        new_index = {old: new for new, old in old_index.items()}
+        old_char_starts = [o[1] for o in self.offsets]
+        clusters = []
+        for cluster in self.cluster_offsets:
+            spans = []
+            for start, end in cluster:
+                old_para = bisect_right(old_char_starts, start) - 1
+                if old_para not in new_index:
+                    continue
+                shift = offsets[new_index[old_para]][1] - self.offsets[old_para][1]
+                span = doc.char_span(start + shift, end + shift)
+                if span is not None:
+                    spans.append(span)
+            if spans:
+                clusters.append(spans)
+        return clusters
+
+
+def _runs(indexes: List[int]) -> List[tuple]:
+    """
+    Groups sorted indexes into (start, end) runs of consecutive values, end exclusive.
+    """
+    runs = []
+    for i in indexes:
+        if runs and runs[-1][1] == i:
+            runs[-1] = (runs[-1][0], i + 1)
+        else:
+            runs.append((i, i + 1))
+    return runs
@@ -0,0 +1,57 @@
+"""
+Per-document resource limits.
+
+One pathological text (a 60k-word transcript, a page with thousands of quotation marks) can hold up a whole batch in the coref model or in the quadratic parts of quote_finder and SaysWho.make_pairs. With Limits set, SaysWho falls back to a cheaper path for that one document instead, and records what it did in SaysWho.fallbacks / AttributionResult.fallbacks:
+
+- "truncated": text was cut to max_tokens before parsing
+- "coref_skipped": text was longer than max_coref_tokens, so clusters are heuristic (see heuristic_coref.py)
+- "coref_skipped:unneeded": with SaysWho(selective_coref=True), every quote had a full-name speaker, so clusters are heuristic (not a limit, but recorded the same way)
+- "quotes_truncated": more than max_quote_candidates quote characters and linebreaks, so only the first ones were paired up
+- "prune_skipped": clusters had more than max_cluster_mentions members in total, so they weren't pruned
+- "<stage>_skipped:time": max_seconds ran out before stage (quotes, coref, prune or matching) started
+
+Each limit is off if None.
+"""
+import time
+from collections import namedtuple
+from .batching import TOKEN_REGEX
+
+Limits = namedtuple(
+    "Limits",
+    [
+        "max_tokens",
+        "max_coref_tokens",
+        "max_quote_candidates",
+        "max_cluster_mentions",
+        "max_seconds",
+    ],
+    defaults=[None] * 5,
+)
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """
+    Cuts text after max_tokens words and punctuation marks (counted like batching.estimate_tokens).
+    """
+    if max_tokens <= 0:
+        return ""
+    for n, m in enumerate(TOKEN_REGEX.finditer(text)):
+        if n == max_tokens - 1:
+            return text[: m.end()]
+    return text
+
+
+class Deadline:
+    """
+    Wall-clock budget for one document. Never expires if seconds is None.
+    """
+
+    def __init__(self, seconds: float = None, start: float = None):
+        self.expires = None
+        if seconds is not None:
+            self.expires = (
+                start if start is not None else time.perf_counter()
+            ) + seconds
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.perf_counter() > self.expires
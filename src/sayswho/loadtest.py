@@ -0,0 +1,375 @@
+"""
+End-to-end load testing.
+
+Replays a corpus file through SaysWho.attribute, SaysWho.pipe or a worker pool, either as fast as a fixed number of concurrent clients allow (closed loop) or at a target arrival rate (open loop, where latency includes time spent waiting to be picked up). The report has docs/sec, latency percentiles overall and by document size, and RSS sampled over the run. It's plain JSON, so it can be stored and compared against later runs:
+
+    python -m sayswho.loadtest corpus.jsonl --mode pipe --concurrency 2 --duration 60 --report run.json --baseline baseline.json --threshold 0.1
+
+exits with status 1 if anything regressed by more than 10%. --stub replaces the models with a stand-in that sleeps in proportion to document length, to test the harness and everything around the models without loading them.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from itertools import cycle, islice
+from typing import Callable, Dict, Iterator, List
+import numpy as np
+from .batching import estimate_tokens
+from .records import AttributionResult
+
+MODES = ["attribute", "pipe", "pool"]
+
+# upper bounds (in estimated tokens) of the size buckets in the report
+SIZE_BUCKETS = [250, 1000, 4000]
+
+# metric -> True if higher is better
+COMPARED_METRICS = {
+    "docs_per_sec": True,
+    "latency.p50": False,
+    "latency.p95": False,
+    "latency.p99": False,
+    "rss.peak": False,
+}
+
+
+def read_corpus(path: str) -> List[str]:
+    """
+    Reads a corpus file: JSON lines with a "text" field (.jsonl), or one document per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line)["text"] for line in f if line.strip()]
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+class StubSaysWho:
+    """
+    Stand-in for SaysWho that sleeps instead of running models: base_ms per call plus ms_per_1k_tokens for every thousand estimated tokens.
+    """
+
+    def __init__(self, base_ms: float = 2, ms_per_1k_tokens: float = 20):
+        self.base_ms = base_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+
+    def _work(self, texts: List[str]):
+        tokens = sum(estimate_tokens(t) for t in texts)
+        time.sleep((self.base_ms + self.ms_per_1k_tokens * tokens / 1000) / 1000)
+
+    def attribute(self, text: str):
+        self._work([text])
+        self.text = text
+
+    def to_result(self, release_docs: bool = False) -> AttributionResult:
+        return AttributionResult(self.text, [], [], [], [])
+
+    def pipe(self, texts, batch_size: int = 8):
+        texts = list(texts)
+        self._work(texts)
+        return [AttributionResult(t, [], [], [], []) for t in texts]
+
+
+def process_rss(pid: int = None) -> int:
+    """
+    Resident set size of a process in bytes (Linux). Falls back to this process's peak RSS elsewhere.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _total_rss(clients: list) -> int:
+    rss = process_rss()
+    for client in clients:
+        for p in getattr(client, "workers", []):
+            try:
+                rss += process_rss(p.pid)
+            except (OSError, AttributeError):
+                pass
+    return rss
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+    return {
+        "count": len(latencies),
+        "mean": float(np.mean(latencies)),
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+        "max": max(latencies),
+    }
+
+
+def size_bucket(tokens: int) -> str:
+    lower = 0
+    for upper in SIZE_BUCKETS:
+        if tokens < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+def _call(client, mode: str, texts: List[str], batch_size: int):
+    if mode == "attribute":
+        for text in texts:
+            client.attribute(text)
+            client.to_result(release_docs=True)
+    elif mode == "pipe":
+        list(client.pipe(texts, batch_size=batch_size))
+    else:
+        client.map(texts)
+
+
+def run_load(
+    factory: Callable,
+    texts: List[str],
+    mode: str = "attribute",
+    concurrency: int = 1,
+    rate: float = None,
+    duration: float = None,
+    passes: int = 1,
+    batch_size: int = 8,
+    sample_interval: float = 0.5,
+) -> dict:
+    """
+    Drives attributors with texts and measures throughput, latency and memory.
+
+    Input:
+        factory (callable) - no-argument function returning a client: a SaysWho (or StubSaysWho) for "attribute" and "pipe", or something with .map(texts) (ie ForkServer) for "pool"
+        texts (list of str) - corpus, replayed in order
+        mode (str) - "attribute" (one text per call), "pipe" (batch_size texts per call) or "pool" (batch_size texts per map call)
+        concurrency (int) - concurrent clients, each made by factory in its own thread
+        rate (float) - target arrivals in docs/sec. None runs closed loop, each client starting its next call as soon as the last one finishes.
+        duration (float) - seconds to keep replaying the corpus. If None, replays it passes times.
+        passes (int) - times through the corpus when duration is None
+        batch_size (int) - texts per call for "pipe" and "pool"
+        sample_interval (float) - seconds between RSS samples
+
+    Output:
+        report (dict) - config, docs, errors, duration, docs_per_sec, latency (seconds), latency_by_size, rss (bytes) and environment
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, not {mode}")
+    if not texts:
+        raise ValueError("Empty corpus.")
+    unit = 1 if mode == "attribute" else batch_size
+    clients = [factory() for _ in range(concurrency)]
+
+    jobs: Iterator[str] = (
+        cycle(texts)
+        if duration is not None
+        else islice(cycle(texts), len(texts) * passes)
+    )
+    lock = threading.Lock()
+    latencies, sizes, errors = [], [], [0]
+    arrivals = [0]
+    rss_samples = []
+    done = threading.Event()
+    start = time.perf_counter()
+
+    def next_unit():
+        with lock:
+            if done.is_set():
+                return None, None
+            batch = list(islice(jobs, unit))
+            if not batch:
+                return None, None
+            first = arrivals[0]
+            arrivals[0] += len(batch)
+        if rate is None:
+            return batch, None
+        return batch, [start + (first + n) / rate for n in range(len(batch))]
+
+    def client_loop(client):
+        while True:
+            batch, scheduled = next_unit()
+            if batch is None:
+                return
+            if scheduled is not None:
+                # a call can't start before its last text has arrived
+                time.sleep(max(0.0, scheduled[-1] - time.perf_counter()))
+            call_start = time.perf_counter()
+            try:
+                _call(client, mode, batch, batch_size)
+            except Exception:
+                with lock:
+                    errors[0] += len(batch)
+            else:
+                end = time.perf_counter()
+                with lock:
+                    for n, text in enumerate(batch):
+                        latencies.append(
+                            end - (scheduled[n] if scheduled else call_start)
+                        )
+                        sizes.append(estimate_tokens(text))
+            # failed calls count towards the duration too, or a client that always fails never stops
+            if duration is not None and time.perf_counter() - start >= duration:
+                done.set()
+
+    def sampler():
+        while not done.wait(sample_interval):
+            rss_samples.append(
+                [round(time.perf_counter() - start, 3), _total_rss(clients)]
+            )
+
+    sampler_thread = threading.Thread(target=sampler, daemon=True)
+    sampler_thread.start()
+    threads = [
+        threading.Thread(target=client_loop, args=(c,), daemon=True) for c in clients
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler_thread.join()
+    rss_samples.append([round(elapsed, 3), _total_rss(clients)])
+    for client in clients:
+        if hasattr(client, "close"):
+            client.close()
+
+    by_size = {}
+    for latency, tokens in zip(latencies, sizes):
+        by_size.setdefault(size_bucket(tokens), []).append(latency)
+    return {
+        "config": {
+            "mode": mode,
+            "concurrency": concurrency,
+            "rate": rate,
+            "duration": duration,
+            "passes": passes,
+            "batch_size": batch_size,
+            "corpus_docs": len(texts),
+        },
+        "docs": len(latencies),
+        "errors": errors[0],
+        "duration": elapsed,
+        "docs_per_sec": len(latencies) / elapsed,
+        "latency": _percentiles(latencies),
+        "latency_by_size": {k: _percentiles(v) for k, v in sorted(by_size.items())},
+        "rss": {"peak": max(s[1] for s in rss_samples), "samples": rss_samples},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+    }
+
+
+def _metric(report: dict, metric: str):
+    value = report
+    for key in metric.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare_reports(report: dict, baseline: dict, threshold: float = 0.1) -> List[dict]:
+    """
+    Finds metrics that got worse than baseline by more than threshold.
+
+    Input:
+        report (dict) - output of run_load
+        baseline (dict) - stored output of an earlier run_load
+        threshold (float) - allowed relative change (0.1 is 10%)
+
+    Output:
+        regressions (list of dict) - metric, baseline, current and change (relative, positive is worse)
+    """
+    regressions = []
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old, new = _metric(baseline, metric), _metric(report, metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if higher_is_better:
+            change = -change
+        if change > threshold:
+            regressions.append(
+                {"metric": metric, "baseline": old, "current": new, "change": change}
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test sayswho.")
+    parser.add_argument(
+        "corpus", help=".jsonl with a 'text' field, or one doc per line"
+    )
+    parser.add_argument("--mode", choices=MODES, default="attribute")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=None, help="target docs/sec")
+    parser.add_argument("--duration", type=float, default=None, help="seconds")
+    parser.add_argument("--passes", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None, help="pool workers")
+    parser.add_argument("--engine", choices=["coref", "fast"], default="coref")
+    parser.add_argument("--stub", action="store_true", help="don't load any models")
+    parser.add_argument("--stub-ms-per-1k-tokens", type=float, default=20)
+    parser.add_argument("--report", default=None, help="write the report here")
+    parser.add_argument("--baseline", default=None, help="report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    def make_attributor():
+        if args.stub:
+            return StubSaysWho(ms_per_1k_tokens=args.stub_ms_per_1k_tokens)
+        from . import SaysWho
+
+        return SaysWho(engine=args.engine)
+
+    def factory():
+        if args.mode == "pool":
+            from .pool import ForkServer
+
+            return ForkServer(
+                make_attributor(), workers=args.workers, batch_size=args.batch_size
+            )
+        return make_attributor()
+
+    report = run_load(
+        factory,
+        read_corpus(args.corpus),
+        mode=args.mode,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        duration=args.duration,
+        passes=args.passes,
+        batch_size=args.batch_size,
+    )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    latency = report["latency"]
+    print(
+        f"{report['docs']} docs in {report['duration']:.1f}s: "
+        f"{report['docs_per_sec']:.1f} docs/sec, "
+        f"p50 {latency.get('p50', 0) * 1000:.0f}ms, "
+        f"p95 {latency.get('p95', 0) * 1000:.0f}ms, "
+        f"p99 {latency.get('p99', 0) * 1000:.0f}ms, "
+        f"peak RSS {report['rss']['peak'] / 1024**2:.0f}MB, "
+        f"{report['errors']} errors"
+    )
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(report, json.load(f), args.threshold)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['metric']}: {r['baseline']:.4g} -> {r['current']:.4g} ({r['change']:+.1%})"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
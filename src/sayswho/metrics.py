@@ -0,0 +1,400 @@
+"""
+Prometheus metrics for long-running attribution processes.
+
+A MetricsRegistry holds counters and histograms and renders them in the Prometheus text exposition format. With SaysWho(metrics=registry), every attributed document is counted:
+
+- sayswho_documents_total, sayswho_quotes_total, sayswho_quotes_matched_total (quotes matched to at least one cluster) and sayswho_documents_unattributed_total (documents with no matches). Results served from a ResultCache aren't counted here again.
+- sayswho_cache_hits_total and sayswho_cache_misses_total, from SaysWho.pipe with a ResultCache
+- sayswho_fallbacks_total{fallback}, for SaysWho.limits and selective_coref (see limits.py)
+- sayswho_stage_seconds{stage} histogram for base, coref, quotes, clusters and matching. In SaysWho.pipe the models run in batches, so a model stage's time is recorded against whichever document pulled the batch through; sums and rates are right, single observations aren't.
+- sayswho_document_tokens histogram of base-model tokens per document
+
+Expose the numbers with registry.write(path) (eg for node_exporter's textfile collector) or registry.serve(port), which answers GET /metrics on localhost.
+
+Worker processes each have their own registry. Give it a directory and call flush() now and then (SaysWhoPool workers do after every chunk): each process writes its own snapshot file there (named by pid and a random tag, so a new process that gets a dead worker's pid doesn't overwrite it), and a registry with the same directory merges all of them into what it writes or serves. Counters from workers that have exited stay in the total.
+"""
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, List, Tuple
+
+STAGE_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+TOKEN_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (pid, snapshot file name) for this process, made again after a fork
+_snapshot_name = (None, None)
+
+
+def _process_snapshot_name() -> str:
+    """
+    This process's snapshot file name, unique even if its pid was used before.
+    """
+    global _snapshot_name
+    pid = os.getpid()
+    if _snapshot_name[0] != pid:
+        _snapshot_name = (pid, f"sayswho-{pid}-{os.urandom(4).hex()}.json")
+    return _snapshot_name[1]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(
+    names: Tuple[str, ...], values: Tuple[str, ...], extra: str = ""
+) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter, optionally split by labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[n]) for n in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(tuple(str(labels[n]) for n in self.label_names), 0)
+
+    def snapshot(self) -> list:
+        return [[list(k), v] for k, v in self.values.items()]
+
+    def merge(self, snapshot: list):
+        with self.lock:
+            for key, v in snapshot:
+                key = tuple(key)
+                self.values[key] = self.values.get(key, 0) + v
+
+    def lines(self) -> Iterator[str]:
+        for key, v in sorted(self.values.items()):
+            yield f"{self.name}{_label_text(self.label_names, key)} {_number(v)}"
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket upper bounds, optionally split by labels.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Iterable[float] = STAGE_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = sorted(buckets) + [math.inf]
+        # labels -> [bucket counts (not cumulative), sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.label_names)
+        i = next(i for i, upper in enumerate(self.buckets) if value <= upper)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the seconds spent in the with block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, iterable: Iterable, **labels) -> Iterator:
+        """
+        Yields from iterable, observing the seconds each item took to produce.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(time.perf_counter() - start, **labels)
+            yield item
+
+    def count(self, **labels) -> int:
+        entry = self.values.get(tuple(str(labels[n]) for n in self.label_names))
+        return entry[2] if entry else 0
+
+    def snapshot(self) -> list:
+        return [[list(k), v] for k, v in self.values.items()]
+
+    def merge(self, snapshot: list):
+        with self.lock:
+            for key, (counts, total, count) in snapshot:
+                key = tuple(key)
+                entry = self.values.get(key)
+                if entry is None:
+                    entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+
+    def lines(self) -> Iterator[str]:
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for upper, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_number(float(upper))}"'
+                yield f"{self.name}_bucket{_label_text(self.label_names, key, le)} {cumulative}"
+            labels = _label_text(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """
+    Named counters and histograms for one process.
+
+    Input:
+        directory (str) - if provided, flush() writes this process's snapshot here, and write()/serve() include every snapshot in it
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+        self.metrics = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def counter(self, name: str, help: str = "", labels: Tuple[str, ...] = ()):
+        """
+        The counter called name, created if it doesn't exist yet.
+        """
+        if name not in self.metrics:
+            self.metrics[name] = Counter(name, help, labels)
+        return self.metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        help: str = "",
+        labels: Tuple[str, ...] = (),
+        buckets: Iterable[float] = STAGE_BUCKETS,
+    ):
+        """
+        The histogram called name, created if it doesn't exist yet.
+        """
+        if name not in self.metrics:
+            self.metrics[name] = Histogram(name, help, labels, buckets)
+        return self.metrics[name]
+
+    def clear(self):
+        """
+        Zeroes every metric, ie in a freshly forked worker that shouldn't report its parent's counts again.
+        """
+        for metric in self.metrics.values():
+            # a lock held by another thread at fork time would never be released
+            metric.lock = threading.Lock()
+            metric.values = {}
+
+    def snapshot(self) -> dict:
+        """
+        JSON-serializable copy of every metric, for merge.
+        """
+        return {
+            name: {
+                "kind": m.kind,
+                "help": m.help,
+                "labels": list(m.label_names),
+                "buckets": [b for b in getattr(m, "buckets", []) if b != math.inf],
+                "values": m.snapshot(),
+            }
+            for name, m in self.metrics.items()
+        }
+
+    def merge(self, snapshot: dict):
+        """
+        Adds another registry's snapshot to this one.
+        """
+        for name, s in snapshot.items():
+            if s["kind"] == "counter":
+                metric = self.counter(name, s["help"], tuple(s["labels"]))
+            else:
+                metric = self.histogram(
+                    name, s["help"], tuple(s["labels"]), s["buckets"]
+                )
+            metric.merge(s["values"])
+
+    def flush(self):
+        """
+        Writes this process's snapshot to self.directory, replacing its last one.
+        """
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, _process_snapshot_name())
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _snapshot_files(self) -> List[str]:
+        own = _process_snapshot_name()
+        return [
+            os.path.join(self.directory, f)
+            for f in sorted(os.listdir(self.directory))
+            if f.startswith("sayswho-") and f.endswith(".json") and f != own
+        ]
+
+    def collect(self) -> "MetricsRegistry":
+        """
+        This registry merged with every other process's snapshot in self.directory.
+        """
+        merged = MetricsRegistry()
+        merged.merge(self.snapshot())
+        if self.directory is not None:
+            for path in self._snapshot_files():
+                try:
+                    with open(path) as f:
+                        merged.merge(json.load(f))
+                except (OSError, ValueError):
+                    # being replaced right now
+                    continue
+        return merged
+
+    def expose(self) -> str:
+        """
+        Every metric (merged with the snapshots in self.directory) in the Prometheus text format.
+        """
+        lines = []
+        for name, metric in sorted(self.collect().metrics.items()):
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """
+        Writes expose() to path atomically.
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.expose())
+        os.replace(tmp, path)
+
+    def serve(self, port: int = 9100, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serves expose() at GET /metrics from a background thread. Call .shutdown() on the returned server to stop it.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.expose().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                return
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class AttributionMetrics:
+    """
+    The metrics SaysWho records, registered on a MetricsRegistry.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.documents = registry.counter(
+            "sayswho_documents_total", "Documents attributed."
+        )
+        self.quotes = registry.counter("sayswho_quotes_total", "Quotes found.")
+        self.quotes_matched = registry.counter(
+            "sayswho_quotes_matched_total", "Quotes matched to at least one cluster."
+        )
+        self.unattributed = registry.counter(
+            "sayswho_documents_unattributed_total",
+            "Documents with no quote/cluster matches.",
+        )
+        self.cache_hits = registry.counter(
+            "sayswho_cache_hits_total", "Results found in the ResultCache."
+        )
+        self.cache_misses = registry.counter(
+            "sayswho_cache_misses_total", "Texts not in the ResultCache."
+        )
+        self.fallbacks = registry.counter(
+            "sayswho_fallbacks_total",
+            "Cheaper paths taken, by fallback (see limits.py).",
+            ("fallback",),
+        )
+        self.stage_seconds = registry.histogram(
+            "sayswho_stage_seconds", "Seconds per document by stage.", ("stage",)
+        )
+        self.tokens = registry.histogram(
+            "sayswho_document_tokens",
+            "Base model tokens per document.",
+            buckets=TOKEN_BUCKETS,
+        )
+
+    def time(self, stage: str):
+        return self.stage_seconds.time(stage=stage)
+
+    def timed(self, iterable: Iterable, stage: str) -> Iterator:
+        return self.stage_seconds.timed(iterable, stage=stage)
+
+    def record(self, quotes: int, matched: int, tokens: int, fallbacks: List[str]):
+        """
+        Counts one attributed document.
+        """
+        self.documents.inc()
+        self.quotes.inc(quotes)
+        self.quotes_matched.inc(matched)
+        if not matched:
+            self.unattributed.inc()
+        self.tokens.observe(tokens)
+        for fallback in fallbacks:
+            self.fallbacks.inc(fallback=fallback)
@@ -0,0 +1,161 @@
+"""
+Paragraph-at-a-time parsing.
+
+Texts are split on para_char the same way prep_document_for_quote_detection splits them. Each paragraph is parsed on its own (with its trailing para_char, so the "\\n" tokens quote_finder relies on are still there) and the paragraph Docs are stitched back together with Doc.from_docs. Parsed paragraphs can then be reused when the same paragraph shows up again, either in a new version of the same text (see incremental.py) or as boilerplate across many texts (see ParagraphCache).
+"""
+import hashlib
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from typing import Iterable, Iterator, List
+from spacy.language import Language
+from spacy.tokens import Doc
+
+
+def split_paragraphs(text: str, para_char: str = "\n") -> List[str]:
+    """
+    Splits text into paragraphs, keeping para_char on the end of every paragraph but the last, so "".join(paragraphs) == text.
+    """
+    paragraphs = text.split(para_char)
+    return [p + para_char for p in paragraphs[:-1]] + [paragraphs[-1]]
+
+
+def parse_paragraphs(nlp: Language, paragraphs: List[str]) -> List[Doc]:
+    return list(nlp.pipe(paragraphs))
+
+
+def stitch_paragraphs(docs: List[Doc]) -> Doc:
+    """
+    Joins paragraph Docs into one Doc. The text of the result is exactly the paragraphs joined with no extra whitespace.
+    """
+    return Doc.from_docs(docs, ensure_whitespace=False)
+
+
+def paragraph_offsets(docs: List[Doc]) -> List[tuple]:
+    """
+    Token and character offset of the start of each paragraph in the stitched Doc.
+
+    Output:
+        list(tuple) - (token offset, character offset) for every paragraph, plus the end of the Doc
+    """
+    offsets = [(0, 0)]
+    for doc in docs:
+        offsets.append((offsets[-1][0] + len(doc), offsets[-1][1] + len(doc.text)))
+    return offsets
+
+
+def paragraph_key(paragraph: str) -> bytes:
+    return hashlib.blake2b(paragraph.encode("utf-8"), digest_size=16).digest()
+
+
+class ParagraphCache:
+    """
+    Base-pipeline Docs for boilerplate paragraphs (bylines, copyright notices, "Load-Date" footers...), learned from how often each paragraph shows up.
+
+    Every paragraph seen is counted by hash. Once one has been seen min_count times it's parsed on its own and its Doc is kept, and from then on it's stitched into Docs instead of parsed again. The rest of each text is still parsed in runs of consecutive paragraphs, and texts with no cached paragraphs are parsed whole, exactly as without the cache.
+
+    Only the base pipeline is cached -- the coref model needs the whole text.
+
+    Input:
+        min_count (int) - times a paragraph has to be seen before it's cached
+        max_entries (int) - most paragraph Docs kept (least recently used are dropped)
+        max_tracked (int) - most paragraph counts kept. Past this, paragraphs seen only once are forgotten.
+        para_char (str) - paragraph separator
+
+    Attributes:
+        stats (dict) - hits (paragraphs reused), cached (paragraphs added to the cache), parsed (texts or runs of paragraphs sent to the model)
+    """
+
+    def __init__(
+        self,
+        min_count: int = 3,
+        max_entries: int = 10000,
+        max_tracked: int = 100000,
+        para_char: str = "\n",
+    ):
+        self.min_count = min_count
+        self.max_entries = max_entries
+        self.max_tracked = max_tracked
+        self.para_char = para_char
+        self.counts = defaultdict(int)
+        self.docs = OrderedDict()
+        self.stats = {"hits": 0, "cached": 0, "parsed": 0}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _plan(self, text: str) -> List[list]:
+        """
+        Splits text into parts: [text, Doc if cached else None, key to cache the parsed Doc under or None].
+        """
+        parts = []
+        run = ""
+        for paragraph in split_paragraphs(text, self.para_char):
+            if not paragraph.strip():
+                run += paragraph
+                continue
+            key = paragraph_key(paragraph)
+            if key in self.docs:
+                self.docs.move_to_end(key)
+                self.stats["hits"] += 1
+                part = [paragraph, self.docs[key], None]
+            else:
+                self.counts[key] += 1
+                if self.counts[key] < self.min_count:
+                    run += paragraph
+                    continue
+                part = [paragraph, None, key]
+            if run:
+                parts.append([run, None, None])
+                run = ""
+            parts.append(part)
+        if run:
+            parts.append([run, None, None])
+        if len(self.counts) > self.max_tracked:
+            for key in [k for k, n in self.counts.items() if n == 1]:
+                del self.counts[key]
+        if all(doc is None and key is None for _, doc, key in parts):
+            return [[text, None, None]]
+        return parts
+
+    def _remember(self, key: bytes, doc: Doc):
+        self.docs[key] = doc
+        self.stats["cached"] += 1
+        while len(self.docs) > self.max_entries:
+            self.docs.popitem(last=False)
+
+    def pipe(
+        self, nlp: Language, texts: Iterable[str], batch_size: int = 8
+    ) -> Iterator[Doc]:
+        """
+        Like nlp.pipe, reusing cached paragraphs.
+
+        Input:
+            nlp (Language) - base pipeline (always the same one for a given cache)
+            texts (iterable of str) - texts to parse
+            batch_size (int) - texts planned and parsed together
+
+        Output:
+            yields one Doc per text, in input order
+        """
+        texts = iter(texts)
+        while True:
+            chunk = list(islice(texts, batch_size))
+            if not chunk:
+                return
+            plans = [self._plan(text) for text in chunk]
+            to_parse = [part for plan in plans for part in plan if part[1] is None]
+            self.stats["parsed"] += len(to_parse)
+            for part, doc in zip(
+                to_parse, nlp.pipe([p[0] for p in to_parse], batch_size=batch_size)
+            ):
+                part[1] = doc
+                if part[2] is not None:
+                    self._remember(part[2], doc)
+            for plan in plans:
+                if len(plan) == 1:
+                    yield plan[0][1]
+                else:
+                    yield stitch_paragraphs([part[1] for part in plan])
+
+    def parse(self, nlp: Language, text: str) -> Doc:
+        return next(self.pipe(nlp, [text], batch_size=1))
@@ -0,0 +1,86 @@
+"""
+Loads spacy models with only the components sayswho actually reads.
+
+- base model: POS tags, lemmas, dependencies/sentences and entities (quote_finder, pronoun_check, person_check, PERSON matching)
+- coref model: coref clusters (span_cleaner stays, because it removes the "coref_head_clusters" span groups that would otherwise be picked up as clusters)
+
+Everything else is excluded at load time, along with the static vectors when nothing uses them. Vectors are kept if any component was trained with them (ie the tok2vec in en_core_web_md/lg), since dropping them would change the output.
+"""
+from collections import namedtuple
+from pathlib import Path
+from typing import Iterable, Tuple
+import spacy
+from spacy.language import Language
+
+BASE_COMPONENTS = {
+    "tok2vec",
+    "transformer",
+    "tagger",
+    "morphologizer",
+    "attribute_ruler",
+    "lemmatizer",
+    "parser",
+    "ner",
+}
+COREF_COMPONENTS = {"transformer", "coref", "span_resolver", "span_cleaner"}
+
+PipelineReport = namedtuple(
+    "PipelineReport", ["model", "kept", "excluded", "vectors_dropped"]
+)
+
+
+def model_path(name: str) -> Path:
+    """
+    Directory holding config.cfg and meta.json for an installed model package (or a model saved to disk).
+    """
+    if spacy.util.is_package(name):
+        package_path = spacy.util.get_package_path(name)
+        return next(package_path.glob("*/config.cfg")).parent
+    return Path(name)
+
+
+def uses_static_vectors(config: dict) -> bool:
+    """
+    Checks a pipeline config for any component that reads static vectors.
+    """
+    for k, v in config.items():
+        if k == "include_static_vectors" and v:
+            return True
+        if isinstance(v, str) and "StaticVectors" in v:
+            return True
+        if isinstance(v, dict) and uses_static_vectors(v):
+            return True
+    return False
+
+
+def load_trimmed(
+    name: str, keep: Iterable[str], keep_vectors: bool = False
+) -> Tuple[Language, PipelineReport]:
+    """
+    Loads a model, excluding every component not in keep (including disabled ones).
+
+    Input:
+        name (str) - model package name or path
+        keep (iterable of str) - component names to load
+        keep_vectors (bool) - if False, static vectors are dropped unless a kept component uses them
+
+    Output:
+        nlp (Language) - trimmed pipeline
+        report (PipelineReport) - what was kept and excluded
+    """
+    path = model_path(name)
+    meta = spacy.util.load_meta(path / "meta.json")
+    config = spacy.util.load_config(path / "config.cfg", interpolate=False)
+
+    components = meta.get("components", meta.get("pipeline", []))
+    kept = [c for c in components if c in keep]
+    excluded = [c for c in components if c not in keep]
+    vectors_dropped = not (
+        keep_vectors
+        or uses_static_vectors(
+            {k: v for k, v in config["components"].items() if k in kept}
+        )
+    )
+
+    nlp = spacy.load(name, exclude=excluded + (["vectors"] if vectors_dropped else []))
+    return nlp, PipelineReport(name, kept, excluded, vectors_dropped)
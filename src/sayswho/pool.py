@@ -0,0 +1,462 @@
+"""
+Worker pools for attributing texts in parallel.
+
+SaysWhoPool keeps persistent worker processes, each holding a loaded SaysWho, and sends them texts in chunks. Workers send back AttributionResults (plain records, see records.py), never spaCy objects. The number of chunks in flight is bounded, so a long input iterator is only read as fast as the workers keep up, and workers can be retired and replaced after a number of documents to contain memory growth.
+
+ForkServer is a SaysWhoPool that loads the models once and shares them between workers. Building a SaysWho in every worker process loads both spaCy models again each time. ForkServer loads and warms up one SaysWho in the parent, then forks the workers from it, so every worker starts with the parent's memory pages shared copy-on-write. A new worker costs a fork, not a model load.
+
+Pages only stay shared while nothing writes to them. The weight arrays live in NumPy/PyTorch buffers, apart from their Python object headers, so reference counting alone doesn't copy them. What does copy pages is the cyclic garbage collector, which writes to the header of every object it scans. gc.freeze() is called right before each fork so the children's collector leaves everything loaded in the parent alone. The parent calls gc.unfreeze() when the last pool that froze is closed.
+
+ForkServer is only available where the "fork" start method is (Linux, and macOS with caution).
+"""
+import gc
+import multiprocessing as mp
+import os
+from collections import deque
+from functools import partial
+from itertools import islice
+from multiprocessing.connection import wait
+from typing import Callable, Dict, Iterable, Iterator, List
+from . import runtime
+from .records import AttributionResult
+
+WARMUP_TEXT = 'Jane Smith was hired in May. "It is a great honor," she said. "I\'m ready to get to work."'
+
+
+def warm_up(sw, text: str = WARMUP_TEXT):
+    """
+    One dummy parse through every model, so lazy initialization happens once in the parent instead of in each worker.
+    """
+    list(sw.pipe([text]))
+    return
+
+
+def memory_usage(pid: int = None) -> Dict[str, int]:
+    """
+    Memory of a process in bytes, from /proc/<pid>/smaps_rollup (Linux only).
+
+    Output:
+        usage (dict) - rss, pss (shared pages split between the processes sharing them) and private (pages only this process has, ie copied on write)
+    """
+    fields = {
+        "Rss": "rss",
+        "Pss": "pss",
+        "Private_Clean": "private",
+        "Private_Dirty": "private",
+    }
+    usage = {"rss": 0, "pss": 0, "private": 0}
+    with open(f"/proc/{pid or os.getpid()}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in fields:
+                usage[fields[name]] += int(value.split()[0]) * 1024
+    return usage
+
+
+def _load_sayswho(sw_kwargs: dict):
+    from .attributor import SaysWho
+
+    return SaysWho(**sw_kwargs)
+
+
+def _worker(conn, threads: int, batch_size: int, factory, sw):
+    runtime.apply_thread_layout(threads)
+    if factory is None:
+        # SQLite connections can't be used across a fork
+        if getattr(sw, "cache", None) is not None:
+            sw.cache = None
+    else:
+        sw = factory()
+    metrics = getattr(sw, "metrics", None)
+    if factory is None and metrics is not None:
+        # counted from zero, so the parent's own counts aren't reported twice
+        metrics.registry.clear()
+    conn.send(("ready", None, None))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, texts = task
+        try:
+            conn.send(("result", task_id, list(sw.pipe(texts, batch_size=batch_size))))
+        except Exception as e:
+            conn.send(("error", task_id, repr(e)))
+        if metrics is not None:
+            metrics.registry.flush()
+
+
+class SaysWhoPool:
+    """
+    Persistent worker processes, each with a loaded SaysWho.
+
+    Input:
+        workers (int) - number of worker processes. Defaults to runtime.plan_layout().
+        threads (int) - PyTorch/BLAS threads per worker. Defaults to runtime.plan_layout().
+        factory (callable) - picklable, no-argument function run in each worker to build its attributor. Defaults to SaysWho(**sw_kwargs).
+        sw (SaysWho) - already loaded attributor to share with forked workers instead of building one per worker (see ForkServer). Needs the "fork" start method.
+        start_method (str) - multiprocessing start method. Defaults to "fork" if sw is given, else "spawn" (safe with PyTorch threads, but every worker loads its own models).
+        chunksize (int) - texts sent to a worker at a time
+        max_in_flight (int) - most chunks submitted but not yet returned to the caller. Defaults to 2 per worker.
+        max_docs_per_worker (int) - if provided, a worker is replaced after attributing this many texts
+        batch_size (int) - passed to SaysWho.pipe in the workers
+        sw_kwargs - passed to SaysWho by the default factory
+
+    Only one map/imap/imap_unordered can be running at a time. Use as a context manager, or call close() when done.
+
+    Each worker has its own pipe to the parent, and the parent hands a chunk to a worker only once it's idle, so it always knows which chunk each worker holds. A worker that dies in the middle of a chunk (killed, out of memory, a crash in native code) is replaced and the chunk is sent out again. If the same chunk kills a worker twice, or a worker dies before it's ready (ie factory failed), the map raises RuntimeError.
+
+    Attributes:
+        frozen_pools (int) - class attribute, open pools that called gc.freeze
+        stats (dict) - docs (returned so far), restarts (workers replaced after max_docs_per_worker) and crashes (workers replaced after dying)
+    """
+
+    frozen_pools = 0
+
+    def __init__(
+        self,
+        workers: int = None,
+        threads: int = None,
+        factory: Callable = None,
+        sw=None,
+        start_method: str = None,
+        chunksize: int = 4,
+        max_in_flight: int = None,
+        max_docs_per_worker: int = None,
+        batch_size: int = 8,
+        **sw_kwargs,
+    ):
+        layout = runtime.plan_layout(workers)
+        self.threads = threads or layout.threads
+        self.batch_size = batch_size
+        self.chunksize = chunksize
+        self.max_docs_per_worker = max_docs_per_worker
+        if sw is not None:
+            start_method = start_method or "fork"
+            if start_method != "fork":
+                raise ValueError("Sharing a loaded sw needs the 'fork' start method.")
+            self.sw = sw
+            self.factory = None
+        else:
+            self.sw = None
+            self.factory = factory or partial(_load_sayswho, sw_kwargs)
+        self.ctx = mp.get_context(start_method or "spawn")
+        self.workers = []
+        self.frozen = False
+        self.task_count = 0
+        # task_id -> texts, for every chunk submitted and not returned yet
+        self.pending = {}
+        # task_ids waiting for an idle worker
+        self.queued = deque()
+        # pid -> the parent's end of that worker's pipe
+        self.conns = {}
+        # pid -> task_id the worker is on (None when idle), from the moment it's sent
+        self.assigned = {}
+        # workers that are ready and idle
+        self.idle = []
+        # pid -> texts attributed, for max_docs_per_worker
+        self.worker_docs = {}
+        self.crashed_tasks = set()
+        self.stats = {"docs": 0, "restarts": 0, "crashes": 0}
+        for _ in range(workers or layout.workers):
+            self.add_worker()
+        self.max_in_flight = max_in_flight or 2 * len(self.workers)
+
+    def add_worker(self) -> int:
+        """
+        Starts one more worker.
+
+        Output:
+            pid (int) - worker process ID
+        """
+        if self.factory is None:
+            # keep the children's garbage collector off everything loaded so far
+            gc.freeze()
+            if not self.frozen:
+                self.frozen = True
+                SaysWhoPool.frozen_pools += 1
+        conn, child_conn = self.ctx.Pipe()
+        p = self.ctx.Process(
+            target=_worker,
+            args=(
+                child_conn,
+                self.threads,
+                self.batch_size,
+                self.factory,
+                # inherited by the forked worker, not pickled
+                self.sw,
+            ),
+            daemon=True,
+        )
+        p.start()
+        # only the worker holds its end now, so the parent reads EOF once it's gone
+        child_conn.close()
+        self.workers.append(p)
+        self.conns[p.pid] = conn
+        self.worker_docs[p.pid] = 0
+        return p.pid
+
+    def _remove_worker(self, pid: int):
+        for p in self.workers:
+            if p.pid == pid:
+                p.join()
+                self.workers.remove(p)
+                break
+        self.conns.pop(pid).close()
+        self.assigned.pop(pid, None)
+        self.worker_docs.pop(pid)
+        if pid in self.idle:
+            self.idle.remove(pid)
+
+    def _retire_worker(self, pid: int):
+        self.idle.remove(pid)
+        self.conns[pid].send(None)
+        self._remove_worker(pid)
+        self.add_worker()
+        self.stats["restarts"] += 1
+
+    def _submit(self, task_id: int, texts: List[str]):
+        self.pending[task_id] = texts
+        self.queued.append(task_id)
+
+    def _dispatch(self):
+        while self.queued and self.idle:
+            pid = self.idle.pop()
+            task_id = self.queued.popleft()
+            # recorded before sending, so a crash at any point after this resends the chunk
+            self.assigned[pid] = task_id
+            try:
+                self.conns[pid].send((task_id, self.pending[task_id]))
+            except OSError:
+                # it died while idle; _check_workers sends the chunk out again
+                pass
+
+    def _check_workers(self, dead: list, expected: set):
+        """
+        Replaces workers that died, and sends their chunk out again.
+        """
+        for p in dead:
+            if p.pid not in self.assigned:
+                raise RuntimeError(
+                    f"Pool worker {p.pid} exited with code {p.exitcode} before it was ready."
+                )
+            task_id = self.assigned[p.pid]
+            self._remove_worker(p.pid)
+            self.add_worker()
+            self.stats["crashes"] += 1
+            texts = self.pending.pop(task_id, None)
+            if texts is None or task_id not in expected:
+                continue
+            if task_id in self.crashed_tasks:
+                raise RuntimeError(
+                    f"Pool worker {p.pid} exited with code {p.exitcode}, twice on the same texts: {texts!r}"
+                )
+            self.crashed_tasks.add(task_id)
+            self._submit(task_id, texts)
+
+    def _receive(self, pid: int):
+        conn = self.conns[pid]
+        try:
+            if conn.poll():
+                return conn.recv()
+        except (EOFError, OSError):
+            # it's exiting, so its sentinel is about to fire
+            for p in self.workers:
+                if p.pid == pid:
+                    p.join()
+        return None
+
+    def _next_result(self, expected: set) -> tuple:
+        while True:
+            self._dispatch()
+            # anything a dead worker sent is already in its pipe, and is read below before it's replaced
+            dead = [p for p in self.workers if p.exitcode is not None]
+            received = False
+            for pid in list(self.conns):
+                if pid not in self.conns:
+                    continue
+                message = self._receive(pid)
+                if message is None:
+                    continue
+                received = True
+                kind, key, value = message
+                self.assigned[pid] = None
+                self.idle.append(pid)
+                if kind == "ready":
+                    continue
+                self.worker_docs[pid] += len(self.pending.pop(key, []))
+                self.crashed_tasks.discard(key)
+                if (
+                    self.max_docs_per_worker is not None
+                    and self.worker_docs[pid] >= self.max_docs_per_worker
+                    and not any(p.pid == pid for p in dead)
+                ):
+                    self._retire_worker(pid)
+                if key not in expected:
+                    # left over from an abandoned imap
+                    continue
+                elif kind == "error":
+                    raise RuntimeError(f"Pool worker failed: {value}")
+                else:
+                    return key, value
+            if dead:
+                self._check_workers(dead, expected)
+                continue
+            if received:
+                # a worker is idle now, so there may be a chunk to send it
+                continue
+            # wakes up on a message or a worker exiting
+            wait(list(self.conns.values()) + [p.sentinel for p in self.workers])
+
+    def _imap(
+        self, texts: Iterable[str], chunksize: int, ordered: bool
+    ) -> Iterator[AttributionResult]:
+        # chunks an abandoned imap never got to
+        for task_id in self.queued:
+            self.pending.pop(task_id, None)
+        self.queued.clear()
+        texts = iter(texts)
+        chunksize = chunksize or self.chunksize
+        submitted = deque()
+        expected = set()
+        finished = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(expected) + len(finished) < self.max_in_flight:
+                chunk = list(islice(texts, chunksize))
+                if not chunk:
+                    exhausted = True
+                    break
+                self._submit(self.task_count, chunk)
+                if ordered:
+                    submitted.append(self.task_count)
+                expected.add(self.task_count)
+                self.task_count += 1
+            if not expected and not finished:
+                return
+            if expected:
+                task_id, results = self._next_result(expected)
+                expected.remove(task_id)
+                finished[task_id] = results
+            while finished:
+                task_id = submitted[0] if ordered else next(iter(finished))
+                if task_id not in finished:
+                    break
+                if ordered:
+                    submitted.popleft()
+                results = finished.pop(task_id)
+                self.stats["docs"] += len(results)
+                yield from results
+
+    def imap(
+        self, texts: Iterable[str], chunksize: int = None
+    ) -> Iterator[AttributionResult]:
+        """
+        Attributes texts across the workers, yielding results in input order.
+
+        texts is read lazily, at most max_in_flight chunks ahead of what has been yielded.
+        """
+        return self._imap(texts, chunksize, ordered=True)
+
+    def imap_unordered(
+        self, texts: Iterable[str], chunksize: int = None
+    ) -> Iterator[AttributionResult]:
+        """
+        Like imap, but yields each chunk's results as soon as it's done. Match results to inputs with AttributionResult.text.
+        """
+        return self._imap(texts, chunksize, ordered=False)
+
+    def map(
+        self, texts: Iterable[str], chunksize: int = None
+    ) -> List[AttributionResult]:
+        """
+        Attributes texts across the workers.
+
+        Output:
+            results (list of AttributionResult) - in input order
+        """
+        return list(self.imap(texts, chunksize))
+
+    def worker_memory(self) -> Dict[int, Dict[str, int]]:
+        """
+        memory_usage for each live worker, by pid.
+        """
+        return {p.pid: memory_usage(p.pid) for p in self.workers if p.is_alive()}
+
+    def close(self):
+        for conn in self.conns.values():
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for p in self.workers:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        for conn in self.conns.values():
+            conn.close()
+        self.workers = []
+        self.conns = {}
+        if self.frozen:
+            self.frozen = False
+            SaysWhoPool.frozen_pools -= 1
+            # gc.freeze is process-wide, so leave it alone while another pool may still fork workers
+            if not SaysWhoPool.frozen_pools:
+                gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ForkServer(SaysWhoPool):
+    """
+    Pool of worker processes forked from one loaded, warmed-up SaysWho.
+
+    Input:
+        sw (SaysWho) - loaded attributor to share. If None, one is built here with threads and sw_kwargs.
+        workers (int) - number of workers to start. Defaults to runtime.plan_layout().
+        threads (int) - PyTorch/BLAS threads per worker. Defaults to runtime.plan_layout().
+        batch_size (int) - passed to SaysWho.pipe in the workers
+        warmup (bool) - if True, runs warm_up on sw before forking
+        pool_kwargs - passed to SaysWhoPool (chunksize, max_in_flight, max_docs_per_worker). Replacement workers are forked from the parent too, so restarting them is cheap.
+        sw_kwargs - passed to SaysWho if sw is None
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        sw=None,
+        workers: int = None,
+        threads: int = None,
+        batch_size: int = 8,
+        warmup: bool = True,
+        chunksize: int = 8,
+        max_in_flight: int = None,
+        max_docs_per_worker: int = None,
+        **sw_kwargs,
+    ):
+        if "fork" not in mp.get_all_start_methods():
+            raise RuntimeError("ForkServer needs the 'fork' start method.")
+        threads = threads or runtime.plan_layout(workers).threads
+        if sw is None:
+            from .attributor import SaysWho
+
+            sw = SaysWho(threads=threads, **sw_kwargs)
+        if warmup:
+            warm_up(sw)
+        super().__init__(
+            workers=workers,
+            threads=threads,
+            sw=sw,
+            start_method="fork",
+            chunksize=chunksize,
+            max_in_flight=max_in_flight,
+            max_docs_per_worker=max_docs_per_worker,
+            batch_size=batch_size,
+        )
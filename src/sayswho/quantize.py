@@ -0,0 +1,183 @@
+"""
+Int8 coref inference on CPU.
+
+The coref model's transformer forward pass is most of the per-document time on CPU. quantize_pipeline applies PyTorch dynamic quantization to every PyTorch module in a loaded pipeline (the transformer and the coref/span resolver heads): Linear weights are stored as int8 and activations are quantized on the fly, which runs the big matrix multiplications with int8 kernels. The pipeline still produces the same kind of Doc, with the same "coref_clusters_*" span groups for clone_cluster, so nothing downstream changes.
+
+Quantization can move cluster boundaries a little. cluster_divergence runs the full-precision and the quantized pipelines over a sample and reports how far apart their clusters are, along with the speedup:
+
+    python -m sayswho.quantize sample.jsonl --limit 200 --report divergence.json
+
+Use SaysWho(quantize_coref=True) once the numbers look acceptable for your corpus. Needs torch (installed with the coref model) and only works on CPU.
+"""
+import argparse
+import json
+import time
+from collections import namedtuple
+from itertools import combinations
+from typing import Dict, Iterable, List, Set, Tuple
+from spacy.language import Language
+from spacy.tokens import Doc
+
+QuantizationReport = namedtuple("QuantizationReport", ["modules", "linear_layers"])
+
+
+def quantize_pipeline(nlp: Language) -> QuantizationReport:
+    """
+    Quantizes the Linear layers of every PyTorch module in nlp to int8, in place.
+
+    Input:
+        nlp (Language) - loaded pipeline (ie SaysWho.coref_nlp)
+
+    Output:
+        report (QuantizationReport) - modules (component/node names that were quantized) and linear_layers (how many Linear layers were replaced)
+    """
+    try:
+        import torch
+    except ImportError:
+        raise ImportError(
+            "Quantization needs torch, which comes with the coref model's dependencies."
+        )
+    from thinc.api import PyTorchShim
+
+    modules, linear_layers = [], 0
+    for name, component in nlp.components:
+        model = getattr(component, "model", None)
+        if model is None:
+            continue
+        for node in model.walk():
+            for shim in node.shims:
+                if not isinstance(shim, PyTorchShim):
+                    continue
+                module = shim._model
+                if any(p.device.type != "cpu" for p in module.parameters()):
+                    raise ValueError(
+                        f"{name} is on the GPU; int8 dynamic quantization only runs on CPU."
+                    )
+                linear = sum(isinstance(m, torch.nn.Linear) for m in module.modules())
+                if not linear:
+                    continue
+                shim._model = torch.ao.quantization.quantize_dynamic(
+                    module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+                modules.append(f"{name}/{node.name}")
+                linear_layers += linear
+    return QuantizationReport(modules, linear_layers)
+
+
+def doc_clusters(doc: Doc) -> List[Set[Tuple[int, int]]]:
+    """
+    Coref clusters in doc as sets of (start_char, end_char), from the span groups SaysWho.make_clusters reads.
+    """
+    return [
+        {(span.start_char, span.end_char) for span in group}
+        for key, group in doc.spans.items()
+        if key.startswith("coref")
+    ]
+
+
+def _links(clusters: List[Set[Tuple[int, int]]]) -> Set[tuple]:
+    return {
+        tuple(sorted(pair)) for c in clusters for pair in combinations(sorted(c), 2)
+    }
+
+
+def _f1(reference: set, candidate: set) -> float:
+    if not reference and not candidate:
+        return 1.0
+    return 2 * len(reference & candidate) / (len(reference) + len(candidate))
+
+
+def cluster_divergence(
+    reference: Language, candidate: Language, texts: Iterable[str], batch_size: int = 8
+) -> Dict[str, float]:
+    """
+    Compares the coref clusters two pipelines find in texts.
+
+    Input:
+        reference (Language) - full-precision coref pipeline
+        candidate (Language) - ie the same pipeline after quantize_pipeline
+        texts (iterable of str) - sample corpus
+        batch_size (int) - passed to nlp.pipe
+
+    Output:
+        report (dict) -
+            docs
+            identical_docs - share of docs with exactly the same clusters
+            mention_f1 - F1 of candidate cluster members against reference ones, over all docs
+            link_f1 - same for pairs of mentions in the same cluster, so it also counts mentions that moved between clusters
+            cluster_count_diff - mean absolute difference in clusters per doc
+            reference_docs_per_sec, candidate_docs_per_sec and speedup
+    """
+    texts = list(texts)
+    results = {}
+    for label, nlp in [("reference", reference), ("candidate", candidate)]:
+        start = time.perf_counter()
+        results[label] = [
+            doc_clusters(d) for d in nlp.pipe(texts, batch_size=batch_size)
+        ]
+        results[f"{label}_seconds"] = time.perf_counter() - start
+
+    identical, count_diff = 0, 0
+    mentions = {"reference": set(), "candidate": set()}
+    links = {"reference": set(), "candidate": set()}
+    for n, (ref, cand) in enumerate(zip(results["reference"], results["candidate"])):
+        identical += sorted(map(sorted, ref)) == sorted(map(sorted, cand))
+        count_diff += abs(len(ref) - len(cand))
+        for label, clusters in [("reference", ref), ("candidate", cand)]:
+            mentions[label].update((n,) + m for c in clusters for m in c)
+            links[label].update((n,) + link for link in _links(clusters))
+
+    docs = len(texts)
+    reference_rate = docs / results["reference_seconds"] if docs else 0.0
+    candidate_rate = docs / results["candidate_seconds"] if docs else 0.0
+    return {
+        "docs": docs,
+        "identical_docs": identical / docs if docs else 1.0,
+        "mention_f1": _f1(mentions["reference"], mentions["candidate"]),
+        "link_f1": _f1(links["reference"], links["candidate"]),
+        "cluster_count_diff": count_diff / docs if docs else 0.0,
+        "reference_docs_per_sec": reference_rate,
+        "candidate_docs_per_sec": candidate_rate,
+        "speedup": candidate_rate / reference_rate if reference_rate else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check how far int8 coref clusters diverge from full precision."
+    )
+    parser.add_argument(
+        "corpus", help=".jsonl with a 'text' field, or one doc per line"
+    )
+    parser.add_argument("--coref-nlp", default="en_coreference_web_trf")
+    parser.add_argument("--limit", type=int, default=None, help="docs to compare")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--report", default=None, help="write the report here")
+    args = parser.parse_args()
+
+    from . import runtime
+    from .loadtest import read_corpus
+    from .pipeline import COREF_COMPONENTS, load_trimmed
+
+    if args.threads is not None:
+        runtime.apply_thread_layout(args.threads)
+    texts = read_corpus(args.corpus)[: args.limit]
+    reference, _ = load_trimmed(args.coref_nlp, COREF_COMPONENTS)
+    candidate, _ = load_trimmed(args.coref_nlp, COREF_COMPONENTS)
+    quantized = quantize_pipeline(candidate)
+    report = cluster_divergence(reference, candidate, texts, args.batch_size)
+    report["quantized"] = quantized._asdict()
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(
+        f"{report['docs']} docs: {report['identical_docs']:.1%} identical, "
+        f"mention F1 {report['mention_f1']:.3f}, link F1 {report['link_f1']:.3f}, "
+        f"{report['speedup']:.2f}x faster "
+        f"({report['reference_docs_per_sec']:.1f} -> {report['candidate_docs_per_sec']:.1f} docs/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
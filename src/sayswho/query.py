@@ -0,0 +1,229 @@
+"""
+Targeted speaker queries.
+
+For jobs that only ask what a known set of people said, SpeakerQuery skips everything that can't involve them:
+- documents that never mention a target name or alias (a single regex search) don't go through the models at all
+- in the rest, paragraphs more than context paragraphs away from a mention are blanked out with spaces before parsing, so offsets don't change but the models only see the relevant parts
+- documents with no quotes left don't go through the coref model
+- only clusters with a target mention in them are cloned, pruned and matched
+- results only have the quotes matched to those clusters
+
+Aliases are matched as whole words and are case-sensitive. By default each multi-word name's last word (usually the surname) is an alias too, which catches "Rogers added" but also any other Rogers; pass surnames=False and list aliases explicitly to be stricter.
+"""
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Set, Union
+import regex as re
+from spacy.tokens import Doc
+from . import helpers
+from .paragraphs import split_paragraphs
+from .records import AttributionResult, ClusterRecord, QuoteRecord
+from .constants import QuoteClusterMatch
+from .limits import Deadline
+
+
+class SpeakerQuery:
+    """
+    Attributes only the quotes of a set of target people.
+
+    Input:
+        sw (SaysWho) - loaded attributor. Its prep_text, limits, paragraph_cache and selective_coref settings are used.
+        targets (dict or iterable of str) - target name -> list of aliases, or just target names
+        context (int) - paragraphs kept on either side of each paragraph with a mention, for quotes attributed by pronoun
+        para_char (str) - paragraph boundary
+        surnames (bool) - if True, the last word of every multi-word name or alias is an alias too
+
+    Attributes:
+        stats (dict) - docs, skipped_docs (no mention), paragraphs, kept_paragraphs, clusters and target_clusters, summed over every text so far
+    """
+
+    def __init__(
+        self,
+        sw,
+        targets: Union[Dict[str, List[str]], Iterable[str]],
+        context: int = 2,
+        para_char: str = "\n",
+        surnames: bool = True,
+    ):
+        self.sw = sw
+        self.context = context
+        self.para_char = para_char
+        if not isinstance(targets, dict):
+            targets = {t: [] for t in targets}
+        self.aliases = {}
+        for target, aliases in targets.items():
+            names = [target] + list(aliases)
+            if surnames:
+                names += [n.split()[-1] for n in names if len(n.split()) > 1]
+            for name in names:
+                self.aliases.setdefault(name, target)
+        if not self.aliases:
+            raise ValueError("No target names.")
+        self.regex = re.compile(
+            r"\b(?:"
+            + "|".join(
+                re.escape(a) for a in sorted(self.aliases, key=len, reverse=True)
+            )
+            + r")\b"
+        )
+        self.stats = {
+            "docs": 0,
+            "skipped_docs": 0,
+            "paragraphs": 0,
+            "kept_paragraphs": 0,
+            "clusters": 0,
+            "target_clusters": 0,
+        }
+
+    def targets_in(self, text: str) -> Set[str]:
+        """
+        Targets mentioned in text by name or alias.
+        """
+        return {self.aliases[m.group()] for m in self.regex.finditer(text)}
+
+    def targets_of(self, cluster: ClusterRecord) -> Set[str]:
+        """
+        Targets named by a cluster's non-pronoun members.
+        """
+        return {t for name in cluster.names() for t in self.targets_in(name)}
+
+    def reduce(self, text: str) -> str:
+        """
+        Blanks out paragraphs more than self.context paragraphs away from a mention, keeping text the same length.
+        """
+        paragraphs = split_paragraphs(text, self.para_char)
+        hits = [n for n, p in enumerate(paragraphs) if self.regex.search(p)]
+        keep = set()
+        for n in hits:
+            keep.update(range(n - self.context, n + self.context + 1))
+        self.stats["paragraphs"] += len(paragraphs)
+        self.stats["kept_paragraphs"] += len(keep.intersection(range(len(paragraphs))))
+        return "".join(
+            p
+            if n in keep
+            else self.para_char.join(
+                " " * len(line) for line in p.split(self.para_char)
+            )
+            for n, p in enumerate(paragraphs)
+        )
+
+    def keep_cluster(self, cluster) -> bool:
+        """
+        Does a cluster of Spans have a target mention in it?
+        """
+        self.stats["clusters"] += 1
+        if any(self.regex.search(span.text) for span in cluster):
+            self.stats["target_clusters"] += 1
+            return True
+        return False
+
+    def attribute(self, text: str) -> AttributionResult:
+        """
+        Attributes one text. See pipe.
+        """
+        return next(self.pipe([text], batch_size=1))
+
+    def pipe(
+        self, texts: Iterable[str], batch_size: int = 8
+    ) -> Iterator[AttributionResult]:
+        """
+        Attributes target quotes in a stream of texts.
+
+        Output:
+            yields one AttributionResult per text, in input order, with only the target clusters and the quotes matched to them. text is the full prepped text, and all offsets point into it.
+        """
+        sw = self.sw
+        texts = iter(texts)
+        while True:
+            chunk = list(islice(texts, batch_size))
+            if not chunk:
+                return
+            if sw.prep_text:
+                chunk = [
+                    helpers.prep_text_for_quote_detection(t, para_char=self.para_char)
+                    for t in chunk
+                ]
+            self.stats["docs"] += len(chunk)
+            todo = []
+            results = {}
+            for n, text in enumerate(chunk):
+                if self.regex.search(text) is None:
+                    self.stats["skipped_docs"] += 1
+                    continue
+                todo.append((n,) + sw.check_text(self.reduce(text)))
+            docs = sw.parse_base((t for _, t, _, _, _ in todo), batch_size)
+            parsed = []
+            for (n, text, fallbacks, use_coref, start), doc in zip(todo, docs):
+                deadline = Deadline(sw.limits.max_seconds, start)
+                quotes = sw.find_quotes(doc, fallbacks, deadline)
+                if not quotes:
+                    if fallbacks:
+                        results[n] = AttributionResult(
+                            chunk[n], [], [], [], [], fallbacks
+                        )
+                    continue
+                if use_coref and deadline.expired():
+                    use_coref = False
+                    fallbacks.append("coref_skipped:time")
+                elif use_coref and sw.selective_coref and not sw.needs_coref(quotes):
+                    use_coref = False
+                    fallbacks.append("coref_skipped:unneeded")
+                parsed.append((n, text, fallbacks, use_coref, start, doc, quotes))
+            coref_docs = sw.parse_coref((p[1] for p in parsed if p[3]), batch_size)
+            for n, _, fallbacks, use_coref, start, doc, quotes in parsed:
+                coref_doc = next(coref_docs) if use_coref else None
+                results[n] = self._match(
+                    chunk[n], coref_doc, doc, fallbacks, start, quotes
+                )
+            for n, text in enumerate(chunk):
+                yield results.get(n) or AttributionResult(text, [], [], [], [])
+
+    def _match(
+        self,
+        text: str,
+        coref_doc: Doc,
+        doc: Doc,
+        fallbacks: list,
+        start: float,
+        quotes: list,
+    ) -> AttributionResult:
+        """
+        Builds and matches the target clusters, and keeps only the quotes matched to them.
+        """
+        sw = self.sw
+        sw.parse_docs(
+            coref_doc,
+            doc,
+            fallbacks=fallbacks,
+            start=start,
+            quotes=quotes,
+            keep_cluster=self.keep_cluster,
+        )
+        sw.persons = [p for p in sw.persons if self.regex.search(p.text)]
+        sw.quote_matches = sw.match_quotes()
+        result = sw.to_result(release_docs=True)
+        kept = sorted({m.quote_index for m in result.matches})
+        new_index = {old: new for new, old in enumerate(kept)}
+        return AttributionResult(
+            text,
+            [result.quotes[i] for i in kept],
+            result.clusters,
+            result.persons,
+            [
+                QuoteClusterMatch(new_index[m.quote_index], m.cluster_index)
+                for m in result.matches
+            ],
+            result.fallbacks,
+        )
+
+    def quotes_by_target(
+        self, result: AttributionResult
+    ) -> Dict[str, List[QuoteRecord]]:
+        """
+        Groups a result's quotes by the target their cluster names.
+        """
+        by_target = {}
+        for quote, cluster in result.expand_matches():
+            for target in sorted(self.targets_of(cluster)):
+                if quote not in by_target.setdefault(target, []):
+                    by_target[target].append(quote)
+        return by_target
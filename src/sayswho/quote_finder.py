@@ -3,31 +3,114 @@ This is just my version of the Textacy quote attributor. Will remove this if/whe
 """
 
 from . import constants
+from collections import namedtuple
 from operator import attrgetter
+import numpy as np
 import regex as re
 from typing import Literal, Iterable
+from spacy.attrs import IS_QUOTE, LEMMA, ORTH, POS, SPACY
+from spacy.strings import hash_string
 from spacy.tokens import Doc, Token, Span
 from spacy.symbols import VERB, PUNCT
 
+REPORTING_VERB_HASHES = np.array(
+    [hash_string(v) for v in constants._reporting_verbs], dtype="uint64"
+)
 
-def quote_finder(doc: Doc):
-    """ """
-    qtoks = [tok for tok in doc if tok.is_quote or (re.match(r"\n", tok.text))]
-    qtok_idx_pairs = [(-1, -1)]
-    for n, q in enumerate(qtoks):
-        if (
-            not bool(q.whitespace_)
-            and q.i not in [q_[1] for q_ in qtok_idx_pairs]
-            and q.i > qtok_idx_pairs[-1][1]
-        ):
-            for q_ in qtoks[n + 1 :]:
-                if (ord(q.text), ord(q_.text)) in constants.QUOTATION_MARK_PAIRS:
-                    qtok_idx_pairs.append((q.i, q_.i))
-                    break
-    qtok_idx_pairs = qtok_idx_pairs[1:]
+
+QuoteIndex = namedtuple("QuoteIndex", ["positions", "codes", "spaced", "linebreaks"])
+
+
+def build_quote_index(doc: Doc) -> QuoteIndex:
+    """
+    Finds quotation marks and linebreaks in doc from doc.to_array, once per doc.
+
+    Token texts are only looked at once per distinct ORTH, not once per token.
+
+    Input:
+        doc (Doc) - parsed doc
+
+    Output:
+        QuoteIndex
+            positions (np.array) - token indexes of quote candidates: quotation marks and tokens starting with a linebreak
+            codes (np.array) - code point of each candidate (-1 for multi-character tokens, which never pair)
+            spaced (np.array) - whether each candidate is followed by whitespace
+            linebreaks (np.array) - token indexes of tokens starting with a linebreak
+    """
+    if not len(doc):
+        empty = np.array([], dtype="int64")
+        return QuoteIndex(empty, empty, np.array([], dtype=bool), empty)
+    attrs = doc.to_array([IS_QUOTE, ORTH, SPACY])
+    orths, inverse = np.unique(attrs[:, 1], return_inverse=True)
+    texts = [doc.vocab.strings[int(orth)] for orth in orths]
+    is_linebreak = np.array([t.startswith("\n") for t in texts])[inverse]
+    codes = np.array([ord(t) if len(t) == 1 else -1 for t in texts])[inverse]
+    positions = np.flatnonzero((attrs[:, 0] != 0) | is_linebreak)
+    return QuoteIndex(
+        positions,
+        codes[positions],
+        attrs[positions, 2] != 0,
+        np.flatnonzero(is_linebreak),
+    )
+
+
+def pair_quotes(quote_index: QuoteIndex) -> list[tuple]:
+    """
+    Pairs opening quotation marks with the next candidate that closes them (see constants.QUOTATION_MARK_PAIRS).
+
+    An opener has to have no whitespace after it and come after the last closer. For each kind of opener, the possible closers are found with one mask, and each opener's closer with a binary search.
+
+    Output:
+        list[tuple] - (opener, closer) token indexes
+    """
+    positions = quote_index.positions.tolist()
+    codes = quote_index.codes
+    closers = {}
+    for code in set(codes.tolist()):
+        closing_codes = [b for a, b in constants.QUOTATION_MARK_PAIRS if a == code]
+        if closing_codes:
+            closers[code] = np.flatnonzero(np.isin(codes, closing_codes))
+    qtok_idx_pairs = []
+    last_close = -1
+    for n, (i, code, spaced) in enumerate(
+        zip(positions, codes.tolist(), quote_index.spaced.tolist())
+    ):
+        if spaced or i <= last_close or code not in closers:
+            continue
+        k = np.searchsorted(closers[code], n, side="right")
+        if k < len(closers[code]):
+            last_close = positions[closers[code][k]]
+            qtok_idx_pairs.append((i, last_close))
+    return qtok_idx_pairs
+
+
+def quote_finder(doc: Doc, max_candidates: int = None, quote_index: QuoteIndex = None):
+    """
+    Input:
+        doc (Doc) - parsed doc
+        max_candidates (int) - if provided, only the first max_candidates quotation marks and linebreaks are paired up, which bounds the pairing loop on docs with thousands of quotation marks
+        quote_index (QuoteIndex) - build_quote_index(doc), if it's already been built
+    """
+    if quote_index is None:
+        quote_index = build_quote_index(doc)
+    candidates = quote_index._replace(
+        positions=quote_index.positions[:max_candidates],
+        codes=quote_index.codes[:max_candidates],
+        spaced=quote_index.spaced[:max_candidates],
+    )
+    qtok_idx_pairs = pair_quotes(candidates)
+    sents = list(doc.sents)
+
+    # in_quote[i] is True if token i is inside (or on) a quote pair
+    in_quote = np.zeros(len(doc) + 1, dtype="int64")
+    for start, end in qtok_idx_pairs:
+        in_quote[start] += 1
+        in_quote[end + 1] -= 1
+    in_quote = np.cumsum(in_quote)[:-1] > 0
+    cue_index = build_cue_index(doc)
 
     def filter_quote_tokens(tok):
-        return any(qts_idx <= tok.i <= qte_idx for qts_idx, qte_idx in qtok_idx_pairs)
+        return in_quote[tok.i]
 
     for qtok_start_idx, qtok_end_idx in qtok_idx_pairs:
         content = doc[qtok_start_idx:qtok_end_idx]
@@ -42,17 +125,14 @@ def quote_finder(doc: Doc):
             continue
 
         for window_sents in [
-            windower(content, "overlap"),
-            windower(content, "linebreaks"),
+            windower(content, "overlap", sents=sents),
+            windower(content, "linebreaks", quote_index.linebreaks, sents),
         ]:
             # get candidate cue verbs in window
             cue_candidates = [
                 tok
-                for sent in window_sents
-                for tok in sent
-                if tok.pos == VERB
-                and tok.lemma_ in constants._reporting_verbs
-                and not filter_quote_tokens(tok)
+                for tok in window_cue_candidates(window_sents, cue_index)
+                if not filter_quote_tokens(tok)
             ]
             cue_candidates = sorted(
                 cue_candidates,
@@ -87,6 +167,48 @@ def quote_finder(doc: Doc):
                 break
 
 
+def build_cue_index(doc: Doc) -> np.ndarray:
+    """
+    Finds every token in doc that could be a cue: a VERB with a reporting verb lemma.
+
+    Done once per doc from doc.to_array, comparing lemma hashes instead of looking up strings, so each quote window only has to slice the result.
+
+    Input:
+        doc (Doc) - parsed doc
+
+    Output:
+        cue_index (np.array) - sorted token indexes of candidate cue verbs
+    """
+    if not len(doc):
+        return np.array([], dtype="int64")
+    attrs = doc.to_array([POS, LEMMA])
+    return np.flatnonzero(
+        (attrs[:, 0] == VERB) & np.isin(attrs[:, 1], REPORTING_VERB_HASHES)
+    )
+
+
+def window_cue_candidates(
+    window_sents: Iterable[Span], cue_index: np.ndarray
+) -> list[Token]:
+    """
+    Candidate cue verbs in a quote window, in document order.
+
+    cue_index is sorted, so each sentence's candidates are one slice of it.
+
+    Input:
+        window_sents (list[Span]) - sentences from windower
+        cue_index (np.array) - output of build_cue_index for the sentences' doc
+
+    Output:
+        list[Token] - candidate cue verbs
+    """
+    candidates = []
+    for sent in window_sents:
+        i, j = np.searchsorted(cue_index, [sent.start, sent.end])
+        candidates += [sent.doc[k] for k in cue_index[i:j].tolist()]
+    return candidates
+
+
 def expand_noun(tok: Token) -> list[Token]:
     """Expand a noun token to include all associated conjunct and compound nouns."""
     tok_and_conjuncts = [tok] + list(tok.conjuncts)
@@ -107,7 +229,12 @@ def expand_verb(tok: Token) -> list[Token]:
     return [tok] + verb_modifiers
 
 
-def windower(quote: Span, method: Literal["overlap", "linebreaks"]) -> Iterable[Span]:
+def windower(
+    quote: Span,
+    method: Literal["overlap", "linebreaks"],
+    linebreaks: np.ndarray = None,
+    sents: list[Span] = None,
+) -> Iterable[Span]:
     """
     Finds the range of sentences in which to look for quote attribution.
 
@@ -119,38 +246,40 @@ def windower(quote: Span, method: Literal["overlap", "linebreaks"]) -> Iterable[
     Input:
         quote (Span) - quote to be attributed
         method (str) - how the sentence range will be determined
+        linebreaks (np.array) - token indexes of linebreaks in quote.doc (QuoteIndex.linebreaks), so the doc isn't scanned again for every quote
+        sents (list[Span]) - list(quote.doc.sents), for the same reason
 
     Output:
         sents (list) - list of sentences
     """
+    if sents is None:
+        sents = list(quote.doc.sents)
     if method == "overlap":
         return [
             sent
-            for sent in quote.doc.sents
+            for sent in sents
             if (sent.start < quote.start < sent.end)
             or (sent.start < quote.end < sent.end)
         ]
     else:
         sent_indexes = [
             n
-            for n, s in enumerate(quote.doc.sents)
+            for n, s in enumerate(sents)
             if (s.start <= quote.start <= s.end) or (s.start <= quote.end <= s.end)
         ]
 
         i_sent = sent_indexes[0] - 1 if sent_indexes[0] > 0 else 0
         j_sent = sent_indexes[-1] + 2
-        sents = list(quote.doc.sents)[i_sent:j_sent]
+        sents = sents[i_sent:j_sent]
         if method == "linebreaks":
-            linebreaks = (
-                [0]
-                + [tok.i for tok in quote.doc if re.match(r"\n", tok.text)]
-                + [quote.doc[-1].i]
-            )
-            linebreak_limits = [
-                lb for lb in linebreaks if sents[0].start < lb <= quote.end + 1
+            if linebreaks is None:
+                linebreaks = build_quote_index(quote.doc).linebreaks
+            linebreaks = np.concatenate(([0], linebreaks, [quote.doc[-1].i]))
+            linebreak_limits = linebreaks[
+                (linebreaks > sents[0].start) & (linebreaks <= quote.end + 1)
             ]
-            if linebreak_limits:
-                return [s for s in sents if s.end <= max(linebreak_limits)]
+            if len(linebreak_limits):
+                return [s for s in sents if s.end <= linebreak_limits.max()]
         return sents
 
 
@@ -174,15 +303,13 @@ def prep_text_for_quote_detection(t: str, fix_plural_possessives: bool = True) -
     if not t:
         return
 
-    t = t.replace("''", '"')
+    p = t.replace("''", '"')
     if fix_plural_possessives:
-        t = re.sub(r"(.{3,8}s\')(\s)", r"\1x\2", t)
+        p = re.sub(r"(.{3,8}s\')(\s)", r"\1x\2", p)
+    any_double_quote = constants.BRACK_REGEX.format(constants.DOUBLE_QUOTES)
     while re.search(constants.DOUBLE_QUOTES_NOSPACE_REGEX, p):
         match = re.search(constants.DOUBLE_QUOTES_NOSPACE_REGEX, p)
-        if (
-            len(re.findall(constants.ANY_DOUBLE_QUOTE_REGEX, p[: match.start()])) % 2
-            != 0
-        ):
+        if len(re.findall(any_double_quote, p[: match.start()])) % 2 != 0:
             replacer = '" '
         else:
             replacer = ' "'
@@ -190,7 +317,7 @@ def prep_text_for_quote_detection(t: str, fix_plural_possessives: bool = True) -
     if (
         not (p[0] == "'" and p[-1] == "'")
         and p[0] in constants.ALL_QUOTES
-        and len(re.findall(constants.ANY_DOUBLE_QUOTE_REGEX, p[1:])) % 2 == 0
+        and len(re.findall(any_double_quote, p[1:])) % 2 == 0
     ):
         p += '"'
     return p.strip()
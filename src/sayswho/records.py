@@ -0,0 +1,233 @@
+"""
+Compact, Doc-free records of attribution results.
+
+SaysWho.quotes, .clusters and .persons are built from live spacy Tokens and Spans, so holding on to any of them keeps the whole Doc (and its vocab) alive. These records keep only strings, character offsets and integer indexes, so they are small, pickle cheaply and can be sent between processes.
+"""
+from array import array
+import srsly
+from typing import Iterator, List, Union
+from spacy.tokens import Span, Token
+from .constants import DQTriple, QuoteClusterMatch
+from .helpers import get_boundaries, get_text
+
+
+class SpanRecord:
+    """
+    Text and character offsets of a span (or list of tokens) in the source text. text is always source_text[start:end].
+    """
+
+    __slots__ = ("text", "start", "end")
+
+    def __init__(self, text: str, start: int, end: int):
+        self.text = text
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_span(cls, t: Union[Span, Token, List[Token]]) -> "SpanRecord":
+        """
+        Input:
+            t (Span, Token or list[Token]) - lists (ie quote speakers and cues) run from the first token to the last, including any text between them
+        """
+        if isinstance(t, list):
+            start = get_boundaries(t[0]).start
+            end = get_boundaries(t[-1]).end
+            return cls(t[0].doc.text[start:end], start, end)
+        start, end = get_boundaries(t)
+        return cls(get_text(t), start, end)
+
+    def to_list(self) -> list:
+        return [self.text, self.start, self.end]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SpanRecord) and self.to_list() == other.to_list()
+
+    def __repr__(self) -> str:
+        return f"SpanRecord({self.text!r}, {self.start}, {self.end})"
+
+
+class QuoteRecord:
+    """
+    Doc-free version of DQTriple.
+    """
+
+    __slots__ = ("speaker", "cue", "content")
+
+    def __init__(self, speaker: SpanRecord, cue: SpanRecord, content: SpanRecord):
+        self.speaker = speaker
+        self.cue = cue
+        self.content = content
+
+    @classmethod
+    def from_triple(cls, quote: DQTriple) -> "QuoteRecord":
+        return cls(*[SpanRecord.from_span(t) for t in quote])
+
+    def to_dict(self) -> dict:
+        return {
+            "speaker": self.speaker.to_list(),
+            "cue": self.cue.to_list(),
+            "content": self.content.to_list(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "QuoteRecord":
+        return cls(*[SpanRecord(*d[k]) for k in ["speaker", "cue", "content"]])
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, QuoteRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"QuoteRecord(speaker={self.speaker.text!r}, cue={self.cue.text!r}, content={self.content.text!r})"
+
+
+class ClusterRecord:
+    """
+    Doc-free version of a coref cluster. Member offsets are stored in flat integer arrays.
+    """
+
+    __slots__ = ("texts", "starts", "ends", "pronouns")
+
+    def __init__(self, texts: list, starts: array, ends: array, pronouns: array):
+        self.texts = texts
+        self.starts = starts
+        self.ends = ends
+        self.pronouns = pronouns
+
+    @classmethod
+    def from_spans(cls, cluster: list) -> "ClusterRecord":
+        """
+        Input:
+            cluster (SpanGroup or list[Span]) - coref cluster
+        """
+        return cls(
+            [span.text for span in cluster],
+            array("l", [span.start_char for span in cluster]),
+            array("l", [span.end_char for span in cluster]),
+            array("b", [span[0].pos_ == "PRON" for span in cluster]),
+        )
+
+    def names(self) -> list:
+        """
+        Unique non-pronoun member texts. Same as helpers.format_cluster.
+        """
+        return list(set([t for t, p in zip(self.texts, self.pronouns) if not p]))
+
+    def to_dict(self) -> dict:
+        return {
+            "texts": self.texts,
+            "starts": self.starts.tolist(),
+            "ends": self.ends.tolist(),
+            "pronouns": self.pronouns.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ClusterRecord":
+        return cls(
+            list(d["texts"]),
+            array("l", d["starts"]),
+            array("l", d["ends"]),
+            array("b", d["pronouns"]),
+        )
+
+    def __iter__(self) -> Iterator[SpanRecord]:
+        for t, s, e in zip(self.texts, self.starts, self.ends):
+            yield SpanRecord(t, s, e)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ClusterRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"ClusterRecord({self.names()})"
+
+
+class AttributionResult:
+    """
+    Everything SaysWho.attribute finds in one text, without any spacy objects.
+
+    quotes, clusters and matches line up with SaysWho.quotes, SaysWho.clusters and SaysWho.quote_matches, so QuoteClusterMatch indexes work the same way. fallbacks lists any cheaper paths taken because of SaysWho.limits (see limits.py).
+    """
+
+    __slots__ = ("text", "quotes", "clusters", "persons", "matches", "fallbacks")
+
+    def __init__(
+        self,
+        text: str,
+        quotes: List[QuoteRecord],
+        clusters: List[ClusterRecord],
+        persons: List[SpanRecord],
+        matches: List[QuoteClusterMatch],
+        fallbacks: List[str] = None,
+    ):
+        self.text = text
+        self.quotes = quotes
+        self.clusters = clusters
+        self.persons = persons
+        self.matches = matches
+        self.fallbacks = fallbacks or []
+
+    @classmethod
+    def from_attributor(cls, sw) -> "AttributionResult":
+        """
+        Input:
+            sw (SaysWho) - attributor that has already run .attribute
+        """
+        return cls(
+            sw.doc.text,
+            [QuoteRecord.from_triple(q) for q in sw.quotes],
+            [ClusterRecord.from_spans(c) for c in sw.clusters],
+            [SpanRecord.from_span(p) for p in sw.persons],
+            [
+                QuoteClusterMatch(int(m.quote_index), int(m.cluster_index))
+                for m in sw.quote_matches
+            ],
+            list(getattr(sw, "fallbacks", [])),
+        )
+
+    def expand_matches(self) -> Iterator[tuple]:
+        """
+        Yields (QuoteRecord, ClusterRecord) for every quote/cluster match.
+        """
+        for m in self.matches:
+            yield self.quotes[m.quote_index], self.clusters[m.cluster_index]
+
+    def to_dict(self) -> dict:
+        return {
+            "text": self.text,
+            "quotes": [q.to_dict() for q in self.quotes],
+            "clusters": [c.to_dict() for c in self.clusters],
+            "persons": [p.to_list() for p in self.persons],
+            "matches": [list(m) for m in self.matches],
+            "fallbacks": self.fallbacks,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "AttributionResult":
+        return cls(
+            d["text"],
+            [QuoteRecord.from_dict(q) for q in d["quotes"]],
+            [ClusterRecord.from_dict(c) for c in d["clusters"]],
+            [SpanRecord(*p) for p in d["persons"]],
+            [QuoteClusterMatch(*m) for m in d["matches"]],
+            list(d.get("fallbacks", [])),
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        msgpack encoding of to_dict.
+        """
+        return srsly.msgpack_dumps(self.to_dict())
+
+    @classmethod
+    def from_bytes(cls, b: bytes) -> "AttributionResult":
+        return cls.from_dict(srsly.msgpack_loads(b))
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, AttributionResult) and self.to_dict() == other.to_dict()
+        )
+
+    def __repr__(self) -> str:
+        return f"AttributionResult(quotes={len(self.quotes)}, clusters={len(self.clusters)}, matches={len(self.matches)})"
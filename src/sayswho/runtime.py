@@ -0,0 +1,205 @@
+"""
+Worker and thread layout for CPU-only hosts.
+
+When several SaysWho processes run side by side, each one lets PyTorch (under the coref transformer) and NumPy's BLAS use every core, and the machine oversubscribes. These helpers work out how many cores the process is actually allowed (CPU affinity and cgroup quotas), split them into workers x threads, and pin the thread pools before the models load.
+
+Typical use, at the very top of each worker process:
+    layout = configure()
+    sw = SaysWho()
+
+Or measure instead of guessing:
+    best, scores = calibrate(sample_texts)
+"""
+import math
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from collections import namedtuple
+from typing import Callable, List, Optional, Tuple
+
+ThreadLayout = namedtuple("ThreadLayout", ["workers", "threads"])
+
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def cgroup_cpu_limit(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """
+    CPU quota from cgroups (v2 cpu.max, or v1 cpu.cfs_quota_us/cpu.cfs_period_us), in cores. None if there's no limit.
+    """
+    try:
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Cores this process can actually use: CPU affinity, capped by any cgroup quota.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.floor(limit)))
+    return cpus
+
+
+def candidate_layouts(cpus: int = None) -> List[ThreadLayout]:
+    """
+    Layouts that use every core without oversubscribing: threads per worker in powers of 2, as many workers as fit.
+    """
+    cpus = cpus or available_cpus()
+    layouts = []
+    threads = 1
+    while threads <= cpus:
+        layouts.append(ThreadLayout(cpus // threads, threads))
+        threads *= 2
+    return layouts
+
+
+def plan_layout(workers: int = None, cpus: int = None) -> ThreadLayout:
+    """
+    Splits the available cores between worker processes.
+
+    Input:
+        workers (int) - number of worker processes. If None, uses 2 threads per worker (1 on hosts with 2 cores or fewer), which is a reasonable default for CPU transformer inference -- run calibrate to measure.
+        cpus (int) - cores to split. Defaults to available_cpus().
+
+    Output:
+        ThreadLayout(workers, threads)
+    """
+    cpus = cpus or available_cpus()
+    if workers is None:
+        threads = 1 if cpus <= 2 else 2
+        return ThreadLayout(max(1, cpus // threads), threads)
+    workers = max(1, min(workers, cpus))
+    return ThreadLayout(workers, max(1, cpus // workers))
+
+
+def apply_thread_layout(threads: int):
+    """
+    Limits this process's thread pools to threads.
+
+    The environment variables only affect libraries that haven't been imported yet, so call this before importing sayswho's models (or anything that loads NumPy/PyTorch). PyTorch is also limited directly if it's already imported, and NumPy's BLAS if threadpoolctl is installed.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # can only be set before any inter-op work has started
+            pass
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+    return
+
+
+def configure(workers: int = None) -> ThreadLayout:
+    """
+    Plans a layout and applies its thread count to this process.
+    """
+    layout = plan_layout(workers)
+    apply_thread_layout(layout.threads)
+    return layout
+
+
+def _calibration_worker(factory, threads, texts, batch_size, barrier, results):
+    apply_thread_layout(threads)
+    sw = factory()
+    list(sw.pipe(texts[:1], batch_size=batch_size))
+    barrier.wait()
+    start = time.perf_counter()
+    list(sw.pipe(texts, batch_size=batch_size))
+    results.put((len(texts), time.perf_counter() - start))
+
+
+def _default_factory():
+    from . import SaysWho
+
+    return SaysWho()
+
+
+def calibrate(
+    texts: List[str],
+    layouts: List[ThreadLayout] = None,
+    factory: Callable = None,
+    batch_size: int = 8,
+) -> Tuple[ThreadLayout, List[Tuple[ThreadLayout, float]]]:
+    """
+    Runs a short benchmark of each layout and picks the one with the best throughput.
+
+    For every layout, starts layout.workers fresh processes (spawned, so the thread limits apply before anything is imported). Each loads the models, warms up, then runs all of texts once. Timing starts once every worker is loaded.
+
+    Input:
+        texts (list of str) - sample input, a few dozen representative documents is plenty
+        layouts (list of ThreadLayout) - layouts to try. Defaults to candidate_layouts().
+        factory (callable) - picklable, no-argument function returning a loaded attributor. Defaults to SaysWho().
+        batch_size (int) - passed to pipe
+
+    Output:
+        best (ThreadLayout) - layout with the most docs/sec
+        scores (list of tuple) - (layout, docs/sec) for every layout tried
+    """
+    layouts = layouts or candidate_layouts()
+    factory = factory or _default_factory
+    ctx = mp.get_context("spawn")
+    scores = []
+    for layout in layouts:
+        barrier = ctx.Barrier(layout.workers)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(
+                target=_calibration_worker,
+                args=(factory, layout.threads, texts, batch_size, barrier, results),
+            )
+            for _ in range(layout.workers)
+        ]
+        for p in procs:
+            p.start()
+        timings = []
+        while len(timings) < len(procs):
+            try:
+                timings.append(results.get(timeout=1))
+            except queue.Empty:
+                if any(p.exitcode not in (None, 0) for p in procs):
+                    for p in procs:
+                        p.terminate()
+                    raise RuntimeError(f"Calibration worker failed for {layout}.")
+        for p in procs:
+            p.join()
+        docs = sum(t[0] for t in timings)
+        scores.append((layout, docs / max(t[1] for t in timings)))
+    best = max(scores, key=lambda s: s[1])[0]
+    return best, scores
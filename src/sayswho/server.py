@@ -0,0 +1,277 @@
+"""
+Small asyncio HTTP server for attribution.
+
+Incoming requests are collected into micro-batches (up to max_batch_size texts, or whatever arrives within max_wait_ms of the first one) and run through SaysWho.pipe in a single worker thread, so the models see batches instead of one text at a time.
+
+Endpoints:
+    POST /attribute - body {"text": "..."}, returns AttributionResult.to_dict()
+    GET /health - queue depth and counters
+
+Run with:
+    python -m sayswho.server --port 8000
+
+and add --metrics-port 9100 to serve Prometheus metrics (see metrics.py) on localhost:9100/metrics.
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Union
+
+HTTP_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class AttributionServer:
+    """
+    Micro-batching attribution server.
+
+    Input:
+        sw (SaysWho) - loaded attributor (anything with a .pipe(texts, batch_size) method that yields AttributionResults)
+        host (str) - interface to bind, localhost by default
+        port (int) - port to bind (0 picks a free port)
+        max_batch_size (int) - most texts sent to the models at once
+        max_wait_ms (float) - how long to wait for a batch to fill after the first request arrives
+        max_queue (int) - most requests waiting for a batch. Requests past this get a 503 straight away.
+        request_timeout (float) - seconds before a request gets a 504
+    """
+
+    def __init__(
+        self,
+        sw,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10,
+        max_queue: int = 64,
+        request_timeout: float = 30,
+    ):
+        self.sw = sw
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+        self._queue = None
+        self._server = None
+        self._batcher = None
+        # models aren't thread-safe, so every batch runs on the same thread
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def start(self):
+        """
+        Binds the socket and starts the batching loop.
+        """
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self._executor.shutdown(wait=False)
+        return
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def attribute(self, text: str) -> dict:
+        """
+        Queues one text for the next batch and waits for its result.
+
+        Raises asyncio.QueueFull if the queue is full and asyncio.TimeoutError after request_timeout.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await asyncio.wait_for(future, self.request_timeout)
+
+    async def _next_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # requests that timed out while waiting don't need to be run
+        return [(t, f) for t, f in batch if not f.done()]
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            self.stats["batches"] += 1
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._run_batch, [t for t, _ in batch]
+                )
+            except Exception as e:
+                for _, f in batch:
+                    if not f.done():
+                        f.set_exception(e)
+                continue
+            for (_, f), result in zip(batch, results):
+                if f.done():
+                    continue
+                if isinstance(result, Exception):
+                    f.set_exception(result)
+                else:
+                    f.set_result(result)
+
+    def _run_batch(self, texts: List[str]) -> List[Union[dict, Exception]]:
+        """
+        Runs a batch through the models.
+
+        Input:
+            texts (List[str]) - texts in the batch
+
+        Output:
+            results (List[Union[dict, Exception]]) - AttributionResult.to_dict() for each text, or the exception it raised
+        """
+        try:
+            return [
+                r.to_dict() for r in self.sw.pipe(texts, batch_size=self.max_batch_size)
+            ]
+        except Exception as e:
+            if len(texts) == 1:
+                return [e]
+            # one bad text shouldn't fail everyone else's request, so retry them one at a time
+            return [self._run_batch([text])[0] for text in texts]
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            **self.stats,
+        }
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            status, payload = await self._route(reader)
+        except Exception as e:
+            status, payload = 400, {"error": str(e)}
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _route(self, reader: asyncio.StreamReader) -> Tuple[int, dict]:
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+        if path == "/health":
+            return 200, self.health()
+        if path != "/attribute":
+            return 404, {"error": f"no route {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        payload = json.loads(body)
+        text = payload.get("text") if isinstance(payload, dict) else None
+        if not isinstance(text, str):
+            return 400, {"error": 'body must be {"text": "..."}'}
+        self.stats["requests"] += 1
+        try:
+            return 200, await self.attribute(text)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return 503, {"error": "queue full"}
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return 504, {"error": f"timed out after {self.request_timeout}s"}
+        except Exception as e:
+            self.stats["errors"] += 1
+            return 500, {"error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the sayswho attribution server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="serve Prometheus metrics on this localhost port",
+    )
+    args = parser.parse_args()
+
+    from . import SaysWho
+
+    registry = None
+    if args.metrics_port is not None:
+        from .metrics import MetricsRegistry
+
+        registry = MetricsRegistry()
+        registry.serve(args.metrics_port)
+
+    server = AttributionServer(
+        SaysWho(metrics=registry),
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue,
+        request_timeout=args.request_timeout,
+    )
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Corpus-wide speaker canonicalization.
+
+Every result is attributed on its own, so "Vaughn", "Jacque Vaughn" and "Coach Vaughn" come out as unrelated strings. SpeakerIndex gives each speaker a stable integer ID across articles:
+- every name is normalized (lowercased, possessives and punctuation dropped) and filed under a blocking key (its last token, usually the surname)
+- a new name is compared with rapidfuzz only against names in its own block
+- all non-pronoun names in one cluster (ClusterRecord.names / helpers.format_cluster) share an ID
+
+The index is kept in memory for lookups and persisted to SQLite as it grows, so nothing is ever recomputed over the whole corpus.
+"""
+import sqlite3
+from collections import defaultdict
+from typing import Iterable, List, Optional
+import regex as re
+from rapidfuzz import fuzz, process
+from .records import AttributionResult
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS speakers (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT PRIMARY KEY,
+    speaker_id INTEGER NOT NULL REFERENCES speakers(id)
+);
+"""
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercases, drops possessives (including the "'x" added by prep_text_for_quote_detection) and punctuation, collapses whitespace.
+    """
+    name = re.sub(r"['’][sx]\b", "", name.lower())
+    name = re.sub(r"[^\w\s-]", " ", name)
+    return " ".join(name.split())
+
+
+def blocking_key(alias: str) -> str:
+    """
+    Last token of a normalized name.
+    """
+    return alias.rsplit(" ", 1)[-1]
+
+
+class SpeakerIndex:
+    """
+    Incremental, persistent speaker name -> canonical speaker ID index.
+
+    Input:
+        path (str) - SQLite file for the index (":memory:" to keep it in memory only)
+        threshold (float) - minimum rapidfuzz token_set_ratio for two names in the same block to be the same speaker
+    """
+
+    def __init__(self, path: str = ":memory:", threshold: float = 90):
+        self.threshold = threshold
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.names = dict(self.conn.execute("SELECT id, name FROM speakers"))
+        self.aliases = {}
+        self.blocks = defaultdict(dict)
+        self.alias_counts = defaultdict(int)
+        for alias, speaker_id in self.conn.execute(
+            "SELECT alias, speaker_id FROM aliases"
+        ):
+            self._remember(alias, speaker_id)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _remember(self, alias: str, speaker_id: int):
+        self.aliases[alias] = speaker_id
+        self.blocks[blocking_key(alias)][alias] = speaker_id
+        self.alias_counts[speaker_id] += 1
+
+    def lookup(self, name: str) -> Optional[int]:
+        """
+        Speaker ID for a name, or None if it doesn't match anyone in the index.
+
+        Exact aliases are a dict lookup. Otherwise the name is fuzzy-matched against its block; ties go to the speaker with more aliases.
+
+        Multi-token names are only fuzzy-matched against multi-token aliases, so "Tom Vaughn" doesn't match everyone who's been called just "Vaughn".
+        """
+        alias = normalize_name(name)
+        if not alias:
+            return None
+        if alias in self.aliases:
+            return self.aliases[alias]
+        block = self.blocks.get(blocking_key(alias), {})
+        candidates = [a for a in block if " " in a] if " " in alias else list(block)
+        if not candidates:
+            return None
+        matches = process.extract(
+            alias,
+            candidates,
+            scorer=fuzz.token_set_ratio,
+            score_cutoff=self.threshold,
+            limit=None,
+        )
+        if not matches:
+            return None
+        best = max(m[1] for m in matches)
+        return max(
+            (block[m[0]] for m in matches if m[1] == best),
+            key=lambda speaker_id: self.alias_counts[speaker_id],
+        )
+
+    def add(self, name: str) -> Optional[int]:
+        """
+        Speaker ID for a name, adding it to the index if it's new.
+        """
+        return self.add_cluster([name])
+
+    def add_cluster(self, names: Iterable[str]) -> Optional[int]:
+        """
+        Assigns one speaker ID to all names from a single cluster.
+
+        The ID is the one matched by the longest known name, or a new one named after the longest name. If the cluster has any multi-token names, only those are looked up, so a "Vaughn" in a cluster with "Tom Vaughn" doesn't pull it into Jacque Vaughn's ID. Every name that isn't an alias yet becomes an alias of that ID.
+
+        Input:
+            names (iterable of str) - non-pronoun cluster member texts
+
+        Output:
+            speaker_id (int) - None if there were no usable names
+        """
+        names = sorted(
+            set(n for n in names if normalize_name(n)),
+            key=lambda n: len(normalize_name(n)),
+            reverse=True,
+        )
+        if not names:
+            return None
+        full_names = [n for n in names if " " in normalize_name(n)]
+        speaker_id = next(
+            (i for i in map(self.lookup, full_names or names) if i is not None), None
+        )
+        if speaker_id is None:
+            speaker_id = self.conn.execute(
+                "INSERT INTO speakers (name) VALUES (?)", (names[0],)
+            ).lastrowid
+            self.names[speaker_id] = names[0]
+        new_aliases = [
+            a for a in set(normalize_name(n) for n in names) if a not in self.aliases
+        ]
+        self.conn.executemany(
+            "INSERT INTO aliases (alias, speaker_id) VALUES (?, ?)",
+            [(a, speaker_id) for a in new_aliases],
+        )
+        for a in new_aliases:
+            self._remember(a, speaker_id)
+        return speaker_id
+
+    def add_result(self, result: AttributionResult) -> List[Optional[int]]:
+        """
+        Adds every cluster in a result to the index.
+
+        Output:
+            speaker_ids (list) - one speaker ID per cluster in result.clusters (None for clusters with no names)
+        """
+        speaker_ids = [self.add_cluster(c.names()) for c in result.clusters]
+        self.conn.commit()
+        return speaker_ids
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -1,6 +1,12 @@
+import pickle
 import pytest
 import spacy
+from spacy.tokens import Doc
 from sayswho import SaysWho
+from sayswho.cache import ResultCache
+from sayswho.helpers import DQTriple, speaker_needs_coref
+from sayswho.limits import Limits
+from sayswho.records import AttributionResult, SpanRecord
 
 spacy.prefer_gpu()
 
@@ -47,3 +53,115 @@ def test_html_viz(says_who_loaded):
     expected_html = open("./tests/test_viz.html").read()
     test_html = says_who_loaded.render_to_html(save_file=False)
     assert len(test_html) == len(expected_html)
+
+
+def test_result_records(says_who_loaded):
+    result = says_who_loaded.to_result()
+    for q in result.quotes:
+        for span in [q.speaker, q.cue, q.content]:
+            assert span.text == result.text[span.start : span.end]
+    assert result.matches == says_who_loaded.quote_matches
+    assert AttributionResult.from_bytes(result.to_bytes()) == result
+    assert pickle.loads(pickle.dumps(result)) == result
+
+
+def test_span_record_tokens():
+    words = ["Ben", "Simmons", "'s", "coach", "has", "n't", "said"]
+    spaces = [True, False, True, True, False, True, False]
+    doc = Doc(spacy.blank("en").vocab, words=words, spaces=spaces)
+    speaker = SpanRecord.from_span([doc[0], doc[1], doc[2]])
+    assert speaker.to_list() == ["Ben Simmons's", 0, 13]
+    # a cue with a token left out still covers the text in between
+    cue = SpanRecord.from_span([doc[4], doc[6]])
+    assert cue.text == doc.text[cue.start : cue.end] == "hasn't said"
+
+
+def test_limits(says_who_loaded):
+    sw = says_who_loaded
+    text = open("./tests/qa_test_file.txt").read()
+    try:
+        sw.limits = Limits(max_coref_tokens=10, max_quote_candidates=2)
+        sw.attribute(text)
+        assert sw.fallbacks == ["coref_skipped", "quotes_truncated"]
+        assert len(sw.quotes) < 4
+        assert sw.to_result().fallbacks == sw.fallbacks
+    finally:
+        sw.limits = Limits()
+        sw.attribute(text)
+    assert sw.fallbacks == []
+
+
+def test_pipe_deadline(says_who_loaded):
+    sw = says_who_loaded
+    text = open("./tests/qa_test_file.txt").read()
+    try:
+        sw.limits = Limits(max_seconds=0)
+        for selective in [False, True]:
+            sw.selective_coref = selective
+            result = next(sw.pipe([text]))
+            assert "quotes_skipped:time" in result.fallbacks
+            assert result.quotes == []
+    finally:
+        sw.limits = Limits()
+        sw.selective_coref = False
+
+
+def test_attribute_result_cache(says_who_loaded):
+    sw = says_who_loaded
+    text = open("./tests/qa_test_file.txt").read()
+    try:
+        sw.cache = ResultCache()
+        first = sw.attribute_result(text)
+        assert sw.attribute_result(text) == first
+        assert sw.cache.stats["memory_hits"] == 1
+        assert first == next(sw.pipe([text]))
+    finally:
+        sw.cache = None
+
+
+def test_deadline_results_not_cached(says_who_loaded):
+    sw = says_who_loaded
+    text = open("./tests/qa_test_file.txt").read()
+    try:
+        sw.cache = ResultCache()
+        sw.limits = Limits(max_seconds=0)
+        for _ in range(2):
+            assert "quotes_skipped:time" in sw.attribute_result(text).fallbacks
+        assert sw.cache.stats["puts"] == 0
+        assert sw.cache.stats["misses"] == 2
+    finally:
+        sw.cache = None
+        sw.limits = Limits()
+
+
+def test_speaker_needs_coref():
+    words = ["Ross", "Rogers", "said", "he", "told", "Rogers", "and", "the", "clerk"]
+    pos = ["PROPN", "PROPN", "VERB", "PRON", "VERB", "PROPN", "CCONJ", "DET", "NOUN"]
+    ents = ["B-PERSON", "I-PERSON", "O", "O", "O", "B-PERSON", "O", "O", "O"]
+    doc = Doc(spacy.blank("en").vocab, words=words, pos=pos, ents=ents)
+    quote = lambda *speaker: DQTriple([doc[i] for i in speaker], [doc[2]], doc[2:3])
+    assert not speaker_needs_coref(quote(0, 1))
+    assert speaker_needs_coref(quote(3))
+    assert speaker_needs_coref(quote(5))
+    assert speaker_needs_coref(quote(7, 8))
+
+
+def test_selective_coref(says_who_loaded):
+    sw = says_who_loaded
+    text = open("./tests/qa_test_file.txt").read()
+    full_names = 'Ross Rogers was driving. "Then this guy came from the restaurant," Ross Rogers added.'
+    try:
+        sw.selective_coref = True
+        # "he" and "she" need coref
+        sw.attribute(text)
+        assert sw.fallbacks == []
+        sw.attribute(full_names)
+        assert sw.fallbacks == ["coref_skipped:unneeded"]
+        assert len(sw.quote_matches) == 1
+        sw.attribute(full_names, need_clusters=True)
+        assert sw.fallbacks == []
+        results = list(sw.pipe([text, full_names]))
+        assert [r.fallbacks for r in results] == [[], ["coref_skipped:unneeded"]]
+    finally:
+        sw.selective_coref = False
+        sw.attribute(text)
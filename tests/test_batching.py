@@ -0,0 +1,22 @@
+import spacy
+from sayswho.batching import estimate_tokens, pipe_by_length, plan_batches
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('"Hi there," he said.') == 8
+
+
+def test_plan_batches():
+    lengths = [10, 500, 12, 480, 11, 5000]
+    batches = plan_batches(lengths, token_budget=1000)
+    assert batches == [[0, 4, 2], [3, 1], [5]]
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+    for b in batches[:-1]:
+        assert len(b) * max(lengths[i] for i in b) <= 1000
+
+
+def test_pipe_by_length_keeps_order():
+    nlp = spacy.blank("en")
+    texts = ["word " * n for n in [3, 40, 1, 25, 7, 2, 60]]
+    docs = list(pipe_by_length(nlp, texts, token_budget=50, buffer_size=4))
+    assert [d.text for d in docs] == texts
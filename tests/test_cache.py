@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+from sayswho.cache import ResultCache, cache_key, config_fingerprint
+from sayswho.constants import QuoteClusterMatch
+from sayswho.paragraphs import ParagraphCache
+from sayswho.records import AttributionResult, QuoteRecord, SpanRecord
+
+
+def make_result(text):
+    quote = QuoteRecord(
+        SpanRecord("he", 0, 2), SpanRecord("said", 3, 7), SpanRecord(text, 8, 20)
+    )
+    return AttributionResult(text, [quote], [], [], [QuoteClusterMatch(0, 0)])
+
+
+def test_cache_key():
+    assert cache_key("text", "a") == cache_key("text", "a")
+    assert cache_key("text", "a") != cache_key("text", "b")
+
+
+def test_config_fingerprint():
+    def fingerprint(paragraph_cache):
+        return config_fingerprint(
+            SimpleNamespace(prune=True, prep_text=True, paragraph_cache=paragraph_cache)
+        )
+
+    assert fingerprint(None) != fingerprint(ParagraphCache())
+    assert fingerprint(ParagraphCache()) == fingerprint(ParagraphCache())
+    assert fingerprint(ParagraphCache()) != fingerprint(ParagraphCache(min_count=5))
+    assert fingerprint(ParagraphCache()) != fingerprint(ParagraphCache(para_char="\r"))
+
+
+def test_memory_lru():
+    result = make_result("x" * 20)
+    size = len(result.to_bytes())
+    cache = ResultCache(max_bytes=size * 2)
+    for k in "abc":
+        cache.put(k, result)
+    assert cache.get("a") is None
+    assert cache.get("c") == result
+    assert cache.stats["evictions"] == 1
+    assert cache.stats["misses"] == 1
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_sqlite_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(path)
+    cache.put("a", make_result("first"))
+    cache.close()
+
+    cache = ResultCache(path)
+    assert cache.get("a") == make_result("first")
+    assert cache.get("a") == make_result("first")
+    assert cache.stats["disk_hits"] == 1
+    assert cache.stats["memory_hits"] == 1
+    assert cache.hits == 2
@@ -0,0 +1,68 @@
+import os
+import pickle
+from sayswho.corpus import CorpusReader
+
+ARTICLES = [
+    'Jane Smith was hired.\n"I\'m ready," she said"today" to reporters.',
+    "Second article. The players' union agreed.",
+    "Third article, with unicode: café “quotes”.",
+]
+
+
+def write_corpus(path, delimiter="End of Document"):
+    path.write_text(
+        "\n\n".join(a + f"\n\n  {delimiter}\r" for a in ARTICLES) + "\n\n\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_reader(tmp_path):
+    with CorpusReader(write_corpus(tmp_path / "corpus.txt")) as reader:
+        assert len(reader) == 3
+        assert list(reader) == ARTICLES
+        assert reader[2] == ARTICLES[2]
+        assert reader[-1] == ARTICLES[-1]
+        assert list(reader.iter_range(1, 10)) == ARTICLES[1:]
+        assert [a for i in range(2) for a in reader.shard(i, 2)] == ARTICLES
+
+
+def test_prep(tmp_path):
+    reader = CorpusReader(write_corpus(tmp_path / "corpus.txt"), prep=True)
+    assert 'said "today" to' in reader[0]
+    assert "players'x union" in reader[1]
+    # same prep as SaysWho(prep_text=True): the indented continuation paragraph gets its closing quote
+    path = tmp_path / "indented.txt"
+    path.write_text('Intro.\n  "We will win.\n  "Again," he said.')
+    assert CorpusReader(str(path), prep=True)[0] == (
+        'Intro.\n"We will win."\n"Again," he said.'
+    )
+
+
+def test_index_and_pickle(tmp_path):
+    path = write_corpus(tmp_path / "corpus.txt", delimiter="=== DOC ===")
+    reader = CorpusReader(path, delimiter="=== DOC ===")
+    reader.save_index(str(tmp_path / "corpus.idx"))
+
+    loaded = CorpusReader(path, index_path=str(tmp_path / "corpus.idx"))
+    assert (loaded.offsets == reader.offsets).all()
+    assert list(loaded) == ARTICLES
+
+    copy = pickle.loads(pickle.dumps(reader))
+    assert copy[1] == ARTICLES[1]
+
+    # an index for a different version of the file is ignored
+    (tmp_path / "corpus.txt").write_text(ARTICLES[0])
+    assert len(CorpusReader(path, index_path=str(tmp_path / "corpus.idx"))) == 1
+
+    # even one with the same size
+    (tmp_path / "corpus.txt").write_text("One.\nEnd of Document\nTwo.")
+    CorpusReader(path).save_index(str(tmp_path / "corpus.idx"))
+    (tmp_path / "corpus.txt").write_text("One.\nEnd of Documents\nTwo")
+    os.utime(path, ns=(0, 0))
+    assert len(CorpusReader(path, index_path=str(tmp_path / "corpus.idx"))) == 1
+
+
+def test_empty(tmp_path):
+    (tmp_path / "empty.txt").write_text("")
+    assert list(CorpusReader(str(tmp_path / "empty.txt"))) == []
@@ -0,0 +1,140 @@
+from array import array
+import regex as re
+from sayswho.dedup import (
+    Deduplicator,
+    LSHIndex,
+    MinHasher,
+    align_result,
+    shingles,
+    similarity,
+)
+from sayswho.records import AttributionResult, ClusterRecord, QuoteRecord, SpanRecord
+
+STORY = " ".join(
+    [
+        "The city council voted on Tuesday to approve a new budget for the coming year.",
+        '"This budget keeps our streets safe," said Mayor Jane Smith.',
+        "The plan adds funding for parks, libraries and road repairs across every district.",
+        "Council members debated the proposal for more than four hours before the final vote.",
+        '"We listened to residents," said councilman Bob Jones.',
+        "Opponents argued the spending increase would lead to higher property taxes next year.",
+    ]
+)
+
+QUOTE_REGEX = re.compile(r'("[^"]+") said ([\w ]+)\.')
+
+
+class StubSaysWho:
+    """
+    Finds '"..." said Name.' quotes with a regex.
+    """
+
+    prep_text = False
+
+    def __init__(self):
+        self.texts = []
+
+    def pipe(self, texts, batch_size=8):
+        for text in texts:
+            self.texts.append(text)
+            quotes = []
+            for m in QUOTE_REGEX.finditer(text):
+                speaker = SpanRecord(m.group(2), m.start(2), m.end(2))
+                cue = SpanRecord("said", m.end(1) + 1, m.end(1) + 5)
+                content = SpanRecord(m.group(1), m.start(1), m.end(1))
+                quotes.append(QuoteRecord(speaker, cue, content))
+            cluster = ClusterRecord(
+                [q.speaker.text for q in quotes],
+                array("l", [q.speaker.start for q in quotes]),
+                array("l", [q.speaker.end for q in quotes]),
+                array("b", [0 for q in quotes]),
+            )
+            yield AttributionResult(text, quotes, [cluster], [], [])
+
+
+def test_minhash():
+    hasher = MinHasher()
+    a = hasher.signature(shingles(STORY))
+    b = hasher.signature(shingles("By Staff Writer. " + STORY))
+    c = hasher.signature(shingles("Something else entirely, about the weather today."))
+    assert similarity(a, a) == 1
+    assert similarity(a, b) > 0.8
+    assert similarity(a, c) < 0.2
+
+    index = LSHIndex(bands=32)
+    index.add("a", a)
+    assert index.query(b, 0.8) == "a"
+    assert index.query(c, 0.8) is None
+
+
+def test_align_result():
+    sw = StubSaysWho()
+    result = next(sw.pipe([STORY]))
+    dup = "UPDATED 3:15 PM\n" + STORY.replace("four hours", "three hours")
+    aligned = align_result(result, dup)
+    assert aligned == next(sw.pipe([dup]))
+    for quote in aligned.quotes:
+        assert dup[quote.content.start : quote.content.end] == quote.content.text
+
+    # a quote that was edited can't be carried over
+    edited = STORY.replace("keeps our streets", "keeps all our streets")
+    assert align_result(result, edited) is None
+
+
+def test_deduplicator():
+    sw = StubSaysWho()
+    dedup = Deduplicator(sw)
+    texts = [
+        STORY,
+        "By Staff Writer\n" + STORY,
+        "Unrelated story about the weather, which was sunny all week.",
+        STORY.replace("keeps our streets", "keeps all our streets"),
+        STORY + " Copyright 2023.",
+    ]
+    results = list(dedup.pipe(texts, buffer_size=2))
+    assert [r.text for r in results] == texts
+    assert results == list(StubSaysWho().pipe(texts))
+    assert dedup.stats == {"attributed": 3, "aligned": 2, "fallbacks": 1}
+    assert sw.texts == [texts[0], texts[2], texts[3]]
+
+
+def test_deduplicator_new_quote():
+    sw = StubSaysWho()
+    dedup = Deduplicator(sw)
+    texts = [
+        STORY,
+        STORY + ' "We will appeal this decision," said Tom Brown.',
+        STORY + " The mayor said she would sign it.",
+    ]
+    results = list(dedup.pipe(texts))
+    assert len(results[1].quotes) == 3
+    assert results == list(StubSaysWho().pipe(texts))
+    assert dedup.stats == {"attributed": 3, "aligned": 0, "fallbacks": 2}
+
+
+def test_max_entries():
+    hasher = MinHasher()
+    sigs = [
+        hasher.signature(shingles(f"story number {n} " + STORY[:40])) for n in range(3)
+    ]
+    index = LSHIndex(bands=32, max_entries=2)
+    assert index.add("a", sigs[0]) == []
+    assert index.add("b", sigs[1]) == []
+    # matching "a" makes "b" the oldest
+    assert index.query(sigs[0], 1.0) == "a"
+    assert index.add("c", sigs[2]) == ["b"]
+    assert len(index) == 2
+    assert index.query(sigs[1], 1.0) is None
+    assert all("b" not in bucket for bucket in index.buckets.values())
+
+    sw = StubSaysWho()
+    dedup = Deduplicator(sw, max_entries=1)
+    weather = "Unrelated story about the weather, which was sunny all week."
+    results = list(
+        dedup.pipe([STORY, weather, "By Staff Writer\n" + STORY], buffer_size=2)
+    )
+    assert results == list(
+        StubSaysWho().pipe([STORY, weather, "By Staff Writer\n" + STORY])
+    )
+    assert len(dedup.results) == len(dedup.index) == 1
+    assert dedup.stats["attributed"] == 3
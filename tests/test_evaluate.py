@@ -0,0 +1,109 @@
+import json
+from array import array
+import regex as re
+from sayswho import evaluate, loadtest
+from sayswho.records import AttributionResult, ClusterRecord, QuoteRecord, SpanRecord
+from sayswho.constants import QuoteClusterMatch
+
+TEXT = 'Ross Rogers drove by. "Then this guy came out," he said. "It was late," Rogers added. The shop closed at nine.'
+
+GOLD = [
+    {
+        "text": TEXT,
+        "quotes": [
+            {
+                "content": '"Then this guy came out,"',
+                "speaker": "he",
+                "cue": "said",
+                "name": "Ross Rogers",
+            },
+            {"content": '"It was late,"', "speaker": "Rogers", "cue": "added"},
+            {"content": "The shop closed at nine.", "speaker": "X", "cue": "Y"},
+        ],
+    }
+]
+
+QUOTE_REGEX = re.compile(r'("[^"]+") (\w+) (\w+)\.')
+
+
+class StubSaysWho:
+    """
+    Finds '"..." speaker cue.' quotes with a regex and matches them all to one cluster. Takes the cue first if swap is True.
+    """
+
+    def __init__(self, swap=False):
+        self.swap = swap
+
+    def pipe(self, texts, batch_size=8):
+        for text in texts:
+            quotes = []
+            for m in QUOTE_REGEX.finditer(text):
+                s, c = (3, 2) if self.swap else (2, 3)
+                quotes.append(
+                    QuoteRecord(
+                        SpanRecord(m.group(s), m.start(s), m.end(s)),
+                        SpanRecord(m.group(c), m.start(c), m.end(c)),
+                        SpanRecord(m.group(1), m.start(1), m.end(1)),
+                    )
+                )
+            cluster = ClusterRecord(
+                ["Ross Rogers", "he"],
+                array("l", [0, 48]),
+                array("l", [11, 50]),
+                array("b", [0, 1]),
+            )
+            matches = [QuoteClusterMatch(n, 0) for n in range(len(quotes))]
+            yield AttributionResult(text, quotes, [cluster], [], matches)
+
+
+def test_read_gold(tmp_path):
+    doc = {"text": TEXT, "quotes": [dict(GOLD[0]["quotes"][0], content=[22, 47])]}
+    path = tmp_path / "gold.jsonl"
+    path.write_text(json.dumps(doc) + "\n\n")
+    assert evaluate.read_gold(str(path)) == [
+        {"text": TEXT, "quotes": GOLD[0]["quotes"][:1]}
+    ]
+
+
+def test_score():
+    scores = evaluate.score(GOLD, list(StubSaysWho().pipe([TEXT])))
+    assert scores["quotes"]["tp"] == 2
+    assert scores["quotes"]["precision"] == 1.0
+    assert scores["quotes"]["recall"] == 2 / 3
+    assert scores["speakers"]["tp"] == scores["cues"]["tp"] == 2
+    # only the first gold quote has a name
+    assert scores["attribution"] == evaluate.prf(1, 1, 1)
+    swapped = evaluate.score(GOLD, list(StubSaysWho(swap=True).pipe([TEXT])))
+    assert swapped["quotes"]["tp"] == 2
+    assert swapped["speakers"]["tp"] == swapped["cues"]["tp"] == 0
+
+
+def test_align_quotes():
+    gold = [{"content": "a b c d"}, {"content": "e f g h"}]
+    predicted = [
+        QuoteRecord(None, None, SpanRecord(t, 0, 0)) for t in ["e f g", "x y", "a b"]
+    ]
+    assert evaluate.align_quotes(gold, predicted) == [(0, 2), (1, 0)]
+    assert evaluate.align_quotes(gold, predicted, min_overlap=0.8) == [(1, 0)]
+
+
+def test_run_evaluation():
+    report = evaluate.run_evaluation(
+        GOLD,
+        {"good": {}, "swapped": {"swap": True}},
+        factory=StubSaysWho,
+        isolate=False,
+    )
+    good, swapped = report["configs"]
+    assert good["scores"]["speakers"]["f1"] > swapped["scores"]["speakers"]["f1"]
+    assert good["docs"] == 1 and good["docs_per_sec"] > 0 and good["rss_peak"] > 0
+    assert "good" in evaluate.format_report(report)
+    json.dumps(report)
+
+
+def test_isolated():
+    report = evaluate.run_evaluation(
+        GOLD, {"stub": {"base_ms": 1}}, factory=loadtest.StubSaysWho
+    )
+    assert report["configs"][0]["scores"]["quotes"]["recall"] == 0
+    assert report["configs"][0]["rss_peak"] > 0
@@ -0,0 +1,58 @@
+from array import array
+import pytest
+from sayswho.constants import QuoteClusterMatch
+from sayswho.records import AttributionResult, ClusterRecord, QuoteRecord, SpanRecord
+
+pa = pytest.importorskip("pyarrow")
+export = pytest.importorskip("sayswho.export")
+
+
+def make_result(n):
+    text = f'"Hello {n}," said Jane Smith. She left.'
+    quote = QuoteRecord(
+        SpanRecord("Jane Smith", 17, 27),
+        SpanRecord("said", 12, 16),
+        SpanRecord(f'"Hello {n},"', 0, 10),
+    )
+    cluster = ClusterRecord(
+        ["Jane Smith", "She"],
+        array("l", [17, 29]),
+        array("l", [27, 32]),
+        array("b", [0, 1]),
+    )
+    return AttributionResult(
+        text,
+        [quote],
+        [cluster],
+        [SpanRecord("Jane Smith", 17, 27)],
+        [QuoteClusterMatch(0, 0)],
+    )
+
+
+def test_record_batches():
+    batches = export.to_record_batches([make_result(n) for n in range(3)], [10, 11, 12])
+    quotes = batches["quotes"]
+    assert quotes.num_rows == 3
+    assert quotes.column("doc_id").to_pylist() == [10, 11, 12]
+    assert pa.types.is_dictionary(quotes.schema.field("speaker_text").type)
+    assert len(quotes.column("speaker_text").dictionary) == 1
+    members = batches["cluster_members"]
+    assert members.column("pronoun").to_pylist() == [False, True] * 3
+    assert batches["matches"].column("cluster_index").to_pylist() == [0, 0, 0]
+
+    with pytest.raises(ValueError):
+        export.to_record_batches([make_result(0)], [1, 2])
+
+
+def test_parquet_writer(tmp_path):
+    with export.ParquetWriter(str(tmp_path), batch_size=2) as writer:
+        writer.write_all(make_result(n) for n in range(5))
+    assert writer.batch_count == 3
+    assert (tmp_path / "quotes" / "batch=2" / "part-0.parquet").exists()
+
+    quotes = export.read_table(str(tmp_path), "quotes").sort_by("doc_id")
+    assert quotes.column("doc_id").to_pylist() == list(range(5))
+    assert quotes.column("content_text").to_pylist()[4] == '"Hello 4,"'
+    assert sorted(set(quotes.column("batch").to_pylist())) == [0, 1, 2]
+    docs = export.read_table(str(tmp_path), "documents")
+    assert docs.num_rows == 5
@@ -0,0 +1,64 @@
+import spacy
+from spacy.tokens import Doc
+from sayswho.heuristic_coref import heuristic_clusters
+
+
+def make_doc(words, pos, ents):
+    return Doc(spacy.blank("en").vocab, words=words, pos=pos, ents=ents)
+
+
+def test_name_containment_and_pronouns():
+    doc = make_doc(
+        [
+            "Jacque",
+            "Vaughn",
+            "met",
+            "Mrs.",
+            "Lee",
+            ".",
+            "Vaughn",
+            "said",
+            "she",
+            "and",
+            "he",
+            "left",
+            ".",
+        ],
+        [
+            "PROPN",
+            "PROPN",
+            "VERB",
+            "PROPN",
+            "PROPN",
+            "PUNCT",
+            "PROPN",
+            "VERB",
+            "PRON",
+            "CCONJ",
+            "PRON",
+            "VERB",
+            "PUNCT",
+        ],
+        [
+            "B-PERSON",
+            "I-PERSON",
+            "O",
+            "B-PERSON",
+            "I-PERSON",
+            "O",
+            "B-PERSON",
+            "O",
+            "O",
+            "O",
+            "O",
+            "O",
+            "O",
+        ],
+    )
+    clusters = [[span.text for span in c] for c in heuristic_clusters(doc)]
+    assert clusters == [["Jacque Vaughn", "Vaughn", "he"], ["Mrs. Lee", "she"]]
+
+
+def test_no_people():
+    doc = make_doc(["It", "rained", "."], ["PRON", "VERB", "PUNCT"], ["O", "O", "O"])
+    assert heuristic_clusters(doc) == []
@@ -0,0 +1,61 @@
+import re
+import subprocess
+import sys
+
+IMPORT_BUDGET_US = 100_000
+
+
+def run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_time(code: str) -> int:
+    """
+    Microseconds spent importing sayswho modules (and whatever they import) in code.
+    """
+    out = run(code).stderr
+    cumulative = [
+        int(m.group(1))
+        for m in re.finditer(
+            r"^import time:\s+\d+ \|\s+(\d+) \| sayswho(\.\w+)?$", out, re.M
+        )
+    ]
+    assert cumulative
+    return sum(cumulative)
+
+
+def test_import_time():
+    assert import_time("import sayswho") < IMPORT_BUDGET_US
+
+
+def test_prep_import_time():
+    code = "from sayswho.helpers import prep_text_for_quote_detection"
+    assert import_time(code) < IMPORT_BUDGET_US
+    out = run(f"import sys; {code}; print('spacy' in sys.modules)").stdout
+    assert out.strip() == "False"
+
+
+def test_no_heavy_imports():
+    out = run(
+        "import sys, sayswho; "
+        "print(sorted(m for m in ['spacy', 'numpy', 'jinja2', 'regex', 'rapidfuzz'] if m in sys.modules))"
+    ).stdout
+    assert out.strip() == "[]"
+
+
+def test_helpers_without_rapidfuzz():
+    out = run("import sys, sayswho.helpers; print('rapidfuzz' in sys.modules)").stdout
+    assert out.strip() == "False"
+
+
+def test_lazy_attrs():
+    import sayswho
+    from sayswho.records import AttributionResult
+
+    assert sayswho.AttributionResult is AttributionResult
+    assert "SaysWho" in dir(sayswho)
@@ -0,0 +1,31 @@
+import pytest
+from sayswho import SaysWho
+from sayswho.incremental import IncrementalAttributor
+
+
+@pytest.fixture(scope="module")
+def incremental():
+    return IncrementalAttributor(SaysWho())
+
+
+def test_edit_reuses_paragraphs(incremental):
+    paragraphs = open("./tests/qa_test_file.txt").read().split("\n")
+    incremental.attribute("\n".join(paragraphs))
+    first_quotes = [q.content.text for q in incremental.sw.quotes]
+    assert incremental.stats["parsed"] == incremental.stats["paragraphs"]
+
+    paragraphs[0] = paragraphs[0] + " It was late."
+    incremental.attribute("\n".join(paragraphs))
+    assert incremental.stats["parsed"] == 1
+    assert incremental.stats["quote_paragraphs"] <= 2
+    assert [q.content.text for q in incremental.sw.quotes] == first_quotes
+
+    # no person, speaker or third-person pronoun: the old clusters are kept
+    paragraphs.insert(1, "The shop closed early that night, and it was quiet.")
+    incremental.attribute("\n".join(paragraphs))
+    assert incremental.stats["parsed"] == 1
+    assert not incremental.stats["coref"]
+
+    paragraphs.insert(2, '"We were scared," he said.')
+    incremental.attribute("\n".join(paragraphs))
+    assert incremental.stats["coref"]
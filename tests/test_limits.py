@@ -0,0 +1,30 @@
+from sayswho.limits import Deadline, Limits, truncate_text
+from sayswho.records import AttributionResult
+
+
+def test_truncate_text():
+    text = "One, two three. Four five."
+    assert truncate_text(text, 3) == "One, two"
+    assert truncate_text(text, 100) == text
+    assert truncate_text(text, 0) == ""
+
+
+def test_deadline():
+    assert not Deadline().expired()
+    assert not Deadline(60).expired()
+    assert Deadline(0, start=0).expired()
+    assert Deadline(60, start=0.0).expires == 60
+
+
+def test_limits_defaults():
+    assert Limits() == (None, None, None, None, None)
+    assert Limits(max_seconds=5).max_seconds == 5
+
+
+def test_result_fallbacks():
+    result = AttributionResult("text", [], [], [], [], ["truncated"])
+    assert AttributionResult.from_bytes(result.to_bytes()).fallbacks == ["truncated"]
+    # results stored before fallbacks existed
+    d = result.to_dict()
+    del d["fallbacks"]
+    assert AttributionResult.from_dict(d).fallbacks == []
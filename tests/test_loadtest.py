@@ -0,0 +1,64 @@
+import json
+import pytest
+from sayswho import loadtest
+from sayswho.pool import ForkServer
+
+TEXTS = ["Short text.", " ".join(["word"] * 300), " ".join(["word"] * 1200)]
+
+
+def stub():
+    return loadtest.StubSaysWho(base_ms=1, ms_per_1k_tokens=5)
+
+
+def test_read_corpus(tmp_path):
+    (tmp_path / "c.jsonl").write_text("\n".join(json.dumps({"text": t}) for t in TEXTS))
+    (tmp_path / "c.txt").write_text("one\n\ntwo\n")
+    assert loadtest.read_corpus(str(tmp_path / "c.jsonl")) == TEXTS
+    assert loadtest.read_corpus(str(tmp_path / "c.txt")) == ["one", "two"]
+
+
+@pytest.mark.parametrize("mode", ["attribute", "pipe"])
+def test_run_load(mode):
+    report = loadtest.run_load(
+        stub, TEXTS, mode=mode, concurrency=2, passes=4, batch_size=2
+    )
+    assert report["docs"] == 12
+    assert report["errors"] == 0
+    assert report["docs_per_sec"] > 0
+    assert report["latency"]["p50"] <= report["latency"]["p99"]
+    assert set(report["latency_by_size"]) == {"0-250", "250-1000", "1000-4000"}
+    assert report["rss"]["peak"] > 0
+    json.dumps(report)
+
+
+def test_rate_and_duration():
+    report = loadtest.run_load(stub, TEXTS, rate=100, duration=0.3)
+    # open loop: about rate x duration arrivals
+    assert 15 <= report["docs"] <= 40
+
+
+class FailingClient:
+    def attribute(self, text):
+        raise ValueError("down")
+
+
+def test_failing_client_stops():
+    report = loadtest.run_load(FailingClient, TEXTS, duration=0.3)
+    assert report["docs"] == 0
+    assert report["errors"] > 0
+    assert report["duration"] < 5
+
+
+def test_pool_mode():
+    report = loadtest.run_load(
+        lambda: ForkServer(stub(), workers=2, threads=1), TEXTS, mode="pool", passes=2
+    )
+    assert report["docs"] == 6
+
+
+def test_compare_reports():
+    baseline = {"docs_per_sec": 100, "latency": {"p50": 0.1, "p95": 0.2, "p99": 0.3}}
+    report = {"docs_per_sec": 85, "latency": {"p50": 0.105, "p95": 0.3, "p99": 0.3}}
+    regressions = loadtest.compare_reports(report, baseline, threshold=0.1)
+    assert [r["metric"] for r in regressions] == ["docs_per_sec", "latency.p95"]
+    assert loadtest.compare_reports(report, baseline, threshold=0.6) == []
@@ -0,0 +1,94 @@
+import os
+import urllib.request
+from sayswho import metrics
+from sayswho.metrics import AttributionMetrics, MetricsRegistry
+from sayswho.pool import ForkServer
+from sayswho.records import AttributionResult
+
+
+def test_exposition():
+    registry = MetricsRegistry()
+    docs = registry.counter("docs_total", "Documents.")
+    docs.inc()
+    docs.inc(2)
+    fallbacks = registry.counter("fallbacks_total", labels=("fallback",))
+    fallbacks.inc(fallback='say "hi"')
+    seconds = registry.histogram("seconds", "Seconds.", ("stage",), buckets=[0.1, 1])
+    for value in [0.05, 0.5, 5]:
+        seconds.observe(value, stage="base")
+    assert list(seconds.timed(range(3), stage="coref")) == [0, 1, 2]
+    with seconds.time(stage="matching"):
+        pass
+    lines = registry.expose().splitlines()
+    assert "# HELP docs_total Documents." in lines
+    assert "# TYPE docs_total counter" in lines
+    assert "docs_total 3" in lines
+    assert 'fallbacks_total{fallback="say \\"hi\\""} 1' in lines
+    assert "# TYPE seconds histogram" in lines
+    assert 'seconds_bucket{stage="base",le="0.1"} 1' in lines
+    assert 'seconds_bucket{stage="base",le="1.0"} 2' in lines
+    assert 'seconds_bucket{stage="base",le="+Inf"} 3' in lines
+    assert 'seconds_sum{stage="base"} 5.55' in lines
+    assert 'seconds_count{stage="coref"} 3' in lines
+    assert seconds.count(stage="matching") == 1
+
+
+def test_merge_and_write(tmp_path):
+    one, two = MetricsRegistry(), MetricsRegistry()
+    for registry, n in [(one, 1), (two, 4)]:
+        registry.counter("docs_total").inc(n)
+        registry.histogram("tokens", buckets=[10]).observe(n * 5)
+    one.merge(two.snapshot())
+    assert one.counter("docs_total").value() == 5
+    assert one.histogram("tokens").count() == 2
+    one.write(str(tmp_path / "sayswho.prom"))
+    assert "docs_total 5" in (tmp_path / "sayswho.prom").read_text()
+
+
+def test_serve():
+    registry = MetricsRegistry()
+    registry.counter("docs_total").inc()
+    server = registry.serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "docs_total 1" in response.read().decode()
+    finally:
+        server.shutdown()
+
+
+class CountingSaysWho:
+    def __init__(self, registry):
+        self.metrics = AttributionMetrics(registry)
+
+    def pipe(self, texts, batch_size=8):
+        for text in texts:
+            self.metrics.record(quotes=2, matched=1, tokens=len(text), fallbacks=[])
+            yield AttributionResult(text, [], [], [], [])
+
+
+def test_worker_snapshots(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path))
+    sw = CountingSaysWho(registry)
+    # counted in the parent only
+    list(sw.pipe(["warm up"]))
+    with ForkServer(sw, workers=2, threads=1, warmup=False, chunksize=2) as pool:
+        pool.map([str(n) for n in range(10)])
+    assert all(f.startswith("sayswho-") for f in os.listdir(tmp_path))
+    lines = registry.expose().splitlines()
+    assert "sayswho_documents_total 11" in lines
+    assert "sayswho_quotes_total 22" in lines
+
+
+def test_reused_pid(tmp_path, monkeypatch):
+    first = MetricsRegistry(directory=str(tmp_path))
+    first.counter("docs_total").inc(2)
+    first.flush()
+    # a later process that happens to get the same pid
+    monkeypatch.setattr(metrics, "_snapshot_name", (None, None))
+    second = MetricsRegistry(directory=str(tmp_path))
+    second.counter("docs_total").inc()
+    second.flush()
+    assert len(os.listdir(tmp_path)) == 2
+    assert "docs_total 3" in second.expose().splitlines()
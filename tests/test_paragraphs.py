@@ -0,0 +1,57 @@
+import spacy
+from sayswho.paragraphs import ParagraphCache, split_paragraphs
+
+BYLINE = "By Jane Reporter, Staff Writer\n"
+FOOTER = "\nCopyright 2023 The Daily News. All rights reserved.\nLoad-Date: May 4, 2023"
+
+
+class CountingNLP:
+    """
+    Blank English pipeline that remembers every text it parses.
+    """
+
+    def __init__(self):
+        self.nlp = spacy.blank("en")
+        self.nlp.add_pipe("sentencizer")
+        self.texts = []
+
+    def pipe(self, texts, batch_size=8):
+        texts = list(texts)
+        self.texts += texts
+        return self.nlp.pipe(texts, batch_size=batch_size)
+
+
+def story(n):
+    return (
+        f'Story number {n} is here. "It is {n} quotes long," she said.\nMore about {n}.'
+    )
+
+
+def test_split_paragraphs():
+    text = BYLINE + story(1) + FOOTER
+    assert "".join(split_paragraphs(text)) == text
+
+
+def test_paragraph_cache():
+    nlp = CountingNLP()
+    cache = ParagraphCache(min_count=2)
+    texts = [BYLINE + story(n) + FOOTER for n in range(5)]
+    docs = list(cache.pipe(nlp, texts, batch_size=1))
+
+    # first text has nothing cached and is parsed whole
+    assert nlp.texts[0] == texts[0]
+    assert [doc.text for doc in docs] == texts
+    for doc, text in zip(docs, texts):
+        assert [t.text for t in doc] == [t.text for t in nlp.nlp(text)]
+    # the byline and both footer lines are cached from the second text on
+    assert len(cache) == 3
+    assert cache.stats["hits"] == 9
+    assert BYLINE not in nlp.texts[-1]
+    assert nlp.texts[-1] == story(4) + "\n"
+
+
+def test_paragraph_cache_limits():
+    cache = ParagraphCache(min_count=1, max_entries=2, max_tracked=3)
+    list(cache.pipe(CountingNLP(), [f"a{n}\nb{n}\nc{n}" for n in range(3)]))
+    assert len(cache) == 2
+    assert len(cache.counts) <= 3
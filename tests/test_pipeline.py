@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+import spacy
+from sayswho import pipeline
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    nlp.add_pipe("senter")
+    nlp.add_pipe("entity_ruler")
+    nlp.initialize()
+    nlp.disable_pipe("senter")
+    nlp.vocab.set_vector("cat", np.ones(5, dtype="f"))
+    path = tmp_path_factory.mktemp("model")
+    nlp.to_disk(path)
+    return str(path)
+
+
+def test_load_trimmed(model_dir):
+    nlp, report = pipeline.load_trimmed(model_dir, {"sentencizer"})
+    assert nlp.component_names == ["sentencizer"]
+    assert report.excluded == ["senter", "entity_ruler"]
+    assert report.vectors_dropped
+    assert nlp.vocab.vectors.shape[0] == 0
+
+
+def test_keep_vectors(model_dir):
+    nlp, report = pipeline.load_trimmed(model_dir, {"sentencizer"}, keep_vectors=True)
+    assert not report.vectors_dropped
+    assert nlp.vocab.vectors.shape[0] > 0
+
+
+def test_uses_static_vectors():
+    assert pipeline.uses_static_vectors(
+        {"tok2vec": {"model": {"embed": {"include_static_vectors": True}}}}
+    )
+    assert not pipeline.uses_static_vectors(
+        {"tok2vec": {"model": {"embed": {"include_static_vectors": False}}}}
+    )
@@ -0,0 +1,173 @@
+import gc
+import os
+import signal
+import pytest
+from sayswho.pool import ForkServer, SaysWhoPool, memory_usage
+from sayswho.records import AttributionResult, SpanRecord
+
+
+class StubSaysWho:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.warmed_up = False
+        self.cache = None
+
+    def pipe(self, texts, batch_size=8):
+        texts = list(texts)
+        if not self.warmed_up:
+            self.warmed_up = True
+            return [None for _ in texts]
+        if "boom" in texts:
+            raise ValueError("boom")
+        # (text, parent pid, warmed up before fork, worker pid)
+        return [(t, self.pid, self.warmed_up, os.getpid()) for t in texts]
+
+
+def test_fork_server():
+    texts = [str(n) for n in range(20)]
+    with ForkServer(StubSaysWho(), workers=2, threads=1) as server:
+        results = server.map(texts, chunksize=3)
+        assert [r[0] for r in results] == texts
+        # loaded once in the parent, warmed up before forking, run in the workers
+        assert all(r[1] == os.getpid() and r[2] for r in results)
+        assert all(r[3] != os.getpid() for r in results)
+        server.add_worker()
+        assert len(server.workers) == 3
+        assert len(server.map(texts)) == 20
+
+
+def test_gc_freeze_shared_between_pools():
+    first = ForkServer(StubSaysWho(), workers=1, threads=1)
+    second = ForkServer(StubSaysWho(), workers=1, threads=1)
+    first.close()
+    assert gc.get_freeze_count() > 0
+    assert len(second.map(["a", "b"])) == 2
+    second.close()
+    assert gc.get_freeze_count() == 0
+    assert SaysWhoPool.frozen_pools == 0
+
+
+def test_worker_error():
+    with ForkServer(StubSaysWho(), workers=1, threads=1) as server:
+        try:
+            server.map(["boom"])
+            assert False
+        except RuntimeError as e:
+            assert "boom" in str(e)
+
+
+def test_memory_usage():
+    usage = memory_usage()
+    assert usage["rss"] >= usage["private"] > 0
+
+
+class PidSaysWho:
+    """
+    Returns records with the worker's pid as the only person.
+    """
+
+    def pipe(self, texts, batch_size=8):
+        return [
+            AttributionResult(t, [], [], [SpanRecord(str(os.getpid()), 0, 0)], [])
+            for t in texts
+        ]
+
+
+def pid_factory():
+    return PidSaysWho()
+
+
+def test_pool_imap():
+    texts = [str(n) for n in range(30)]
+    with SaysWhoPool(workers=2, threads=1, factory=pid_factory, chunksize=2) as pool:
+        results = list(pool.imap(texts))
+        assert [r.text for r in results] == texts
+        assert all(isinstance(r, AttributionResult) for r in results)
+        unordered = list(pool.imap_unordered(texts, chunksize=3))
+        assert sorted(r.text for r in unordered) == sorted(texts)
+        assert pool.stats["docs"] == 60
+
+
+def test_pool_backpressure():
+    consumed = []
+
+    def texts():
+        for n in range(100):
+            consumed.append(n)
+            yield str(n)
+
+    with SaysWhoPool(
+        workers=1, threads=1, factory=pid_factory, chunksize=2, max_in_flight=3
+    ) as pool:
+        results = pool.imap(texts())
+        next(results)
+        assert len(consumed) <= 3 * 2 + 1
+        assert len(list(results)) == 99
+
+
+def test_pool_restarts():
+    texts = [str(n) for n in range(20)]
+    with ForkServer(
+        PidSaysWho(), workers=2, threads=1, chunksize=2, max_docs_per_worker=4
+    ) as pool:
+        results = pool.map(texts)
+        assert [r.text for r in results] == texts
+        assert pool.stats["restarts"] >= 3
+        assert len(set(r.persons[0].text for r in results)) > 2
+        assert len(pool.workers) == 2
+
+
+class CrashSaysWho(PidSaysWho):
+    """
+    Exits the worker on "crash", only the first time unless always is True.
+    """
+
+    def __init__(self, marker, always=False):
+        self.marker = marker
+        self.always = always
+
+    def pipe(self, texts, batch_size=8):
+        if "crash" in texts and (self.always or not os.path.exists(self.marker)):
+            open(self.marker, "w").close()
+            os._exit(3)
+        return super().pipe(texts, batch_size)
+
+
+def test_pool_worker_crash(tmp_path):
+    texts = [str(n) for n in range(10)] + ["crash"] + [str(n) for n in range(10)]
+    sw = CrashSaysWho(str(tmp_path / "crashed"))
+    with ForkServer(sw, workers=2, threads=1, chunksize=2, warmup=False) as pool:
+        results = pool.map(texts)
+        assert [r.text for r in results] == texts
+        assert pool.stats["crashes"] == 1
+        assert len(pool.workers) == 2
+        assert all(p.is_alive() for p in pool.workers)
+
+    sw = CrashSaysWho(str(tmp_path / "crashed"), always=True)
+    with ForkServer(sw, workers=2, threads=1, chunksize=2, warmup=False) as pool:
+        with pytest.raises(RuntimeError, match="twice"):
+            pool.map(texts)
+
+
+def test_pool_worker_killed_while_idle():
+    texts = [str(n) for n in range(10)]
+    with ForkServer(PidSaysWho(), workers=2, threads=1, chunksize=2) as pool:
+        assert len(pool.map(texts)) == 10
+        # the parent only finds out when it sends this worker a chunk
+        victim = pool.workers[0]
+        os.kill(victim.pid, signal.SIGKILL)
+        victim.join()
+        results = pool.map(texts)
+        assert [r.text for r in results] == texts
+        assert pool.stats["crashes"] == 1
+        assert victim not in pool.workers and len(pool.workers) == 2
+
+
+def failing_factory():
+    raise ValueError("no models")
+
+
+def test_pool_factory_fails():
+    with SaysWhoPool(workers=1, threads=1, factory=failing_factory) as pool:
+        with pytest.raises(RuntimeError, match="before it was ready"):
+            pool.map(["a"])
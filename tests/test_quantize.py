@@ -0,0 +1,76 @@
+import pytest
+import spacy
+from spacy.language import Language
+from spacy.tokens import SpanGroup
+from sayswho.quantize import cluster_divergence, doc_clusters, quantize_pipeline
+
+NLP = spacy.blank("en")
+TEXTS = ["Ross Rogers said he saw it.", "Anna Lee left early, she said."]
+
+
+class FakeCoref:
+    """
+    Puts the first two tokens and the pronoun of each text in one cluster, or splits them if split is True.
+    """
+
+    def __init__(self, split=False):
+        self.split = split
+
+    def pipe(self, texts, batch_size=8):
+        for text in texts:
+            doc = NLP(text)
+            names = doc[0:2]
+            pronoun = [
+                doc[i : i + 1] for i, t in enumerate(doc) if t.lower_ in ("he", "she")
+            ][0]
+            groups = [[names], [pronoun]] if self.split else [[names, pronoun]]
+            for n, spans in enumerate(groups):
+                doc.spans[f"coref_clusters_{n + 1}"] = SpanGroup(doc, spans=spans)
+            yield doc
+
+
+def test_doc_clusters():
+    doc = next(FakeCoref().pipe(TEXTS[:1]))
+    assert doc_clusters(doc) == [{(0, 11), (17, 19)}]
+
+
+def test_cluster_divergence():
+    same = cluster_divergence(FakeCoref(), FakeCoref(), TEXTS)
+    assert same["docs"] == 2
+    assert same["identical_docs"] == 1.0
+    assert same["mention_f1"] == same["link_f1"] == 1.0
+    assert same["speedup"] > 0
+    split = cluster_divergence(FakeCoref(), FakeCoref(split=True), TEXTS)
+    assert split["identical_docs"] == 0.0
+    # same mentions, but none of the links
+    assert split["mention_f1"] == 1.0
+    assert split["link_f1"] == 0.0
+    assert split["cluster_count_diff"] == 1.0
+
+
+def test_quantize_pipeline():
+    torch = pytest.importorskip("torch")
+    from thinc.api import PyTorchWrapper
+
+    @Language.factory("toy_torch")
+    def make_toy(nlp, name):
+        class Toy:
+            model = PyTorchWrapper(
+                torch.nn.Sequential(
+                    torch.nn.Linear(4, 8), torch.nn.ReLU(), torch.nn.Linear(8, 2)
+                )
+            )
+
+            def __call__(self, doc):
+                return doc
+
+        return Toy()
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("toy_torch")
+    report = quantize_pipeline(nlp)
+    assert report.linear_layers == 2
+    assert len(report.modules) == 1
+    module = nlp.get_pipe("toy_torch").model.shims[0]._model
+    assert not any(type(m) is torch.nn.Linear for m in module.modules())
+    assert module(torch.ones(1, 4)).shape == (1, 2)
@@ -0,0 +1,71 @@
+from array import array
+import pytest
+from sayswho.query import SpeakerQuery
+from sayswho.records import ClusterRecord
+
+
+class NoModels:
+    """
+    Attributor stand-in for documents the query should never parse.
+    """
+
+    prep_text = False
+
+    def parse_base(self, texts, batch_size):
+        assert not list(texts)
+        return iter([])
+
+    def parse_coref(self, texts, batch_size):
+        assert not list(texts)
+        return iter([])
+
+
+def test_aliases():
+    query = SpeakerQuery(NoModels(), {"Ross Rogers": ["Ross R."], "Anna Lee": []})
+    assert query.targets_in("Rogers, Lee and Ross R. met Leeds") == {
+        "Ross Rogers",
+        "Anna Lee",
+    }
+    strict = SpeakerQuery(NoModels(), ["Ross Rogers"], surnames=False)
+    assert strict.targets_in("Rogers met Ross Rogers") == {"Ross Rogers"}
+    assert strict.targets_in("Rogers") == set()
+    cluster = ClusterRecord(
+        ["Lee", "she"], array("l", [0, 10]), array("l", [3, 13]), array("b", [0, 1])
+    )
+    assert query.targets_of(cluster) == {"Anna Lee"}
+
+
+def test_reduce():
+    query = SpeakerQuery(NoModels(), ["Anna Lee"], context=1)
+    paragraphs = ["one", "two", "Lee spoke.", "three", "four", "five"]
+    text = "\n".join(paragraphs)
+    reduced = query.reduce(text)
+    assert len(reduced) == len(text)
+    assert reduced.split("\n") == ["   ", "two", "Lee spoke.", "three", "    ", "    "]
+    assert query.stats["kept_paragraphs"] == 3
+
+
+def test_skips_documents():
+    query = SpeakerQuery(NoModels(), ["Anna Lee"])
+    results = list(query.pipe(["Nothing to see.", "Or here."]))
+    assert [r.text for r in results] == ["Nothing to see.", "Or here."]
+    assert all(not r.quotes for r in results)
+    assert query.stats["skipped_docs"] == 2
+
+
+@pytest.fixture(scope="module")
+def says_who():
+    from sayswho import SaysWho
+
+    return SaysWho()
+
+
+def test_query(says_who):
+    text = open("./tests/qa_test_file.txt").read()
+    query = SpeakerQuery(says_who, ["Ross Rogers"])
+    result = query.attribute(text)
+    by_target = query.quotes_by_target(result)
+    assert list(by_target) == ["Ross Rogers"]
+    assert [q.speaker.text for q in by_target["Ross Rogers"]] == ["Rogers"]
+    assert all(query.targets_of(c) for c in result.clusters)
+    assert result.text[result.quotes[0].content.start :].startswith("“Then")
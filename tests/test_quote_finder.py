@@ -3,7 +3,13 @@ Cribbed from textacy!!!
 """
 import pytest
 import spacy
-from sayswho.quote_finder import quote_finder
+from sayswho.quote_finder import (
+    quote_finder,
+    build_cue_index,
+    build_quote_index,
+    pair_quotes,
+    window_cue_candidates,
+)
 
 
 @pytest.fixture(scope="module")
@@ -94,3 +100,34 @@ def test_direct_quotations(nlp, text, exp):
 def test_adjustment_for_quote_detection(nlp, text, speakers):
     quotes = quote_finder(nlp(text))
     assert [speaker.text for quote in quotes for speaker in quote.speaker] == speakers
+
+
+def test_cue_index(nlp):
+    doc = nlp('Burton said, "I love those cats!" He ran home and later told us.')
+    assert [doc[i].text for i in build_cue_index(doc)] == ["said", "told"]
+    assert [
+        t.text for t in window_cue_candidates(list(doc.sents)[:1], build_cue_index(doc))
+    ] == ["said"]
+
+
+def test_quote_index():
+    doc = spacy.blank("en")(
+        'He said "hi there" and \u00abbonjour\u00bb.\n\u201cAnother one\u201d ends'
+    )
+    quote_index = build_quote_index(doc)
+    assert [doc[i].text for i in quote_index.positions] == [
+        '"',
+        '"',
+        "\u00ab",
+        "\u00bb",
+        "\n",
+        "\u201c",
+        "\u201d",
+    ]
+    assert [doc[i].text for i in quote_index.linebreaks] == ["\n"]
+    assert quote_index.codes.tolist()[:2] == [ord('"'), ord('"')]
+    assert [(doc[i].text, doc[j].text) for i, j in pair_quotes(quote_index)] == [
+        ('"', '"'),
+        ("\u00ab", "\u00bb"),
+        ("\u201c", "\u201d"),
+    ]
@@ -0,0 +1,69 @@
+import os
+import sys
+import pytest
+from sayswho import runtime
+
+
+class StubSaysWho:
+    def pipe(self, texts, batch_size=8):
+        return [t.upper() for t in texts]
+
+
+def stub_factory():
+    return StubSaysWho()
+
+
+def test_cgroup_v2(tmp_path):
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert runtime.cgroup_cpu_limit(str(tmp_path)) == 2.5
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert runtime.cgroup_cpu_limit(str(tmp_path)) is None
+
+
+def test_cgroup_v1(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("400000")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000")
+    assert runtime.cgroup_cpu_limit(str(tmp_path)) == 4
+
+
+def test_layouts():
+    assert runtime.plan_layout(cpus=8) == runtime.ThreadLayout(4, 2)
+    assert runtime.plan_layout(workers=3, cpus=8) == runtime.ThreadLayout(3, 2)
+    assert runtime.plan_layout(cpus=1) == runtime.ThreadLayout(1, 1)
+    assert runtime.candidate_layouts(4) == [(4, 1), (2, 2), (1, 4)]
+
+
+@pytest.fixture
+def restore_threads(monkeypatch):
+    # setenv so monkeypatch puts back (or removes) whatever apply_thread_layout sets
+    for var in runtime.THREAD_ENV_VARS:
+        monkeypatch.setenv(var, os.environ.get(var, ""))
+    torch = sys.modules.get("torch")
+    torch_threads = torch.get_num_threads() if torch else None
+    try:
+        from threadpoolctl import threadpool_limits
+
+        blas = threadpool_limits(limits=None)
+    except ImportError:
+        blas = None
+    yield
+    if torch:
+        torch.set_num_threads(torch_threads)
+    if blas is not None:
+        blas.restore_original_limits()
+
+
+def test_apply_thread_layout(restore_threads):
+    runtime.apply_thread_layout(3)
+    assert os.environ["OMP_NUM_THREADS"] == "3"
+
+
+def test_calibrate():
+    best, scores = runtime.calibrate(
+        ["some text"] * 4,
+        layouts=[runtime.ThreadLayout(1, 1), runtime.ThreadLayout(2, 1)],
+        factory=stub_factory,
+    )
+    assert best in [layout for layout, _ in scores]
+    assert all(docs_per_sec > 0 for _, docs_per_sec in scores)
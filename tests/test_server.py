@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+from sayswho.server import AttributionServer
+
+
+class StubResult:
+    def __init__(self, text):
+        self.text = text
+
+    def to_dict(self):
+        return {"text": self.text}
+
+
+class StubSaysWho:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def pipe(self, texts, batch_size=8):
+        self.batch_sizes.append(len(texts))
+        if "bad" in texts:
+            raise ValueError("bad text")
+        time.sleep(self.delay)
+        return [StubResult(t) for t in texts]
+
+
+async def request(port, method="POST", path="/attribute", payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload or {}).encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    response = await reader.read()
+    writer.close()
+    return int(status_line.split()[1]), json.loads(response.split(b"\r\n\r\n")[1])
+
+
+def run_server(sw, coro, **kwargs):
+    async def main():
+        server = AttributionServer(sw, port=0, **kwargs)
+        await server.start()
+        try:
+            return await coro(server)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_micro_batching():
+    sw = StubSaysWho()
+
+    async def go(server):
+        return await asyncio.gather(
+            *[request(server.port, payload={"text": str(n)}) for n in range(6)]
+        )
+
+    responses = run_server(sw, go, max_batch_size=4, max_wait_ms=50)
+    assert [r for r in responses] == [(200, {"text": str(n)}) for n in range(6)]
+    assert sorted(sw.batch_sizes) == [2, 4]
+
+
+def test_health():
+    async def go(server):
+        return await request(server.port, method="GET", path="/health")
+
+    status, payload = run_server(StubSaysWho(), go)
+    assert status == 200
+    assert payload["status"] == "ok"
+
+
+def test_backpressure_and_timeout():
+    async def go(server):
+        return await asyncio.gather(
+            *[request(server.port, payload={"text": str(n)}) for n in range(4)]
+        )
+
+    responses = run_server(
+        StubSaysWho(delay=0.3),
+        go,
+        max_batch_size=1,
+        max_wait_ms=0,
+        max_queue=1,
+        request_timeout=0.2,
+    )
+    statuses = [status for status, _ in responses]
+    assert 503 in statuses
+    assert 504 in statuses
+
+
+def test_bad_requests():
+    sw = StubSaysWho()
+
+    async def go(server):
+        return await asyncio.gather(
+            request(server.port, payload={"text": 1}),
+            request(server.port, payload={"txt": "a"}),
+            request(server.port, payload={"text": "bad"}),
+            request(server.port, payload={"text": "good"}),
+        )
+
+    responses = run_server(sw, go, max_batch_size=4, max_wait_ms=50)
+    assert [status for status, _ in responses] == [400, 400, 500, 200]
+    assert responses[3][1] == {"text": "good"}
+    # the failed batch was retried one text at a time
+    assert sorted(sw.batch_sizes) == [1, 1, 2]
@@ -0,0 +1,44 @@
+from sayswho.speaker_index import SpeakerIndex, normalize_name
+
+
+def test_normalize_name():
+    assert normalize_name("Ben Simmons's") == "ben simmons"
+    assert normalize_name("Simmons'x") == "simmons"
+    assert normalize_name("  Jacque   Vaughn ") == "jacque vaughn"
+
+
+def test_clusters_share_ids():
+    index = SpeakerIndex()
+    vaughn = index.add_cluster(["Nets Coach Jacque Vaughn", "Vaughn"])
+    simmons = index.add_cluster(["Ben Simmons's", "Simmons"])
+    assert vaughn != simmons
+    assert index.lookup("Jacque Vaughn") == vaughn
+    assert index.lookup("Coach Vaughn") == vaughn
+    assert index.lookup("Simmons'x") == simmons
+    assert index.lookup("Ben Wallace") is None
+    assert index.lookup("Tom Vaughn") is None
+    assert index.add("Ben Wallace") not in (vaughn, simmons)
+    assert index.names[vaughn] == "Nets Coach Jacque Vaughn"
+
+
+def test_same_surname():
+    index = SpeakerIndex()
+    jacque = index.add_cluster(["Jacque Vaughn", "Vaughn"])
+    tom = index.add_cluster(["Tom Vaughn", "Vaughn"])
+    assert jacque != tom
+    assert index.names[tom] == "Tom Vaughn"
+    assert index.lookup("Tom Vaughn") == tom
+    assert index.lookup("Jacque Vaughn") == jacque
+    assert index.add_cluster(["Vaughn"]) == jacque
+
+
+def test_persistence(tmp_path):
+    path = str(tmp_path / "speakers.db")
+    index = SpeakerIndex(path)
+    vaughn = index.add_cluster(["Jacque Vaughn", "Vaughn"])
+    index.close()
+
+    index = SpeakerIndex(path)
+    assert len(index) == 1
+    assert index.lookup("Vaughn") == vaughn
+    assert index.add_cluster(["Jacque Vaughn's"]) == vaughn